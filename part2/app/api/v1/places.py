@@ -98,10 +98,9 @@ class PlaceAmenities(Resource):
         if not place:
             return {'error': 'Place not found'}, 404
         
-        for amenity in amenities_data:
-            a = facade.get_amenity(amenity['id'])
-            if not a:
-                return {'error': 'Invalid input data'}, 400
+        amenity_ids = {amenity['id'] for amenity in amenities_data}
+        if len(facade.get_amenities(amenity_ids)) != len(amenity_ids):
+            return {'error': 'Invalid input data'}, 400
         
         for amenity in amenities_data:
             place.add_amenity(amenity)
@@ -58,7 +58,7 @@ class UserResource(Resource):
         if not user:
             return {'error': 'User not found'}, 404
         try:
-            facade.update_user(user_id, user_data)
+            user = facade.update_user(user_id, user_data)
             return user.to_dict(), 200
         except Exception as e:
             return {'error': str(e)}, 400
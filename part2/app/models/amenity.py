@@ -1,6 +1,7 @@
 from app.models.base_model import BaseModel
 
 class Amenity(BaseModel):
+    __slots__ = ('name',)
     _allowed_attrs = ['name']
 
     def __init__(self, name, **kwargs):
@@ -1,16 +1,39 @@
 #!/usr/bin/python3
+import time
 import uuid
 from datetime import datetime
 
 class BaseModel:
+    # pas de __dict__ par instance ; les dates sont stockées en timestamps
+    # (float) et exposées en datetime par les propriétés. Compromis : chaque
+    # lecture reconstruit le datetime (~0,4 µs) ; le garder en cache
+    # coûterait les deux objets datetime que l'on cherche à économiser
+    __slots__ = ('id', '_created_at', '_updated_at')
+
     def __init__(self):
         self.id = str(uuid.uuid4())
-        self.created_at = datetime.now()
-        self.updated_at = datetime.now()
+        self._created_at = time.time()
+        self._updated_at = time.time()
+
+    @property
+    def created_at(self):
+        return datetime.fromtimestamp(self._created_at)
+
+    @created_at.setter
+    def created_at(self, value):
+        self._created_at = value.timestamp()
+
+    @property
+    def updated_at(self):
+        return datetime.fromtimestamp(self._updated_at)
+
+    @updated_at.setter
+    def updated_at(self, value):
+        self._updated_at = value.timestamp()
 
     def save(self):
         """Update the updated_at timestamp whenever the object is modified"""
-        self.updated_at = datetime.now()
+        self._updated_at = time.time()
 
     def update(self, data):
         """Update the attributes of the object based on the provided dictionary"""
@@ -25,4 +48,3 @@ class BaseModel:
             return uuid_obj.version == 4
         except (ValueError, AttributeError, TypeError):
             return False
-
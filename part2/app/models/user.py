@@ -3,6 +3,8 @@ from app.models.base_model import BaseModel
 import re
 
 class User(BaseModel):
+    __slots__ = ('__first_name', '__last_name', '__email', '__is_admin')
+
     def __init__(self, first_name, last_name, email):
         super().__init__()
         self.first_name = first_name
@@ -0,0 +1,256 @@
+"""Containers split into chunks, shared with frozen copies until written.
+
+freeze() returns a read-only copy that shares every chunk with the live
+container, for the cost of copying the list of chunks. The next write to a
+chunk copies that chunk first, once per freeze: a write costs one chunk
+copy, whatever the total size. Used by ConcurrentInMemoryRepository to give
+readers a snapshot at each version.
+
+Readers of the live container only do single dict reads, atomic under
+CPython; a frozen copy can be iterated while the live one is written.
+"""
+from bisect import bisect_left, bisect_right, insort
+
+# entrées par chunk : une écriture copie au plus ~2 x CHUNK références
+CHUNK = 256
+
+
+class HashChunks:
+    """Unordered dict split into chunks by hash of the key"""
+
+    def __init__(self, size=16):
+        self._chunks = [{} for _ in range(size)]
+        self._owned = [True] * size
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def _chunk(self, key):
+        chunks = self._chunks
+        return chunks[hash(key) % len(chunks)]
+
+    def _writable(self, key):
+        number = hash(key) % len(self._chunks)
+        if not self._owned[number]:
+            self._chunks[number] = dict(self._chunks[number])
+            self._owned[number] = True
+        return self._chunks[number]
+
+    def get(self, key, default=None):
+        return self._chunk(key).get(key, default)
+
+    def __contains__(self, key):
+        return key in self._chunk(key)
+
+    def __getitem__(self, key):
+        return self._chunk(key)[key]
+
+    def __setitem__(self, key, value):
+        chunk = self._writable(key)
+        if key not in chunk:
+            self._len += 1
+        chunk[key] = value
+        if self._len > CHUNK * len(self._chunks):
+            self._grow()
+
+    def pop(self, key, default=None):
+        if key not in self._chunk(key):
+            return default
+        self._len -= 1
+        return self._writable(key).pop(key)
+
+    def items(self):
+        for chunk in self._chunks:
+            yield from chunk.items()
+
+    def _grow(self):
+        size = len(self._chunks) * 2
+        chunks = [{} for _ in range(size)]
+        for chunk in self._chunks:
+            for key, value in chunk.items():
+                chunks[hash(key) % size][key] = value
+        self._owned = [True] * size
+        self._chunks = chunks
+
+    def freeze(self):
+        frozen = HashChunks.__new__(HashChunks)
+        frozen._chunks = list(self._chunks)
+        frozen._owned = [False] * len(self._chunks)
+        frozen._len = self._len
+        self._owned = [False] * len(self._chunks)
+        return frozen
+
+
+class OrderedChunks:
+    """Dict keeping insertion order, in chunks of at most CHUNK entries"""
+
+    def __init__(self):
+        self._index = HashChunks()  # clé -> (numéro de chunk, valeur)
+        self._chunks = []
+        self._owned = []
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, key, default=None):
+        entry = self._index.get(key)
+        return default if entry is None else entry[1]
+
+    def __getitem__(self, key):
+        return self._index[key][1]
+
+    def _writable(self, number):
+        if not self._owned[number]:
+            self._chunks[number] = dict(self._chunks[number])
+            self._owned[number] = True
+        return self._chunks[number]
+
+    def __setitem__(self, key, value):
+        entry = self._index.get(key)
+        if entry is not None:
+            number = entry[0]
+        else:
+            if not self._chunks or len(self._chunks[-1]) >= CHUNK:
+                self._chunks.append({})
+                self._owned.append(True)
+            number = len(self._chunks) - 1
+        self._writable(number)[key] = value
+        self._index[key] = (number, value)
+
+    def pop(self, key, default=None):
+        entry = self._index.pop(key)
+        if entry is None:
+            return default
+        del self._writable(entry[0])[key]
+        # chunks vidés par les suppressions : on renumérote de temps en temps
+        if len(self._chunks) * CHUNK > 2 * len(self._index) + CHUNK:
+            self._compact()
+        return entry[1]
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+
+    def values(self):
+        for chunk in self._chunks:
+            yield from chunk.values()
+
+    def _compact(self):
+        # construit à part puis échangé : get() lit l'index sans verrou
+        index, chunks = HashChunks(len(self._index._chunks)), []
+        for chunk in self._chunks:
+            for key, value in chunk.items():
+                if not chunks or len(chunks[-1]) >= CHUNK:
+                    chunks.append({})
+                chunks[-1][key] = value
+                index[key] = (len(chunks) - 1, value)
+        self._owned = [True] * len(chunks)
+        self._chunks = chunks
+        self._index = index
+
+    def freeze(self):
+        frozen = OrderedChunks.__new__(OrderedChunks)
+        frozen._index = self._index.freeze()
+        frozen._chunks = list(self._chunks)
+        frozen._owned = [False] * len(self._chunks)
+        self._owned = [False] * len(self._chunks)
+        return frozen
+
+
+class SortedChunks:
+    """Sorted list in chunks of CHUNK to 2 x CHUNK items"""
+
+    def __init__(self):
+        self._chunks = []
+        self._maxes = []  # dernier élément de chaque chunk
+        self._owned = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def _writable(self, number):
+        if not self._owned[number]:
+            self._chunks[number] = list(self._chunks[number])
+            self._owned[number] = True
+        return self._chunks[number]
+
+    def add(self, item):
+        if not self._chunks:
+            self._chunks.append([item])
+            self._maxes.append(item)
+            self._owned.append(True)
+            self._len = 1
+            return
+        number = min(bisect_left(self._maxes, item), len(self._maxes) - 1)
+        chunk = self._writable(number)
+        insort(chunk, item)
+        self._maxes[number] = chunk[-1]
+        self._len += 1
+        if len(chunk) > 2 * CHUNK:
+            self._chunks[number:number + 1] = [chunk[:CHUNK], chunk[CHUNK:]]
+            self._maxes[number:number + 1] = [chunk[CHUNK - 1], chunk[-1]]
+            self._owned[number:number + 1] = [True, True]
+
+    def discard(self, item):
+        number = bisect_left(self._maxes, item)
+        if number == len(self._maxes):
+            return
+        position = bisect_left(self._chunks[number], item)
+        if self._chunks[number][position] != item:
+            return
+        chunk = self._writable(number)
+        del chunk[position]
+        self._len -= 1
+        if chunk:
+            self._maxes[number] = chunk[-1]
+        else:
+            del self._chunks[number], self._maxes[number], self._owned[number]
+
+    def _position(self, item, bisect):
+        number = bisect(self._maxes, item)
+        if number == len(self._maxes):
+            return self._len
+        return sum(len(chunk) for chunk in self._chunks[:number]) + bisect(self._chunks[number], item)
+
+    def bisect_left(self, item):
+        return self._position(item, bisect_left)
+
+    def bisect_right(self, item):
+        return self._position(item, bisect_right)
+
+    def islice(self, start=0, stop=None, reverse=False):
+        """Yield the items between two positions, in order or reversed"""
+        stop = self._len if stop is None else min(stop, self._len)
+        if start >= stop:
+            return
+        if reverse:
+            position = self._len
+            for chunk in reversed(self._chunks):
+                position -= len(chunk)
+                if position >= stop:
+                    continue
+                if position + len(chunk) <= start:
+                    break
+                yield from reversed(chunk[max(0, start - position):stop - position])
+            return
+        position = 0
+        for chunk in self._chunks:
+            if position >= stop:
+                break
+            if position + len(chunk) > start:
+                yield from chunk[max(0, start - position):stop - position]
+            position += len(chunk)
+
+    def freeze(self):
+        frozen = SortedChunks.__new__(SortedChunks)
+        frozen._chunks = list(self._chunks)
+        frozen._maxes = list(self._maxes)
+        frozen._owned = [False] * len(self._chunks)
+        frozen._len = self._len
+        self._owned = [False] * len(self._chunks)
+        return frozen
@@ -0,0 +1,275 @@
+import io
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+from app.models.base_model import BaseModel
+
+# enregistrement du journal : longueur, crc32, opération, puis le pickle
+_RECORD = struct.Struct('<IIB')
+_PUT = 1
+_DELETE = 2
+
+# snapshot : magic, longueur et crc32 du pickle qui suit
+_SNAPSHOT_MAGIC = b'HBNBSNP1'
+_SNAPSHOT_HEADER = struct.Struct('<8sQI')
+
+
+class _Pickler(pickle.Pickler):
+    """Pickle an object, storing the other entities it references by id"""
+
+    def __init__(self, file, root):
+        super().__init__(file, protocol=5)
+        self._root = root
+
+    def persistent_id(self, obj):
+        if obj is not self._root and isinstance(obj, BaseModel):
+            return obj.id
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, resolve):
+        super().__init__(file)
+        self._resolve = resolve
+
+    def persistent_load(self, obj_id):
+        return self._resolve(obj_id)
+
+
+def _copy_state(target, source):
+    state = source.__getstate__()
+    slots = None
+    if isinstance(state, tuple):
+        state, slots = state
+    if state:
+        target.__dict__.update(state)
+    for name, value in (slots or {}).items():
+        object.__setattr__(target, name, value)
+
+
+class _Journal:
+    """Handle given to a repository to log its writes into the store"""
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+
+    def put(self, obj):
+        self.store.append(_PUT, (self.name, obj), root=obj)
+
+    def delete(self, obj_id):
+        self.store.append(_DELETE, (self.name, obj_id))
+
+
+class DurableStore:
+    """Append-only log plus snapshots for a set of in-memory repositories.
+
+    Every add/update/delete of an attached repository is appended to
+    hbnb.log. Records are written through on each call but only fsynced
+    every sync_every records or sync_interval seconds. After
+    snapshot_every records the log is rotated and every repository is
+    dumped into hbnb.snap, in the background; rotated logs are removed once
+    the snapshot is on disk. On startup, recover() loads the snapshot, a
+    single pickle read in one go (its cost grows with the whole dataset),
+    then replays the logs written since. A bad record ends the live log (a
+    write cut by a crash) but is an error in a rotated log.
+    """
+
+    def __init__(self, directory, sync_every=256, sync_interval=1.0, snapshot_every=100_000):
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.snapshot_every = snapshot_every
+        self.log_path = os.path.join(directory, 'hbnb.log')
+        self.snapshot_path = os.path.join(directory, 'hbnb.snap')
+        self._repos = {}
+        self._lock = threading.RLock()
+        self._snapshot_lock = threading.Lock()
+        self._log = None
+        self._pending = 0
+        self._records = 0
+        self._last_sync = time.monotonic()
+        self._snapshot_due = False
+        self._syncer = None
+        self._closed = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+
+    def attach(self, name, repo):
+        """Log the writes of repo under name"""
+        self._repos[name] = repo
+        repo.journal = _Journal(self, name)
+
+    def _resolve(self, obj_id):
+        for repo in self._repos.values():
+            obj = repo.get(obj_id)
+            if obj is not None:
+                return obj
+        return None
+
+    def _rotated_logs(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.startswith('hbnb.log.'))
+        return [os.path.join(self.directory, name) for name in names]
+
+    # recovery
+
+    def recover(self):
+        """Reload the attached repositories, then start logging"""
+        journals = {name: repo.journal for name, repo in self._repos.items()}
+        for repo in self._repos.values():
+            repo.journal = None
+        try:
+            self._load_snapshot()
+            for path in self._rotated_logs():
+                self._replay_log(path, live=False)
+            good_size = self._replay_log(self.log_path)
+        finally:
+            for name, repo in self._repos.items():
+                repo.journal = journals[name]
+        self._log = open(self.log_path, 'ab')
+        # un enregistrement tronqué (crash en cours d'écriture) est ignoré
+        self._log.truncate(good_size)
+        if self.sync_interval:
+            self._syncer = threading.Thread(target=self._sync_loop, daemon=True)
+            self._syncer.start()
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+        with open(self.snapshot_path, 'rb') as f:
+            header = f.read(_SNAPSHOT_HEADER.size)
+            payload = f.read()
+        if len(header) != _SNAPSHOT_HEADER.size:
+            raise ValueError(f"Corrupted snapshot: {self.snapshot_path}")
+        magic, length, crc = _SNAPSHOT_HEADER.unpack(header)
+        if magic != _SNAPSHOT_MAGIC or len(payload) != length or zlib.crc32(payload) != crc:
+            raise ValueError(f"Corrupted snapshot: {self.snapshot_path}")
+        data = pickle.loads(payload)
+        for name, objs in data.items():
+            repo = self._repos.get(name)
+            if repo is not None:
+                for obj in objs:
+                    repo.add(obj)
+
+    def _replay_log(self, path, live=True):
+        """Apply the records of a log, return the size of its valid part.
+
+        Only the live log can end on a bad record: a rotated log was fsynced
+        whole before the rotation, a bad record there is corruption.
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        while offset + _RECORD.size <= len(data):
+            length, crc, op = _RECORD.unpack_from(data, offset)
+            start = offset + _RECORD.size
+            payload = data[start:start + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                if not live:
+                    raise ValueError(f"Corrupted log: {path}")
+                break
+            name, value = _Unpickler(io.BytesIO(payload), self._resolve).load()
+            repo = self._repos.get(name)
+            if repo is not None:
+                if op == _PUT:
+                    self._put(repo, value)
+                elif op == _DELETE:
+                    repo.delete(value)
+            offset = start + length
+            self._records += 1
+        if not live and offset != len(data):
+            raise ValueError(f"Corrupted log: {path}")
+        return offset
+
+    @staticmethod
+    def _put(repo, obj):
+        existing = repo.get(obj.id)
+        repo.delete(obj.id)
+        if existing is not None:
+            # garder la même instance : d'autres objets la référencent déjà
+            _copy_state(existing, obj)
+            obj = existing
+        repo.add(obj)
+
+    # écriture
+
+    def append(self, op, record, root=None):
+        buffer = io.BytesIO()
+        _Pickler(buffer, root).dump(record)
+        payload = buffer.getvalue()
+        with self._lock:
+            if self._log is None:
+                raise RuntimeError("DurableStore.recover() must be called before writing")
+            self._log.write(_RECORD.pack(len(payload), zlib.crc32(payload), op))
+            self._log.write(payload)
+            self._log.flush()
+            self._pending += 1
+            self._records += 1
+            if self._pending >= self.sync_every:
+                self.sync()
+            due = bool(self.snapshot_every) and self._records >= self.snapshot_every
+        if due:
+            if self._syncer is not None:
+                self._snapshot_due = True
+            else:
+                self.snapshot()
+
+    def sync(self):
+        """fsync the records written since the last call"""
+        with self._lock:
+            if self._log is not None and self._pending:
+                os.fsync(self._log.fileno())
+            self._pending = 0
+            self._last_sync = time.monotonic()
+
+    def _sync_loop(self):
+        while not self._closed.wait(self.sync_interval):
+            if self._pending and time.monotonic() - self._last_sync >= self.sync_interval:
+                self.sync()
+            if self._snapshot_due:
+                self.snapshot()
+
+    def _rotate(self):
+        """Start a new log, return every log the next snapshot will cover"""
+        with self._lock:
+            self.sync()
+            self._log.close()
+            os.replace(self.log_path, f'{self.log_path}.{time.time_ns():020d}')
+            self._log = open(self.log_path, 'ab')
+            self._records = 0
+            self._snapshot_due = False
+            return self._rotated_logs()
+
+    def snapshot(self):
+        """Dump every repository to a new snapshot and drop the old logs"""
+        with self._snapshot_lock:
+            covered = self._rotate()
+            # lu hors du verrou du journal : les écritures concurrentes vont
+            # dans le nouveau journal et seront rejouées par-dessus au besoin
+            data = {name: list(repo.get_all()) for name, repo in self._repos.items()}
+            payload = pickle.dumps(data, protocol=5)
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, len(payload), zlib.crc32(payload)))
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            for path in covered:
+                os.remove(path)
+
+    def close(self):
+        self._closed.set()
+        if self._syncer is not None:
+            self._syncer.join()
+            self._syncer = None
+        with self._lock:
+            if self._log is not None:
+                self.sync()
+                self._log.close()
+                self._log = None
@@ -0,0 +1,150 @@
+from sortedcontainers import SortedList
+
+from app.persistence.chunks import HashChunks, SortedChunks
+
+
+class _Top:
+    """Compares greater than any id, used as upper bound of (value, id) keys"""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_TOP = _Top()
+
+
+class HashIndex:
+    """Secondary index mapping an attribute value to the ids holding it.
+
+    chunked: entries in HashChunks, so that freeze() can share them with a
+    read-only copy (see ConcurrentInMemoryRepository).
+    """
+
+    def __init__(self, attr_name, unique=False, chunked=False):
+        self.attr_name = attr_name
+        self.unique = unique
+        self._entries = HashChunks() if chunked else {}
+        # valeurs dont l'ensemble d'ids n'est plus partagé avec une copie
+        # gelée ; None : jamais gelé, tout est modifiable sur place
+        self._owned = None
+
+    def freeze(self):
+        frozen = HashIndex(self.attr_name, self.unique)
+        frozen._entries = self._entries.freeze()
+        self._owned = set()
+        return frozen
+
+    def _key(self, obj):
+        return getattr(obj, self.attr_name, None)
+
+    def check(self, obj, value):
+        """Raise ValueError if value is already taken by another object"""
+        if not self.unique or value is None:
+            return
+        owner = self._entries.get(value)
+        if owner is not None and owner != obj.id:
+            raise ValueError(f"{self.attr_name} '{value}' already exists")
+
+    def _bucket(self, value):
+        """Ids stored under value, copied first if a frozen copy shares them"""
+        bucket = self._entries.get(value)
+        if bucket is not None and (self._owned is None or value in self._owned):
+            return bucket
+        bucket = {} if bucket is None else dict(bucket)
+        self._entries[value] = bucket
+        if self._owned is not None:
+            self._owned.add(value)
+        return bucket
+
+    def add(self, obj):
+        value = self._key(obj)
+        if value is None:
+            return
+        self.check(obj, value)
+        if self.unique:
+            self._entries[value] = obj.id
+        else:
+            # dict utilisé comme ensemble ordonné (ordre d'insertion conservé)
+            self._bucket(value)[obj.id] = None
+
+    def remove(self, obj):
+        value = self._key(obj)
+        if value is None:
+            return
+        if self.unique:
+            if self._entries.get(value) == obj.id:
+                self._entries.pop(value)
+            return
+        if obj.id not in self._entries.get(value, ()):
+            return
+        bucket = self._bucket(value)
+        del bucket[obj.id]
+        if not bucket:
+            self._entries.pop(value)
+
+    def lookup(self, value):
+        """Return the ids stored under value, in insertion order"""
+        if self.unique:
+            obj_id = self._entries.get(value)
+            return [] if obj_id is None else [obj_id]
+        return list(self._entries.get(value, ()))
+
+    def first(self, value):
+        if self.unique:
+            return self._entries.get(value)
+        return next(iter(self._entries.get(value, ())), None)
+
+
+class SortedIndex:
+    """Ordered index of (value, id) pairs supporting range scans and sorting"""
+
+    def __init__(self, attr_name, chunked=False):
+        self.attr_name = attr_name
+        # SortedChunks : même interface que SortedList, gelable
+        self._entries = SortedChunks() if chunked else SortedList()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def freeze(self):
+        frozen = SortedIndex(self.attr_name)
+        frozen._entries = self._entries.freeze()
+        return frozen
+
+    def check(self, obj, value):
+        pass
+
+    def add(self, obj):
+        value = getattr(obj, self.attr_name, None)
+        if value is not None:
+            self._entries.add((value, obj.id))
+
+    def remove(self, obj):
+        value = getattr(obj, self.attr_name, None)
+        if value is not None:
+            self._entries.discard((value, obj.id))
+
+    def bounds(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """Return the (start, stop) positions of the values within the range"""
+        entries = self._entries
+        if low is None:
+            start = 0
+        elif low_inclusive:
+            start = entries.bisect_left((low,))
+        else:
+            start = entries.bisect_right((low, _TOP))
+        if high is None:
+            stop = len(entries)
+        elif high_inclusive:
+            stop = entries.bisect_right((high, _TOP))
+        else:
+            stop = entries.bisect_left((high,))
+        return start, max(start, stop)
+
+    def ids(self, start=0, stop=None, reverse=False):
+        """Yield ids between two positions, sorted by value"""
+        for _, obj_id in self._entries.islice(start, stop, reverse=reverse):
+            yield obj_id
@@ -1,4 +1,10 @@
+import copy
+import operator
+import threading
 from abc import ABC, abstractmethod
+from itertools import islice
+from app.persistence.chunks import OrderedChunks
+from app.persistence.indexes import HashIndex, SortedIndex
 
 class Repository(ABC):
     @abstractmethod
@@ -9,6 +15,10 @@ class Repository(ABC):
     def get(self, obj_id):
         pass
 
+    @abstractmethod
+    def get_many(self, ids):
+        pass
+
     @abstractmethod
     def get_all(self):
         pass
@@ -26,33 +36,329 @@ class Repository(ABC):
         pass
 
 
+class RepositoryView:
+    """Read-only view over the objects of an InMemoryRepository.
+
+    Wraps a frozen copy of the storage (OrderedChunks.freeze()), which
+    shares its chunks with the repository: building the view copies no
+    object, iterating or slicing only reads the rows it returns, and later
+    writes copy the chunks they touch instead of changing the view.
+    """
+
+    def __init__(self, storage, version):
+        self._storage = storage
+        self.version = version
+
+    def __len__(self):
+        return len(self._storage)
+
+    def __bool__(self):
+        return bool(self._storage)
+
+    def __iter__(self):
+        return self._storage.values()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self._storage))
+            return list(islice(self._storage.values(), start, stop, step))
+        if key < 0:
+            key += len(self._storage)
+        if not 0 <= key < len(self._storage):
+            raise IndexError("RepositoryView index out of range")
+        return next(islice(self._storage.values(), key, None))
+
+
 class InMemoryRepository(Repository):
-    def __init__(self):
-        self._storage = {}
+    _OPERATORS = {
+        'eq': operator.eq,
+        'ne': operator.ne,
+        'lt': operator.lt,
+        'lte': operator.le,
+        'gt': operator.gt,
+        'gte': operator.ge,
+        'in': lambda value, values: value in values,
+    }
+    journal = None
+    # index en chunks partageables (voir chunks.py) ; le stockage l'est
+    # toujours, get_all() en gèle une copie
+    _chunked = False
+
+    def __init__(self, indexes=(), unique=(), ordered=()):
+        """indexes/unique: attribute names to maintain a hash index on,
+        ordered: attribute names to maintain a sorted index on"""
+        chunked = self._chunked
+        self._storage = OrderedChunks()
+        self._indexes = {}
+        self._ordered = {}
+        self.version = 0
+        self._view = None
+        for attr_name in unique:
+            self._indexes[attr_name] = HashIndex(attr_name, unique=True, chunked=chunked)
+        for attr_name in indexes:
+            self._indexes[attr_name] = HashIndex(attr_name, chunked=chunked)
+        for attr_name in ordered:
+            self._ordered[attr_name] = SortedIndex(attr_name, chunked=chunked)
+
+    def _all_indexes(self):
+        return list(self._indexes.values()) + list(self._ordered.values())
 
     def add(self, obj):
+        indexes = self._all_indexes()
+        for index in indexes:
+            index.check(obj, getattr(obj, index.attr_name, None))
         self._storage[obj.id] = obj
+        for index in indexes:
+            index.add(obj)
+        if self.journal is not None:
+            self.journal.put(obj)
+        self.version += 1
 
     def get(self, obj_id):
         return self._storage.get(obj_id)
 
+    def get_many(self, ids):
+        """Return the objects found for ids, in order, skipping unknown ids"""
+        objs = map(self._storage.get, dict.fromkeys(ids))
+        return [obj for obj in objs if obj is not None]
+
     def get_all(self):
-        return list(self._storage.values())
+        """Return a view of every object, reused until the next write"""
+        view = self._view
+        if view is None or view.version != self.version:
+            view = self._view = RepositoryView(self._storage.freeze(), self.version)
+        return view
 
     def update(self, obj_id, data):
         obj = self.get(obj_id)
         if not obj:
             return None
+        # les setters valident sur une copie : une erreur ne touche ni
+        # l'objet, ni les index, ni le journal
+        trial = copy.copy(obj)
+        for key, value in data.items():
+            setattr(trial, key, value)
+        touched = [index for index in self._all_indexes() if index.attr_name in data]
+        for index in touched:
+            index.check(obj, getattr(trial, index.attr_name, None))
+        for index in touched:
+            index.remove(obj)
         for key, value in data.items():
             setattr(obj, key, value)
+        for index in touched:
+            index.add(obj)
+        if self.journal is not None:
+            self.journal.put(obj)
+        self.version += 1
         return obj
 
+    def save(self, obj):
+        """Record changes made to a stored object outside of update()"""
+        if self.journal is not None and obj.id in self._storage:
+            self.journal.put(obj)
+
     def delete(self, obj_id):
         if obj_id in self._storage:
-            del self._storage[obj_id]
+            obj = self._storage.pop(obj_id)
+            for index in self._all_indexes():
+                index.remove(obj)
+            if self.journal is not None:
+                self.journal.delete(obj_id)
+            self.version += 1
 
     def get_by_attribute(self, attr_name, attr_value):
+        if attr_name == 'id':
+            return self.get(attr_value)
+        index = self._indexes.get(attr_name)
+        if index is not None:
+            return self._storage.get(index.first(attr_value))
         return next((obj for obj in self._storage.values() if getattr(obj, attr_name) == attr_value), None)
-    
-    def exists(self, obj_id):
-        return obj_id in self._data
+
+    def find_by_attribute(self, attr_name, attr_value):
+        """Return every object whose attribute equals attr_value"""
+        index = self._indexes.get(attr_name)
+        if index is not None:
+            return [self._storage[obj_id] for obj_id in index.lookup(attr_value)]
+        return [obj for obj in self._storage.values() if getattr(obj, attr_name) == attr_value]
+
+    def query(self, filters=None, order_by=None, limit=None, offset=0):
+        """Return the objects matching filters, sorted and paginated.
+
+        filters maps 'attr' or 'attr__op' (op: eq, ne, lt, lte, gt, gte, in)
+        to a value, order_by is an attribute name, prefixed with '-' for a
+        descending order. The most selective index drives the scan. Always
+        returns a list, get_all() gives the reusable view.
+        """
+        conditions = []
+        for key, value in (filters or {}).items():
+            attr_name, _, op = key.partition('__')
+            op = op or 'eq'
+            if op not in self._OPERATORS:
+                raise ValueError(f"Unknown operator '{op}'")
+            conditions.append((attr_name, op, value))
+
+        descending = bool(order_by) and order_by.startswith('-')
+        sort_attr = order_by.lstrip('-') if order_by else None
+
+        ids, ordered = self._plan(conditions, sort_attr, descending)
+        if ids is None:
+            objs = self._storage.values()
+        else:
+            objs = (self._storage[obj_id] for obj_id in ids)
+        objs = (obj for obj in objs if self._matches(obj, conditions))
+        if sort_attr and not ordered:
+            objs = sorted(objs, key=lambda obj: self._sort_key(obj, sort_attr), reverse=descending)
+        stop = None if limit is None else offset + limit
+        return list(islice(objs, offset, stop))
+
+    def _plan(self, conditions, sort_attr, descending):
+        """Pick the index returning the fewest candidates.
+
+        Returns (ids, ordered): ids is None for a full scan, ordered tells if
+        the ids already come sorted by sort_attr.
+        """
+        candidates = []
+        for attr_name, op, value in conditions:
+            index = self._indexes.get(attr_name)
+            if index is None or value is None:
+                continue
+            if op == 'eq':
+                ids = index.lookup(value)
+            elif op == 'in' and None not in value:
+                # une valeur répétée ne doit pas renvoyer deux fois ses objets
+                ids = [obj_id for item in dict.fromkeys(value) for obj_id in index.lookup(item)]
+            else:
+                continue
+            candidates.append((len(ids), op == 'eq' and attr_name == sort_attr, ids))
+
+        for attr_name, index in self._ordered.items():
+            bounds = {}
+            for name, op, value in conditions:
+                if name != attr_name or value is None:
+                    continue
+                if op in ('eq', 'gt', 'gte'):
+                    bounds['low'] = value
+                    bounds['low_inclusive'] = op != 'gt'
+                if op in ('eq', 'lt', 'lte'):
+                    bounds['high'] = value
+                    bounds['high_inclusive'] = op != 'lt'
+            if not bounds:
+                # sans filtre, l'index ne sert qu'au tri s'il couvre tout
+                if attr_name != sort_attr or len(index) != len(self._storage):
+                    continue
+            start, stop = index.bounds(**bounds)
+            is_sorted = attr_name == sort_attr
+            ids = index.ids(start, stop, reverse=is_sorted and descending)
+            candidates.append((stop - start, is_sorted, ids))
+
+        if not candidates:
+            return None, False
+        _, ordered, ids = min(candidates, key=lambda c: (c[0], not c[1]))
+        return ids, ordered
+
+    def _matches(self, obj, conditions):
+        for attr_name, op, value in conditions:
+            attr_value = getattr(obj, attr_name, None)
+            if attr_value is None and op in ('lt', 'lte', 'gt', 'gte'):
+                return False
+            if not self._OPERATORS[op](attr_value, value):
+                return False
+        return True
+
+    @staticmethod
+    def _sort_key(obj, attr_name):
+        value = getattr(obj, attr_name, None)
+        return (value is None, value)
+
+
+class ConcurrentInMemoryRepository(InMemoryRepository):
+    """InMemoryRepository that can be shared between threads.
+
+    Writers are serialized by a lock and bump the version. Readers work on
+    a snapshot of the storage and indexes at a given version, taken on the
+    first read following a write and reused until the next one, so reads
+    neither block nor see a half-applied write. The storage and indexes are
+    split into chunks (chunks.py): a snapshot shares them, and a write only
+    copies the chunks it touches.
+
+    Stored objects are never changed in place: update() changes a copy and
+    swaps it in, so a snapshot keeps the objects of its version. References
+    held elsewhere (place.owner, user.places...) keep the version they were
+    taken at; get() returns the current one.
+    """
+    _chunked = True
+
+    def __init__(self, indexes=(), unique=(), ordered=()):
+        super().__init__(indexes, unique, ordered)
+        self._lock = threading.RLock()
+        self._snapshot = None
+
+    def _freeze(self):
+        """Read-only repository sharing the current chunks"""
+        frozen = InMemoryRepository()
+        frozen._storage = self._storage.freeze()
+        frozen._indexes = {name: index.freeze() for name, index in self._indexes.items()}
+        frozen._ordered = {name: index.freeze() for name, index in self._ordered.items()}
+        frozen.version = self.version
+        return frozen
+
+    def snapshot(self):
+        """Return a read-only InMemoryRepository at the current version"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != self.version:
+                self._snapshot = self._freeze()
+            return self._snapshot
+
+    def add(self, obj):
+        with self._lock:
+            super().add(obj)
+
+    def update(self, obj_id, data):
+        with self._lock:
+            current = self._storage.get(obj_id)
+            if current is None:
+                return None
+            # les setters valident sur la copie : une erreur ne touche à rien
+            obj = copy.copy(current)
+            for key, value in data.items():
+                setattr(obj, key, value)
+            touched = [index for index in self._all_indexes() if index.attr_name in data]
+            for index in touched:
+                index.check(obj, getattr(obj, index.attr_name, None))
+            for index in touched:
+                index.remove(current)
+                index.add(obj)
+            self._storage[obj_id] = obj
+            if self.journal is not None:
+                self.journal.put(obj)
+            self.version += 1
+            return obj
+
+    def save(self, obj):
+        with self._lock:
+            super().save(obj)
+
+    def delete(self, obj_id):
+        with self._lock:
+            super().delete(obj_id)
+
+    # get() et get_many() restent de simples lectures du dict, atomiques
+    # sous CPython
+    def get_all(self):
+        return self.snapshot().get_all()
+
+    def get_by_attribute(self, attr_name, attr_value):
+        index = self._indexes.get(attr_name)
+        if attr_name == 'id' or (index is not None and index.unique):
+            # deux lectures de dict atomiques, pas besoin de snapshot
+            return super().get_by_attribute(attr_name, attr_value)
+        return self.snapshot().get_by_attribute(attr_name, attr_value)
+
+    def find_by_attribute(self, attr_name, attr_value):
+        return self.snapshot().find_by_attribute(attr_name, attr_value)
+
+    def query(self, filters=None, order_by=None, limit=None, offset=0):
+        return self.snapshot().query(filters, order_by, limit, offset)
@@ -1,3 +1,5 @@
+import os
 from app.services.facade import HBnBFacade
 
-facade = HBnBFacade()
+facade = HBnBFacade(concurrent=os.getenv('HBNB_CONCURRENT', '0') == '1',
+                    data_dir=os.getenv('HBNB_DATA_DIR'))
@@ -1,15 +1,28 @@
-from app.persistence.repository import InMemoryRepository
+from app.persistence.repository import InMemoryRepository, ConcurrentInMemoryRepository
+from app.persistence.durable import DurableStore
 from app.models.user import User
 from app.models.amenity import Amenity
 from app.models.place import Place
 from app.models.review import Review
 
 class HBnBFacade:
-    def __init__(self):
-        self.user_repo = InMemoryRepository()
-        self.amenity_repo = InMemoryRepository()
-        self.place_repo = InMemoryRepository()
-        self.review_repo = InMemoryRepository()
+    def __init__(self, concurrent=False, data_dir=None):
+        # concurrent: repositories sûres pour un serveur WSGI multi-thread
+        repository = ConcurrentInMemoryRepository if concurrent else InMemoryRepository
+        self.user_repo = repository(unique=['email'])
+        self.amenity_repo = repository(unique=['name'])
+        self.place_repo = repository(ordered=['price', 'created_at'])
+        self.review_repo = repository(ordered=['rating', 'created_at'])
+
+        # data_dir: journal + snapshots pour retrouver les données au redémarrage
+        self.store = None
+        if data_dir:
+            self.store = DurableStore(data_dir)
+            self.store.attach('users', self.user_repo)
+            self.store.attach('amenities', self.amenity_repo)
+            self.store.attach('places', self.place_repo)
+            self.store.attach('reviews', self.review_repo)
+            self.store.recover()
 
     # USER
     def create_user(self, user_data):
@@ -27,7 +40,7 @@ class HBnBFacade:
         return self.user_repo.get_by_attribute('email', email)
     
     def update_user(self, user_id, user_data):
-        self.user_repo.update(user_id, user_data)
+        return self.user_repo.update(user_id, user_data)
     
     # AMENITY
     def create_amenity(self, amenity_data):
@@ -38,11 +51,14 @@ class HBnBFacade:
     def get_amenity(self, amenity_id):
         return self.amenity_repo.get(amenity_id)
 
+    def get_amenities(self, amenity_ids):
+        return self.amenity_repo.get_many(amenity_ids)
+
     def get_all_amenities(self):
         return self.amenity_repo.get_all()
 
     def update_amenity(self, amenity_id, amenity_data):
-        self.amenity_repo.update(amenity_id, amenity_data)
+        return self.amenity_repo.update(amenity_id, amenity_data)
 
     # PLACE
     def create_place(self, place_data):
@@ -53,26 +69,27 @@ class HBnBFacade:
         place_data['owner'] = user
         amenities = place_data.pop('amenities', None)
         if amenities:
-            for a in amenities:
-                amenity = self.get_amenity(a['id'])
-                if not amenity:
-                    raise KeyError('Invalid input data')
+            amenity_ids = {a['id'] for a in amenities}
+            if len(self.get_amenities(amenity_ids)) != len(amenity_ids):
+                raise KeyError('Invalid input data')
         place = Place(**place_data)
+        # pas encore stockée : aucun snapshot ne la voit, on peut la modifier
+        for amenity in amenities or ():
+            place.add_amenity(amenity)
         self.place_repo.add(place)
-        user.add_place(place)
-        if amenities:
-            for amenity in amenities:
-                place.add_amenity(amenity)
+        # un objet stocké n'est jamais modifié sur place : update() remplace
+        # la liste, les snapshots gardent l'ancienne
+        self.user_repo.update(user.id, {'places': user.places + [place]})
         return place
 
     def get_place(self, place_id):
         return self.place_repo.get(place_id)
 
-    def get_all_places(self):
-        return self.place_repo.get_all()
+    def get_all_places(self, filters=None, order_by=None, limit=None, offset=0):
+        return self.place_repo.query(filters, order_by, limit, offset)
 
     def update_place(self, place_id, place_data):
-        self.place_repo.update(place_id, place_data)
+        return self.place_repo.update(place_id, place_data)
 
     # REVIEWS
     def create_review(self, review_data):
@@ -90,15 +107,15 @@ class HBnBFacade:
 
         review = Review(**review_data)
         self.review_repo.add(review)
-        user.add_review(review)
-        place.add_review(review)
+        self.user_repo.update(user.id, {'reviews': user.reviews + [review]})
+        self.place_repo.update(place.id, {'reviews': place.reviews + [review]})
         return review
         
     def get_review(self, review_id):
         return self.review_repo.get(review_id)
 
-    def get_all_reviews(self):
-        return self.review_repo.get_all()
+    def get_all_reviews(self, filters=None, order_by=None, limit=None, offset=0):
+        return self.review_repo.query(filters, order_by, limit, offset)
 
     def get_reviews_by_place(self, place_id):
         place = self.place_repo.get(place_id)
@@ -107,7 +124,7 @@ class HBnBFacade:
         return place.reviews
 
     def update_review(self, review_id, review_data):
-        self.review_repo.update(review_id, review_data)
+        return self.review_repo.update(review_id, review_data)
 
     def delete_review(self, review_id):
         review = self.review_repo.get(review_id)
@@ -115,6 +132,6 @@ class HBnBFacade:
         user = self.user_repo.get(review.user.id)
         place = self.place_repo.get(review.place.id)
 
-        user.delete_review(review)
-        place.delete_review(review)
+        self.user_repo.update(user.id, {'reviews': [r for r in user.reviews if r.id != review_id]})
+        self.place_repo.update(place.id, {'reviews': [r for r in place.reviews if r.id != review_id]})
         self.review_repo.delete(review_id)
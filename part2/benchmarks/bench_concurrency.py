@@ -0,0 +1,89 @@
+"""Throughput of a shared repository under 1/4/16 threads.
+
+Each thread runs a read-mostly mix (get, get_by_attribute, paged query,
+and one add every write_every operations) for DURATION seconds. The plain
+InMemoryRepository is guarded by a global lock, which is what it needs to
+be used safely from several threads.
+
+Usage: python benchmarks/bench_concurrency.py [objects] [write_every]
+"""
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.user import User
+from app.persistence.repository import InMemoryRepository, ConcurrentInMemoryRepository
+
+DURATION = 2.0
+WRITE_EVERY = 1000
+
+
+class LockedRepository:
+    """InMemoryRepository behind a single global lock"""
+
+    def __init__(self, repo):
+        self._repo = repo
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self._repo, name)
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return method(*args, **kwargs)
+        return locked
+
+
+def worker(repo, ids, counts, slot, stop, write_every):
+    ops = 0
+    while not stop.is_set():
+        obj_id = ids[ops % len(ids)]
+        if ops % write_every == 0:
+            repo.add(User('John', 'Doe', f'{slot}.{ops}.{time.perf_counter_ns()}@example.com'))
+        elif ops % 3 == 0:
+            repo.query(order_by='-created_at', limit=20)
+        elif ops % 3 == 1:
+            repo.get_by_attribute('email', f'user{ops % len(ids)}@example.com')
+        else:
+            repo.get(obj_id)
+        ops += 1
+    counts[slot] = ops
+
+
+def run(make_repo, size, threads, write_every):
+    repo = make_repo()
+    ids = []
+    for i in range(size):
+        user = User('John', 'Doe', f'user{i}@example.com')
+        repo.add(user)
+        ids.append(user.id)
+    counts = [0] * threads
+    stop = threading.Event()
+    pool = [threading.Thread(target=worker, args=(repo, ids, counts, i, stop, write_every)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in pool:
+        thread.join()
+    return sum(counts) / DURATION
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    write_every = int(sys.argv[2]) if len(sys.argv) > 2 else WRITE_EVERY
+    options = dict(unique=['email'], ordered=['created_at'])
+    backends = [
+        ('global lock', lambda: LockedRepository(InMemoryRepository(**options))),
+        ('copy-on-write', lambda: ConcurrentInMemoryRepository(**options)),
+    ]
+    print(f"{'threads':>8} " + ' '.join(f'{name + " (ops/s)":>24}' for name, _ in backends))
+    for threads in (1, 4, 16):
+        results = [run(make_repo, size, threads, write_every) for _, make_repo in backends]
+        print(f"{threads:>8} " + ' '.join(f'{ops:>24,.0f}' for ops in results))
+
+
+if __name__ == '__main__':
+    main()
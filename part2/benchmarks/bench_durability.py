@@ -0,0 +1,49 @@
+"""Restart time of a DurableStore: log replay only vs snapshot.
+
+Usage: python benchmarks/bench_durability.py [objects]
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.user import User
+from app.persistence.durable import DurableStore
+from app.persistence.repository import InMemoryRepository
+
+
+def open_store(directory):
+    users = InMemoryRepository(unique=['email'])
+    store = DurableStore(directory, sync_interval=0, snapshot_every=0)
+    store.attach('users', users)
+    start = time.perf_counter()
+    store.recover()
+    return store, users, time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as directory:
+        store, users, _ = open_store(directory)
+        start = time.perf_counter()
+        for i in range(size):
+            users.add(User('John', 'Doe', f'user{i}@example.com'))
+        store.sync()
+        elapsed = time.perf_counter() - start
+        print(f"write {size} objects: {elapsed:.2f}s ({size / elapsed:,.0f}/s)")
+        store.close()
+
+        store, users, elapsed = open_store(directory)
+        print(f"restart from log ({os.path.getsize(store.log_path) / 1e6:.0f} MB): {elapsed:.2f}s")
+        store.snapshot()
+        store.close()
+
+        store, users, elapsed = open_store(directory)
+        print(f"restart from snapshot ({os.path.getsize(store.snapshot_path) / 1e6:.0f} MB): {elapsed:.2f}s")
+        assert len(users.get_all()) == size
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Lookup time of get_by_attribute('email') with and without a hash index.
+
+Usage: python benchmarks/bench_indexes.py [max_size]
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.user import User
+from app.persistence.repository import InMemoryRepository
+
+LOOKUPS = 1000
+
+
+def fill(repo, size):
+    for i in range(size):
+        repo.add(User('John', 'Doe', f'user{i}@example.com'))
+
+
+def bench(size, unique):
+    repo = InMemoryRepository(unique=unique)
+    fill(repo, size)
+    target = f'user{size - 1}@example.com'
+    # le scan linéaire est trop lent pour répéter 1000 fois sur 1M d'objets
+    number = LOOKUPS if unique else max(1, LOOKUPS * 1000 // size)
+    elapsed = timeit.timeit(lambda: repo.get_by_attribute('email', target), number=number)
+    return elapsed / number * 1e6
+
+
+def main():
+    max_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{'objects':>10} {'scan (us)':>12} {'index (us)':>12}")
+    size = 1000
+    while size <= max_size:
+        scan = bench(size, ()) if size <= 100_000 else float('nan')
+        indexed = bench(size, ('email',))
+        print(f"{size:>10} {scan:>12.2f} {indexed:>12.2f}")
+        size *= 10
+
+
+if __name__ == '__main__':
+    main()
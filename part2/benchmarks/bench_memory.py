@@ -0,0 +1,68 @@
+"""Memory used per entity, measured with tracemalloc.
+
+"before" is the layout the models had before __slots__: attributes in a
+per-instance dict and created_at/updated_at as datetime objects, rebuilt
+here by DictUser/DictAmenity. "after" uses the current models.
+
+Usage: python benchmarks/bench_memory.py [objects]
+"""
+import os
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.amenity import Amenity
+from app.models.user import User
+
+
+class DictEntity:
+    """BaseModel before __slots__"""
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.created_at = datetime.now()
+        self.updated_at = datetime.now()
+
+
+class DictUser(DictEntity):
+    def __init__(self, first_name, last_name, email):
+        super().__init__()
+        # mêmes attributs (noms privés) que User
+        self._User__first_name = first_name
+        self._User__last_name = last_name
+        self._User__email = email
+        self._User__is_admin = False
+
+
+class DictAmenity(DictEntity):
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+
+
+def measure(factory, size):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = [factory(i) for i in range(size)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # la liste elle-même n'est pas comptée
+    return (after - before - sys.getsizeof(objs)) / len(objs)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    entities = [
+        ('User', lambda i: DictUser('John', 'Doe', f'user{i}@example.com'),
+         lambda i: User('John', 'Doe', f'user{i}@example.com')),
+        ('Amenity', lambda i: DictAmenity(f'amenity{i}'), lambda i: Amenity(f'amenity{i}')),
+    ]
+    print(f"{'':>8}  {'before':>8}  {'after':>8}  (bytes/entity)")
+    for name, baseline, current in entities:
+        print(f"{name:>8}  {measure(baseline, size):>8.0f}  {measure(current, size):>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
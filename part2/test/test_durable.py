@@ -0,0 +1,117 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.models.base_model import BaseModel
+from app.models.user import User
+from app.persistence.durable import DurableStore
+from app.persistence.repository import InMemoryRepository
+
+
+#test durabilité
+
+class Listing(BaseModel):
+    def __init__(self, title, owner):
+        super().__init__()
+        self.title = title
+        self.owner = owner
+
+
+def open_store(directory, **kwargs):
+    users = InMemoryRepository(unique=['email'])
+    listings = InMemoryRepository()
+    store = DurableStore(str(directory), sync_interval=0, **kwargs)
+    store.attach('users', users)
+    store.attach('listings', listings)
+    store.recover()
+    return store, users, listings
+
+
+def test_recover_from_log(tmp_path):
+    store, users, listings = open_store(tmp_path)
+    john = User("John", "Doe", "john@example.com")
+    jane = User("Jane", "Doe", "jane@example.com")
+    users.add(john)
+    users.add(jane)
+    listing = Listing("Loft", john)
+    listings.add(listing)
+    users.update(john.id, {'first_name': "Johnny"})
+    users.delete(jane.id)
+    store.close()
+
+    store, users, listings = open_store(tmp_path)
+    assert [user.first_name for user in users.get_all()] == ["Johnny"]
+    assert users.get_by_attribute('email', "john@example.com").id == john.id
+    # la référence vers le propriétaire pointe sur l'objet du repository
+    assert listings.get(listing.id).owner is users.get(john.id)
+    store.close()
+
+
+def test_recover_from_snapshot_and_log(tmp_path):
+    store, users, listings = open_store(tmp_path, snapshot_every=10)
+    for i in range(25):
+        users.add(User("John", "Doe", f"user{i}@example.com"))
+    store.close()
+    assert os.path.exists(store.snapshot_path)
+    assert not store._rotated_logs()
+
+    store, users, listings = open_store(tmp_path)
+    assert len(users.get_all()) == 25
+    store.close()
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    store, users, listings = open_store(tmp_path)
+    users.add(User("John", "Doe", "john@example.com"))
+    users.add(User("Jane", "Doe", "jane@example.com"))
+    store.close()
+    with open(store.log_path, 'r+b') as f:
+        f.truncate(os.path.getsize(store.log_path) - 3)
+
+    store, users, listings = open_store(tmp_path)
+    assert [user.email for user in users.get_all()] == ["john@example.com"]
+    users.add(User("Bob", "Doe", "bob@example.com"))
+    store.close()
+
+    store, users, listings = open_store(tmp_path)
+    assert len(users.get_all()) == 2
+    store.close()
+
+
+def test_rejected_update_is_not_logged(tmp_path):
+    store, users, listings = open_store(tmp_path)
+    john = User("John", "Doe", "john@example.com")
+    users.add(john)
+    version = users.version
+    with pytest.raises(ValueError):
+        users.update(john.id, {'first_name': "Johnny", 'email': "invalid"})
+    assert john.first_name == "John" and users.version == version
+    store.close()
+
+    store, users, listings = open_store(tmp_path)
+    assert users.get(john.id).first_name == "John"
+    store.close()
+
+
+def test_corrupted_rotated_log_fails(tmp_path):
+    store, users, listings = open_store(tmp_path)
+    for name in ("John", "Jane", "Bob"):
+        users.add(User(name, "Doe", f"{name.lower()}@example.com"))
+    store.close()
+    # journal tourné, pas encore couvert par un snapshot
+    rotated = f"{store.log_path}.{1:020d}"
+    os.replace(store.log_path, rotated)
+    with open(rotated, 'r+b') as f:
+        f.seek(os.path.getsize(rotated) // 2)
+        f.write(b'\xff\xff')
+    with pytest.raises(ValueError):
+        open_store(tmp_path)
+
+
+def test_write_before_recover_fails(tmp_path):
+    users = InMemoryRepository()
+    store = DurableStore(str(tmp_path))
+    store.attach('users', users)
+    with pytest.raises(RuntimeError):
+        users.add(User("John", "Doe", "john@example.com"))
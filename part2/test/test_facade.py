@@ -0,0 +1,42 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.services.facade import HBnBFacade
+
+
+#test concurrent facade
+
+@pytest.fixture
+def facade():
+    facade = HBnBFacade(concurrent=True)
+    owner = facade.create_user({'first_name': "John", 'last_name': "Doe", 'email': "john@example.com"})
+    facade.create_place({'title': "Loft", 'description': "", 'price': 10.0, 'latitude': 1.0,
+                         'longitude': 2.0, 'owner_id': owner.id})
+    return facade
+
+
+def test_create_review_leaves_snapshots_unchanged(facade):
+    user = facade.get_user_by_email("john@example.com")
+    place = facade.get_all_places()[0]
+    users, places = facade.user_repo.snapshot(), facade.place_repo.snapshot()
+
+    review = facade.create_review({'text': "Nice", 'rating': 5, 'user_id': user.id, 'place_id': place.id})
+    # les snapshots gardent les objets de leur version
+    assert users.get(user.id).reviews == [] and user.reviews == []
+    assert places.get(place.id).reviews == [] and place.reviews == []
+    assert facade.get_user(user.id).reviews == [review]
+    assert facade.get_place(place.id).reviews == [review]
+
+    facade.delete_review(review.id)
+    assert facade.get_place(place.id).reviews == []
+
+
+def test_create_place_leaves_owner_snapshot_unchanged(facade):
+    user = facade.get_user_by_email("john@example.com")
+    users = facade.user_repo.snapshot()
+    facade.create_place({'title': "Barn", 'description': "", 'price': 20.0, 'latitude': 1.0,
+                         'longitude': 2.0, 'owner_id': user.id})
+    assert len(users.get(user.id).places) == 1
+    assert len(facade.get_user(user.id).places) == 2
@@ -0,0 +1,317 @@
+import pytest
+import sys
+import os
+import random
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from app.models.base_model import BaseModel
+from app.models.user import User
+from sortedcontainers import SortedList
+
+from app.persistence.chunks import CHUNK, OrderedChunks, SortedChunks
+from app.persistence.repository import InMemoryRepository, ConcurrentInMemoryRepository
+
+
+#test index
+
+@pytest.fixture
+def repo():
+    return InMemoryRepository(unique=['email'], indexes=['last_name'])
+
+
+def test_get_by_attribute_uses_unique_index(repo):
+    user = User("John", "Doe", "john@example.com")
+    repo.add(user)
+    assert repo.get_by_attribute('email', "john@example.com") is user
+    assert repo.get_by_attribute('email', "nobody@example.com") is None
+
+
+def test_unique_index_rejects_duplicate(repo):
+    repo.add(User("John", "Doe", "john@example.com"))
+    with pytest.raises(ValueError):
+        repo.add(User("Jane", "Doe", "john@example.com"))
+    assert len(repo.get_all()) == 1
+
+
+def test_non_unique_index(repo):
+    john = User("John", "Doe", "john@example.com")
+    jane = User("Jane", "Doe", "jane@example.com")
+    repo.add(john)
+    repo.add(jane)
+    assert repo.find_by_attribute('last_name', "Doe") == [john, jane]
+
+
+def test_index_follows_update(repo):
+    user = User("John", "Doe", "john@example.com")
+    repo.add(user)
+    repo.update(user.id, {'email': "new@example.com", 'last_name': "Smith"})
+    assert repo.get_by_attribute('email', "john@example.com") is None
+    assert repo.get_by_attribute('email', "new@example.com") is user
+    assert repo.find_by_attribute('last_name', "Doe") == []
+    assert repo.find_by_attribute('last_name', "Smith") == [user]
+
+
+def test_update_to_taken_value_is_rejected(repo):
+    john = User("John", "Doe", "john@example.com")
+    jane = User("Jane", "Doe", "jane@example.com")
+    repo.add(john)
+    repo.add(jane)
+    with pytest.raises(ValueError):
+        repo.update(jane.id, {'email': "john@example.com"})
+    assert jane.email == "jane@example.com"
+    assert repo.get_by_attribute('email', "jane@example.com") is jane
+
+
+def test_index_follows_delete(repo):
+    user = User("John", "Doe", "john@example.com")
+    repo.add(user)
+    repo.delete(user.id)
+    assert repo.get_by_attribute('email', "john@example.com") is None
+    assert repo.find_by_attribute('last_name', "Doe") == []
+
+
+def test_get_many(repo):
+    john = User("John", "Doe", "john@example.com")
+    jane = User("Jane", "Doe", "jane@example.com")
+    repo.add(john)
+    repo.add(jane)
+    assert repo.get_many([jane.id, "unknown-id", john.id, jane.id]) == [jane, john]
+    assert repo.get_many([]) == []
+
+
+#test get_all view
+
+def test_get_all_view_is_reused(repo):
+    users = [User("John", "Doe", f"user{i}@example.com") for i in range(5)]
+    for user in users:
+        repo.add(user)
+    view = repo.get_all()
+    assert repo.get_all() is view
+    assert len(view) == 5
+    assert list(view) == users
+    assert view[1:3] == users[1:3]
+    assert view[-1] is users[-1]
+    with pytest.raises(IndexError):
+        view[5]
+    repo.delete(users[0].id)
+    assert repo.get_all() is not view
+    assert repo.get_all().version == view.version + 1
+
+
+def test_get_all_view_survives_writes_during_iteration(repo):
+    users = [User("John", "Doe", f"user{i}@example.com") for i in range(3)]
+    for user in users:
+        repo.add(user)
+    objs = iter(repo.get_all())
+    next(objs)
+    # un autre thread ajoute pendant qu'une liste est sérialisée
+    repo.add(User("Jane", "Doe", "jane@example.com"))
+    repo.delete(users[2].id)
+    assert list(objs) == users[1:]
+
+
+def test_get_all_view_copies_no_table(repo):
+    for i in range(CHUNK * 3):
+        repo.add(User("John", "Doe", f"user{i}@example.com"))
+    view = repo.get_all()
+    # la vue partage les chunks ; une écriture ne copie que le sien
+    assert all(a is b for a, b in zip(view._storage._chunks, repo._storage._chunks))
+    repo.delete(view[-1].id)
+    shared = [a is b for a, b in zip(view._storage._chunks, repo._storage._chunks)]
+    assert shared == [True, True, False] and len(view) == CHUNK * 3
+
+
+#test query
+
+class Listing(BaseModel):
+    def __init__(self, title, price, city=None):
+        super().__init__()
+        self.title = title
+        self.price = price
+        self.city = city
+
+
+@pytest.fixture
+def listings():
+    repo = InMemoryRepository(indexes=['city'], ordered=['price'])
+    for title, price, city in [("a", 50, "Paris"), ("b", 120, "Lyon"), ("c", 80, "Paris"),
+                               ("d", 200, "Paris"), ("e", 80, None)]:
+        repo.add(Listing(title, price, city))
+    return repo
+
+
+def titles(objs):
+    return [obj.title for obj in objs]
+
+
+def test_query_price_band(listings):
+    result = listings.query({'price__gte': 80, 'price__lt': 200}, order_by='price')
+    assert sorted(titles(result)) == ["b", "c", "e"]
+    assert [obj.price for obj in result] == [80, 80, 120]
+
+
+def test_query_order_descending_with_limit_offset(listings):
+    result = listings.query(order_by='-price', limit=2, offset=1)
+    assert [obj.price for obj in result] == [120, 80]
+
+
+def test_query_combines_indexes_and_residual_filters(listings):
+    result = listings.query({'city': "Paris", 'price__gt': 60, 'title__ne': "d"})
+    assert titles(result) == ["c"]
+
+
+def test_query_in_operator_and_scan(listings):
+    result = listings.query({'city__in': ["Lyon", None], 'title__in': ["b", "e"]}, order_by='title')
+    assert titles(result) == ["b", "e"]
+    assert titles(listings.query({'title': "e"})) == ["e"]
+
+
+def test_query_in_operator_ignores_repeated_values():
+    repo = InMemoryRepository(indexes=['price'])
+    for title, price in [("a", 1), ("b", 2), ("c", 3)]:
+        repo.add(Listing(title, price))
+    assert sorted(titles(repo.query({'price__in': [1, 1, 2]}))) == ["a", "b"]
+
+
+def test_query_always_returns_a_list(listings):
+    assert isinstance(listings.query(), list) and len(listings.query()) == 5
+    assert isinstance(listings.query({'city': "Paris"}), list)
+
+
+def test_query_follows_update(listings):
+    cheap = listings.query({'price__lt': 60})[0]
+    listings.update(cheap.id, {'price': 500})
+    assert listings.query({'price__lt': 60}) == []
+    assert listings.query(order_by='-price', limit=1) == [cheap]
+
+
+def test_query_unknown_operator(listings):
+    with pytest.raises(ValueError):
+        listings.query({'price__between': (1, 2)})
+
+
+#test concurrent repository
+
+def test_snapshot_is_reused_until_next_write():
+    repo = ConcurrentInMemoryRepository(unique=['email'])
+    repo.add(User("John", "Doe", "john@example.com"))
+    snapshot = repo.snapshot()
+    assert repo.snapshot() is snapshot
+    repo.add(User("Jane", "Doe", "jane@example.com"))
+    assert repo.snapshot() is not snapshot
+    assert len(snapshot.get_all()) == 1
+    assert len(repo.get_all()) == 2
+    assert repo.snapshot().version == repo.version == 2
+
+
+def test_concurrent_readers_and_writers():
+    repo = ConcurrentInMemoryRepository(unique=['email'], ordered=['created_at'])
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(200):
+                user = User("John", "Doe", f"user{n}.{i}@example.com")
+                repo.add(user)
+                if i % 2:
+                    repo.delete(user.id)
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(200):
+                users = repo.get_all()
+                assert len(users) == len(set(user.id for user in users))
+                repo.query(order_by='-created_at', limit=5)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    threads += [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(repo.get_all()) == 400
+
+
+def test_concurrent_update_swaps_a_copy():
+    repo = ConcurrentInMemoryRepository(unique=['email'], indexes=['last_name'])
+    user = User("John", "Doe", "john@example.com")
+    repo.add(user)
+    snapshot = repo.snapshot()
+    updated = repo.update(user.id, {'last_name': "Smith", 'email': "smith@example.com"})
+    assert updated is not user and repo.get(user.id) is updated
+    # le snapshot garde l'objet et les index de sa version
+    assert user.last_name == "Doe"
+    assert snapshot.get(user.id) is user
+    assert snapshot.find_by_attribute('last_name', "Doe") == [user]
+    assert repo.find_by_attribute('last_name', "Smith") == [updated]
+    assert repo.get_by_attribute('email', "john@example.com") is None
+    repo.add(User("Jane", "Doe", "john@example.com"))
+
+
+def test_concurrent_update_rejected_leaves_the_object():
+    repo = ConcurrentInMemoryRepository(unique=['email'])
+    john = User("John", "Doe", "john@example.com")
+    repo.add(john)
+    repo.add(User("Jane", "Doe", "jane@example.com"))
+    with pytest.raises(ValueError):
+        repo.update(john.id, {'first_name': "Johnny", 'email': "jane@example.com"})
+    assert repo.get(john.id) is john and john.first_name == "John"
+
+
+#test chunks
+
+def test_ordered_chunks_freeze_copies_only_written_chunks():
+    live = OrderedChunks()
+    for i in range(CHUNK * 4):
+        live[i] = i
+    frozen = live.freeze()
+    live[0] = 'changed'
+    live.pop(CHUNK * 2)
+    live['new'] = 'new'
+    assert frozen[0] == 0 and CHUNK * 2 in frozen and 'new' not in frozen
+    assert list(frozen) == list(range(CHUNK * 4))
+    # seuls les chunks écrits ont été copiés, 'new' ouvre un chunk
+    shared = [a is b for a, b in zip(live._chunks, frozen._chunks)]
+    assert shared == [False, True, False, True] and len(live._chunks) == 5
+    assert list(live)[:2] == [0, 1] and list(live)[-1] == 'new'
+
+
+def test_ordered_chunks_compact_after_deletes():
+    live = OrderedChunks()
+    for i in range(CHUNK * 4):
+        live[i] = i
+    for i in range(CHUNK * 4):
+        if i % 4:
+            live.pop(i)
+    assert len(live._chunks) <= 2
+    assert list(live) == list(range(0, CHUNK * 4, 4))
+    assert all(live.get(i) == i for i in live)
+
+
+def test_sorted_chunks_match_a_sorted_list():
+    rng = random.Random(1)
+    live, expected = SortedChunks(), SortedList()
+    frozen, frozen_expected = None, None
+    for step in range(CHUNK * 8):
+        item = (rng.randrange(CHUNK * 2), step)
+        live.add(item)
+        expected.add(item)
+        if step % 3 == 0:
+            victim = expected[rng.randrange(len(expected))]
+            live.discard(victim)
+            expected.discard(victim)
+        if step == CHUNK * 4:
+            frozen, frozen_expected = live.freeze(), list(expected)
+    assert list(live.islice()) == list(expected)
+    assert list(frozen.islice()) == frozen_expected
+    for value in (0, 17, CHUNK, CHUNK * 2):
+        assert live.bisect_left((value,)) == expected.bisect_left((value,))
+        assert live.bisect_right((value, CHUNK * 8)) == expected.bisect_right((value, CHUNK * 8))
+    assert list(live.islice(10, 700)) == list(expected.islice(10, 700))
+    assert list(live.islice(10, 700, reverse=True)) == list(expected.islice(10, 700, reverse=True))
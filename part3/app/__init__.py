@@ -2,6 +2,9 @@ from flask import Flask
 from flask_restx import Api
 
 from app.extensions import db, bcrypt, jwt
+from app import passwords, ratelimit, tokens
+from app.persistence import cache, engine, replication, sharding, unit_of_work
+from app.api.v1 import fragments
 from app.api.v1.users import api as users_ns
 from app.api.v1.amenities import api as amenities_ns
 from app.api.v1.places import api as places_ns
@@ -14,13 +17,25 @@ import config
 
 
 def create_app(config_class=config.DevelopmentConfig):
+    """config_class: a config class or a profile name ('dev', 'test', 'prod-sqlite', 'prod-postgres')"""
+    if isinstance(config_class, str):
+        config_class = config.config[config_class]
     app = Flask(__name__)
     app.config.from_object(config_class)
     
     # Init les extensions
     bcrypt.init_app(app)
+    passwords.init_app(app)
     jwt.init_app(app)
+    tokens.init_app(app)
     db.init_app(app)
+    engine.init_app(app)
+    replication.init_app(app)
+    sharding.init_app(app)
+    unit_of_work.init_app(app)
+    cache.init_app(app)
+    fragments.init_app(app)
+    ratelimit.init_app(app)
 
     api = Api(app, version='1.0', title='HBnB API', description='HBnB Application API')
 
@@ -1,7 +1,8 @@
 from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import create_access_token
 from app.services import facade
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from app import tokens
+from app.passwords import PasswordHasherBusy
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 import json
 
 api = Namespace('auth', description='Authentication operations')
@@ -16,27 +17,55 @@ login_model = api.model('Login', {
 class Login(Resource):
     @api.expect(login_model)
     def post(self):
-        """Authenticate user and return a JWT token"""
+        """Authenticate user and return an access token and a refresh token"""
         credentials = api.payload  # Get the email and password from the request payload
         
-        # Step 1: Retrieve the user based on the provided email
-        user = facade.get_user_by_email(credentials['email'])
-        
-        # Step 2: Check if the user exists and the password is correct
-        if not user or not user.verify_password(credentials['password']):
+        # Step 1 & 2: Retrieve the user and check the password (rehashed if
+        # the cost factor changed)
+        try:
+            user = facade.authenticate(credentials['email'], credentials['password'])
+        except PasswordHasherBusy as e:
+            return {'error': str(e)}, 503, {'Retry-After': '1'}
+        if not user:
             return {'error': 'Invalid credentials'}, 401
 
-        # Step 3: Create a JWT token with the user's id and is_admin flag
-        access_token = create_access_token(identity={'id': str(user.id), 'is_admin': user.is_admin})
-        
-        # Step 4: Return the JWT token to the client
-        return {'access_token': access_token}, 200
-    
+        # Step 3 & 4: Return JWT tokens signed for the user's id, with the
+        # is_admin flag as a claim
+        return tokens.issue(user), 200
+
+
+@api.route('/refresh')
+class Refresh(Resource):
+    @jwt_required(refresh=True)
+    def post(self):
+        """Exchange a refresh token for a new pair of tokens (the old one is revoked)"""
+        claims = get_jwt()
+        tokens.revoke_token(claims)
+        # relu à chaque rotation : un admin rétrogradé perd son claim ici
+        user = facade.get_user(claims['sub'])
+        if not user:
+            return {'error': 'User not found'}, 401
+        return tokens.issue(user, family=claims.get('family')), 200
+
+
+@api.route('/logout')
+class Logout(Resource):
+    @jwt_required(verify_type=False)
+    def post(self):
+        """Revoke the tokens of this login, access and refresh"""
+        claims = get_jwt()
+        if claims.get('family'):
+            tokens.revoke_family(claims['family'])
+        else:
+            tokens.revoke_token(claims)
+        return {'message': 'Logged out'}, 200
+
+
 @api.route('/protected')
 class ProtectedResource(Resource):
     @jwt_required()
     def get(self):
         """ A protected endpoint that requires a valid JWT token"""
         current_user = get_jwt_identity() # Retrieve the user's identity from the token
-        return {'message': f'Hello, user {current_user["id"]}'}, 200
+        return {'message': f'Hello, user {current_user}'}, 200
     
\ No newline at end of file
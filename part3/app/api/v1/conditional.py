@@ -0,0 +1,95 @@
+"""Conditional GET: ETag and Last-Modified validators, 304 responses.
+
+An endpoint decorated with validated() first computes the version of
+what it would send (updated_at of an entity, count and last updated_at of
+a collection). Only entities send Last-Modified: deleting an item from a
+collection leaves its last updated_at unchanged, the count in its ETag
+does change. If the client already holds it (If-None-Match, or
+If-Modified-Since without If-None-Match), the answer is an empty 304: the
+endpoint itself does not run and nothing is serialized. The Cache-Control
+header of each namespace comes from the CACHE_CONTROL config.
+
+A collection can be sent as JSON or NDJSON depending on Accept (see
+fragments.py): its ETag includes the mode and the response varies on Accept.
+"""
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, request
+from flask_restx.utils import unpack
+from werkzeug.http import http_date
+
+from app.api.v1 import fragments
+
+
+def entity(obj, *related):
+    """Version of a single entity and of the related ones it embeds, None if not found"""
+    if obj is None:
+        return None
+    dates = [item.updated_at for item in (obj,) + related if item is not None]
+    return (obj.id, *dates), max(dates)
+
+
+def collection(*versions):
+    """Version of a list from repository.version(): (count, last updated_at).
+
+    Several versions when the items embed other entities. No
+    Last-Modified: If-Modified-Since would miss the deletes.
+    """
+    # la page renvoyée dépend aussi de limit et cursor, le format de Accept
+    tag = (versions, request.full_path, fragments.streaming_mode())
+    return tag, None, 'Accept'
+
+
+def validators(namespace, etag, last_modified, vary=None):
+    headers = {'ETag': f'W/"{etag}"'}
+    if vary:
+        headers['Vary'] = vary
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified.replace(tzinfo=timezone.utc))
+    cache_control = (current_app.config.get('CACHE_CONTROL') or {}).get(namespace.name)
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    return headers
+
+
+def not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if since is None or last_modified is None:
+        return False
+    # Last-Modified est à la seconde près
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def validated(namespace, version):
+    """Answer 304 when the client holds the current version.
+
+    version takes the arguments of the endpoint and returns entity(...) or
+    collection(...), or None to skip validation (not found...). Must be
+    placed above marshal_with, so that a 304 skips serialization.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(resource, *args, **kwargs):
+            current = version(*args, **kwargs)
+            if current is None:
+                return f(resource, *args, **kwargs)
+            tag, last_modified, *vary = current
+            etag = hashlib.blake2b(repr(tag).encode(), digest_size=12).hexdigest()
+            headers = validators(namespace, etag, last_modified, *vary)
+            if not_modified(etag, last_modified):
+                return current_app.response_class(status=304, headers=headers)
+            result = f(resource, *args, **kwargs)
+            if isinstance(result, current_app.response_class):
+                if result.status_code == 200:
+                    result.headers.update(headers)
+                return result
+            data, code, extra = unpack(result)
+            if code == 200:
+                extra = dict(extra, **headers)
+            return data, code, extra
+        return wrapper
+    return decorator
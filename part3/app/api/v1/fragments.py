@@ -0,0 +1,147 @@
+"""Cache of the JSON fragment of each entity, used to build list responses.
+
+A list body is assembled by joining the cached fragments of its items. The
+key is (type, id, updated_at): a write changes updated_at, so an old
+fragment is never served again and just ages out of the LRU. The cache is
+bounded by SERIALIZATION_CACHE_BYTES (0 disables it).
+
+A whole list can also be streamed (?stream=1, or Accept:
+application/x-ndjson for one object per line): rows are then pulled from
+the repository in chunks and written as they come, memory stays bounded
+whatever the size of the table.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request, stream_with_context
+
+_EXTENSION = 'hbnb_fragments'
+NDJSON = 'application/x-ndjson'
+# taille des morceaux envoyés au client pendant un streaming
+STREAM_BUFFER = 64 * 1024
+
+
+class FragmentCache:
+    """Thread-safe LRU of bytes, bounded by the total size of its values"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries), 'bytes': self.size, 'max_bytes': self.max_bytes,
+            'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+        }
+
+
+def init_app(app):
+    max_bytes = app.config.get('SERIALIZATION_CACHE_BYTES', 0)
+    app.extensions[_EXTENSION] = FragmentCache(max_bytes) if max_bytes else None
+
+
+def cache():
+    return current_app.extensions.get(_EXTENSION)
+
+
+def encode(data):
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def fragment(obj, serialize, version=None):
+    """JSON bytes of serialize(obj), from the cache when obj did not change.
+
+    version(obj) replaces obj.updated_at in the key when the fragment also
+    embeds other entities.
+    """
+    fragments = cache()
+    if fragments is None:
+        return encode(serialize(obj))
+    key = (type(obj).__name__, obj.id, version(obj) if version else obj.updated_at)
+    value = fragments.get(key)
+    if value is None:
+        value = encode(serialize(obj))
+        fragments.set(key, value)
+    return value
+
+
+def json_list(objs, serialize, headers=None, version=None):
+    """200 response with the JSON array of the objects"""
+    body = b'[' + b','.join(fragment(obj, serialize, version) for obj in objs) + b']'
+    return current_app.response_class(body, 200, headers, mimetype='application/json')
+
+
+def streaming_mode():
+    """'ndjson', 'json' or None (not streamed), from the request"""
+    if request.accept_mimetypes.best == NDJSON:
+        return 'ndjson'
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return 'json'
+    return None
+
+
+def stream_list(objs, serialize, headers=None, version=None, ndjson=False):
+    """200 response writing the objects while they are read from objs"""
+    def chunks():
+        pending, size = [b'' if ndjson else b'['], 0
+        separator = b''
+        for obj in objs:
+            data = fragment(obj, serialize, version)
+            pending.append(data + b'\n' if ndjson else separator + data)
+            separator = b','
+            size += len(data)
+            if size >= STREAM_BUFFER:
+                yield b''.join(pending)
+                pending, size = [], 0
+        if not ndjson:
+            pending.append(b']')
+        yield b''.join(pending)
+
+    mimetype = NDJSON if ndjson else 'application/json'
+    return current_app.response_class(stream_with_context(chunks()), 200, headers, mimetype=mimetype)
+
+
+def list_response(objs, serialize, headers=None, version=None):
+    """Whole list, streamed if the client asked for it"""
+    # JSON ou NDJSON selon Accept : les caches doivent le savoir
+    headers = dict(headers or {}, Vary='Accept')
+    mode = streaming_mode()
+    if mode is None:
+        return json_list(objs, serialize, headers, version)
+    return stream_list(objs, serialize, headers, version, ndjson=mode == 'ndjson')
@@ -0,0 +1,45 @@
+"""Cursor pagination shared by the list endpoints.
+
+Without limit nor cursor, an endpoint still returns the whole list. Otherwise
+it returns one page, ordered by (created_at, id). The cursor of the next page
+is sent in the X-Next-Cursor and Link headers.
+"""
+from urllib.parse import urlencode
+
+from flask import request
+from flask_restx import reqparse
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# uniquement pour la documentation Swagger des paramètres
+parser = reqparse.RequestParser()
+parser.add_argument('limit', type=int, location='args', help=f'Page size (1-{MAX_LIMIT})')
+parser.add_argument('cursor', type=str, location='args', help='Cursor returned by the previous page')
+parser.add_argument('stream', type=bool, location='args',
+                    help='Without limit nor cursor: stream the whole list (or send Accept: application/x-ndjson)')
+
+
+def requested_page():
+    """Return (limit, cursor), or None when the client wants the whole list"""
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    if limit is None and not cursor:
+        return None
+    try:
+        limit = DEFAULT_LIMIT if limit is None else int(limit)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+    return limit, cursor or None
+
+
+def page_headers(limit, next_cursor):
+    """X-Next-Cursor and Link headers pointing to the next page"""
+    if not next_cursor:
+        return {}
+    args = request.args.to_dict()
+    args.update(limit=limit, cursor=next_cursor)
+    url = f"{request.base_url}?{urlencode(args)}"
+    return {'X-Next-Cursor': next_cursor, 'Link': f'<{url}>; rel="next"'}
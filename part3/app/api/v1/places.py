@@ -1,6 +1,8 @@
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from app.models.review import Review
 from app.services import facade
+from app.api.v1 import conditional, fragments, pagination, serializers
 
 api = Namespace('places', description='Place operations')
 
@@ -35,10 +37,31 @@ place_output_model = api.inherit('PlaceOutput', place_model, {
 })
 
 
+serialize_place = serializers.compile_model(
+    place_output_model, amenities=lambda place: [amenity.id for amenity in place.amenities])
+
+# la sortie embarque owner et les ids des amenities : chargés en 2 requêtes
+# pour toute la liste au lieu d'une par place
+PLACE_LOAD = {'owner': 'joined', 'amenities': 'selectin'}
+
+
+def place_version(place):
+    return place.updated_at, place.owner.updated_at if place.owner else None
+
+
+def place_entity_version(place_id):
+    place = facade.get_place(place_id)
+    return conditional.entity(place, place.owner) if place else None
+
+
+def places_version():
+    return conditional.collection(facade.get_places_version(), facade.get_users_version())
+
+
 @api.route('/')
 class PlaceList(Resource):
     @api.expect(place_model)
-    @api.marshal_with(place_output_model, code=201)
+    @api.response(201, 'Place successfully created', place_output_model)
     @api.response(400, 'Invalid input data')
     @api.response(401, 'Unauthorized')
     @api.doc(security='apikey')
@@ -55,27 +78,36 @@ class PlaceList(Resource):
 
         
         new_place = facade.create_place(data)
-        return new_place.to_dict(), 201
+        return serialize_place(new_place), 201
 
-    @api.marshal_with(place_output_model, as_list=True)
-    @api.response(200, 'List of places retrieved successfully')
+    @conditional.validated(api, places_version)
+    @api.expect(pagination.parser)
+    @api.response(200, 'List of places retrieved successfully', [place_output_model])
+    @api.response(400, 'Invalid pagination parameters')
     def get(self):
         """Retrieve a list of all places"""
-        places = facade.get_all_places()
-        return [place.to_dict() for place in places], 200
+        try:
+            page = pagination.requested_page()
+            if page is None:
+                return fragments.list_response(facade.get_all_places(load=PLACE_LOAD), serialize_place, version=place_version)
+            places, next_cursor = facade.get_places_page(*page, load=PLACE_LOAD)
+        except ValueError as e:
+            api.abort(400, str(e))
+        headers = pagination.page_headers(page[0], next_cursor)
+        return fragments.json_list(places, serialize_place, headers, version=place_version)
 
 
 @api.route('/<place_id>')
 class PlaceResource(Resource):
-    @api.marshal_with(place_output_model)
-    @api.response(200, 'Place details retrieved successfully')
+    @conditional.validated(api, place_entity_version)
+    @api.response(200, 'Place details retrieved successfully', place_output_model)
     @api.response(404, 'Place not found')
     def get(self, place_id):
         """Get place details by ID"""
         place = facade.get_place(place_id)
         if not place:
             api.abort(404, 'Place not found')
-        return place.to_dict(), 200
+        return serialize_place(place), 200
 
     @api.expect(place_model)
     @api.response(200, 'Place updated successfully')
@@ -94,7 +126,7 @@ class PlaceResource(Resource):
         place = facade.get_place(place_id)
         if not place:
             api.abort(404, 'Place not found')
-        if place.owner.id != current_user and not is_admin:
+        if place.owner_id != current_user and not is_admin:
             api.abort(403, 'Forbidden')
 
         updated = facade.update_place(place_id, api.payload or {})
@@ -115,7 +147,7 @@ class PlaceResource(Resource):
         place = facade.get_place(place_id)
         if not place:
             api.abort(404, 'Place not found')
-        if place.owner.id != current_user and not is_admin:
+        if place.owner_id != current_user and not is_admin:
             api.abort(403, 'Forbidden')
 
         facade.delete_place(place_id)
@@ -141,7 +173,7 @@ class PlaceAmenities(Resource):
         place = facade.get_place(place_id)
         if not place:
             api.abort(404, 'Place not found')
-        if place.owner.id != current_user and not is_admin:
+        if place.owner_id != current_user and not is_admin:
             api.abort(403, 'Forbidden')
 
         amenity_id = api.payload.get('id')
@@ -153,13 +185,29 @@ class PlaceAmenities(Resource):
         return {'message': 'Amenity added successfully'}, 200
 
 
+def place_reviews_version(place_id):
+    if facade.get_place(place_id) is None:
+        return None
+    return conditional.collection(facade.get_reviews_version(place_id))
+
+
 @api.route('/<place_id>/reviews/')
 class PlaceReviewList(Resource):
+    @api.expect(pagination.parser)
     @api.response(200, 'List of reviews for the place retrieved successfully')
+    @api.response(400, 'Invalid pagination parameters')
     @api.response(404, 'Place not found')
+    @conditional.validated(api, place_reviews_version)
     def get(self, place_id):
         """Get all reviews for a specific place"""
         place = facade.get_place(place_id)
         if not place:
             api.abort(404, 'Place not found')
-        return [review.to_dict() for review in place.reviews], 200
+        try:
+            page = pagination.requested_page()
+            if page is None:
+                return fragments.list_response(facade.get_reviews_by_place(place_id), Review.to_dict)
+            reviews, next_cursor = facade.get_reviews_page(*page, place_id=place_id)
+        except ValueError as e:
+            api.abort(400, str(e))
+        return fragments.json_list(reviews, Review.to_dict, pagination.page_headers(page[0], next_cursor))
@@ -1,6 +1,8 @@
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models.review import Review
 from app.services import facade
+from app.api.v1 import conditional, fragments, pagination
 
 api = Namespace('reviews', description='Review operations')
 
@@ -34,11 +36,11 @@ class ReviewList(Resource):
             return {'error': 'Place not found'}, 404
 
         # Pas de review sur sa propre place
-        if place.owner.id == current_user:
+        if place.owner_id == current_user:
             return {'error': 'You cannot review your own place'}, 400
 
         # Une seule review par place
-        if any(r.user_id == current_user for r in place.reviews):
+        if facade.has_reviewed(current_user, place_id):
             return {'error': 'You have already reviewed this place'}, 400
 
         # création
@@ -49,16 +51,27 @@ class ReviewList(Resource):
         except Exception as e:
             return {'error': str(e)}, 400
 
+    @api.expect(pagination.parser)
     @api.response(200, 'List of reviews retrieved successfully')
+    @api.response(400, 'Invalid pagination parameters')
+    @conditional.validated(api, lambda: conditional.collection(facade.get_reviews_version()))
     def get(self):
         """Retrieve a list of all reviews"""
-        return [r.to_dict() for r in facade.get_all_reviews()], 200
+        try:
+            page = pagination.requested_page()
+            if page is None:
+                return fragments.list_response(facade.get_all_reviews(), Review.to_dict)
+            reviews, next_cursor = facade.get_reviews_page(*page)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return fragments.json_list(reviews, Review.to_dict, pagination.page_headers(page[0], next_cursor))
 
 
 @api.route('/<review_id>')
 class ReviewResource(Resource):
     @api.response(200, 'Review details retrieved successfully')
     @api.response(404, 'Review not found')
+    @conditional.validated(api, lambda review_id: conditional.entity(facade.get_review(review_id)))
     def get(self, review_id):
         review = facade.get_review(review_id)
         if not review:
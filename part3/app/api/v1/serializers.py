@@ -0,0 +1,67 @@
+"""Response serializers compiled once per flask-restx model.
+
+compile_model() generates, when the API module is imported, a function
+turning an object into the dict of a model. The object can be an ORM
+instance, a Row returned by a select() of columns, or anything exposing the
+fields as attributes. marshal() walks the field tree for every object. The
+compiled function is a plain dict literal with one conversion per field. The
+models stay declared on the namespace, so Swagger documents them as before.
+
+Same output as marshal(), except for a missing Nested value, which gives
+null instead of a dict of nulls.
+"""
+from flask_restx import fields
+
+_CONVERSIONS = {
+    fields.String: 'str',
+    fields.Integer: 'int',
+    fields.Float: 'float',
+    fields.Boolean: 'bool',
+}
+
+
+def _conversion(field, value, namespace):
+    """Python expression converting value for field"""
+    field_type = type(field)
+    if field_type in _CONVERSIONS:
+        return f"None if {value} is None else {_CONVERSIONS[field_type]}({value})"
+    if isinstance(field, fields.Nested):
+        name = f"_nested{len(namespace)}"
+        namespace[name] = compile_model(field.nested)
+        return f"None if {value} is None else {name}({value})"
+    if isinstance(field, fields.List):
+        item = _conversion(field.container, 'item', namespace)
+        return f"None if {value} is None else [{item} for item in {value}]"
+    if isinstance(field, fields.Raw) and field_type is fields.Raw:
+        return value
+    raise TypeError(f"Cannot compile field {field_type.__name__}")
+
+
+def compile_model(model, **getters):
+    """Return serialize(obj) -> dict for model.
+
+    getters maps a field name to a function of obj computing its value, for
+    fields that are not plain attributes (ids of a relationship...).
+    """
+    namespace = {}
+    lines = ['def serialize(obj):']
+    items = []
+    for i, (name, field) in enumerate(model.resolved.items()):
+        # comme marshal() : une classe de champ vaut son instance par défaut
+        field = field() if isinstance(field, type) else field
+        value = f"v{i}"
+        if name in getters:
+            namespace[f"_get{i}"] = getters[name]
+            lines.append(f"    {value} = _get{i}(obj)")
+        else:
+            attribute = field.attribute if isinstance(field.attribute, str) else name
+            lines.append(f"    {value} = getattr(obj, {attribute!r}, None)")
+        if field.default is not None:
+            namespace[f"_default{i}"] = field.default
+            lines.append(f"    if {value} is None: {value} = _default{i}")
+        items.append(f"{name!r}: {_conversion(field, value, namespace)}")
+    lines.append(f"    return {{{', '.join(items)}}}")
+    exec('\n'.join(lines), namespace)
+    serialize = namespace['serialize']
+    serialize.__doc__ = f"Serialize an object as {model.name}"
+    return serialize
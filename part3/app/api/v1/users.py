@@ -1,6 +1,9 @@
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from flask_restx import Namespace, Resource, fields
+from app.models.user import User
 from app.services import facade
+from app.passwords import PasswordHasherBusy
+from app.api.v1 import conditional, fragments, pagination
 
 api = Namespace('users', description='User operations')
 
@@ -19,6 +22,13 @@ user_update_model = api.model('UserUpdate', {
 })
 
 
+def users_version():
+    # liste réservée aux admins : pas de 304 pour les autres
+    if not get_jwt().get('is_admin', False):
+        return None
+    return conditional.collection(facade.get_users_version())
+
+
 @api.route('/')
 class UserList(Resource):
     @api.doc(security='apikey')
@@ -42,27 +52,39 @@ class UserList(Resource):
         try:
             new_user = facade.create_user(user_data)
             return new_user.to_dict(), 201
+        except PasswordHasherBusy as e:
+            return {'error': str(e)}, 503, {'Retry-After': '1'}
         except Exception as e:
             return {'error': str(e)}, 400
 
     @api.doc(security='apikey')
     @jwt_required()
+    @api.expect(pagination.parser)
     @api.response(200, 'List of users retrieved successfully')
+    @api.response(400, 'Invalid pagination parameters')
     @api.response(403, 'Admin privileges required')
+    @conditional.validated(api, users_version)
     def get(self):
         """Retrieve list of users (Admin only)"""
         claims = get_jwt()
         if not claims.get('is_admin', False):
             return {'error': 'Admin privileges required'}, 403
 
-        users = facade.get_users()
-        return [user.to_dict() for user in users], 200
+        try:
+            page = pagination.requested_page()
+            if page is None:
+                return fragments.list_response(facade.get_users(), User.to_dict)
+            users, next_cursor = facade.get_users_page(*page)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return fragments.json_list(users, User.to_dict, pagination.page_headers(page[0], next_cursor))
 
 
 @api.route('/<user_id>')
 class UserResource(Resource):
     @api.response(200, 'User details retrieved successfully')
     @api.response(404, 'User not found')
+    @conditional.validated(api, lambda user_id: conditional.entity(facade.get_user(user_id)))
     def get(self, user_id):
         """Retrieve details of a specific user"""
         user = facade.get_user(user_id)
@@ -94,6 +116,10 @@ class UserResource(Resource):
         updates = api.payload or {}
         if 'email' in updates or 'password' in updates:
             return {'error': 'You cannot modify email or password'}, 400
+        # seuls les champs de user_update_model (pas is_admin...)
+        other = sorted(set(updates) - set(user_update_model))
+        if other:
+            return {'error': f"You cannot modify {', '.join(other)}"}, 400
 
         try:
             updated = facade.update_user(user_id, updates)
@@ -9,11 +9,11 @@ class Amenity(BaseModel):
 
     name = db.Column(db.String(50), nullable=False, unique=True)
 
+    # chargé à la demande ; les lectures du repository choisissent leur stratégie
     places = relationship(
         "Place",
         secondary=place_amenity,
-        back_populates="amenities",
-        lazy="subquery"
+        back_populates="amenities"
     )
 
     @validates("name")
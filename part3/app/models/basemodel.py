@@ -1,6 +1,7 @@
 from app import db
 import uuid
 from datetime import datetime
+from sqlalchemy.orm import declared_attr
 from app.extensions import db
 
 class BaseModel(db.Model):
@@ -10,6 +11,14 @@ class BaseModel(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # contraintes et index propres à une table, ajoutés à __table_args__
+    _table_args = ()
+
+    @declared_attr
+    def __table_args__(cls):
+        # clé de tri de la pagination par curseur
+        return (db.Index(f'ix_{cls.__tablename__}_created_at_id', 'created_at', 'id'),) + tuple(cls._table_args)
+
     # ...
     def save(self):
         """Update the updated_at timestamp whenever the object is modified"""
@@ -9,17 +9,17 @@ class Place(BaseModel):
 
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=False, index=True)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
-    owner_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=False)
+    owner_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=False, index=True)
 
-    owner = db.relationship("User", backref="places")
+    owner = db.relationship("User", backref=db.backref("places", lazy="dynamic"))
+    # chargé à la demande ; les lectures du repository choisissent leur stratégie
     amenities = relationship(
         "Amenity",
         secondary=place_amenity,
-        back_populates="places",
-        lazy="subquery"
+        back_populates="places"
     )
 
     @validates('title')
@@ -10,11 +10,16 @@ class Review(BaseModel):
     text = db.Column(db.String(1024), nullable=False)
     rating = db.Column(db.Integer, nullable=False)
     place_id = db.Column(db.String(36), db.ForeignKey('places.id'), nullable=False)
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
 
+    # une seule review par utilisateur et par place ; l'index sert aussi les
+    # recherches par place_id
+    _table_args = (db.UniqueConstraint('place_id', 'user_id', name='uq_reviews_place_id_user_id'),)
 
-    place = db.relationship('Place', backref='reviews')
-    user = db.relationship('User', backref='reviews')
+    # place.reviews / user.reviews sont des requêtes : filtrer, compter ou
+    # paginer sans charger toutes les reviews en mémoire
+    place = db.relationship('Place', backref=db.backref('reviews', lazy='dynamic'))
+    user = db.relationship('User', backref=db.backref('reviews', lazy='dynamic'))
 
     @validates('text')
     def validate_text(self, key, value):
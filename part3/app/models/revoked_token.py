@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from app.extensions import db
+
+
+class RevokedToken(db.Model):
+    """Revoked token, token family or user, kept until its tokens expire.
+
+    key is 'jti:<jti>', 'family:<family>' or 'user:<user id>'. A user entry
+    revokes the tokens of that user issued before revoked_at.
+    """
+    __tablename__ = 'revoked_tokens'
+
+    key = db.Column(db.String(80), primary_key=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -1,6 +1,7 @@
 import re
 from sqlalchemy.orm import validates
-from app.extensions import db, bcrypt
+from app.extensions import db
+from app import passwords
 from .basemodel import BaseModel
 
 
@@ -13,11 +14,15 @@ class User(BaseModel):
     _password = db.Column("password", db.String(128), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
 
-    def __init__(self, first_name, last_name, email, password, is_admin=False):
+    def __init__(self, first_name, last_name, email, password=None, is_admin=False, password_hash=None):
         self.first_name = first_name
         self.last_name = last_name
         self.email = email
-        self.password = password  # appelle le setter
+        if password_hash is not None:
+            # déjà haché (création en masse, voir passwords.hash_many)
+            self._password = password_hash
+        else:
+            self.password = password  # appelle le setter
         self.is_admin = is_admin
 
     @validates('first_name', 'last_name')
@@ -46,7 +51,11 @@ class User(BaseModel):
 
     def verify_password(self, password):
         """Vérifie si un mot de passe correspond au hash stocké."""
-        return bcrypt.check_password_hash(self._password, password)
+        return passwords.check_password(self._password, password)
+
+    def needs_rehash(self):
+        """True if the hash was made with a lower cost factor than the current one"""
+        return passwords.needs_rehash(self._password)
 
     @property
     def password(self):
@@ -54,7 +63,7 @@ class User(BaseModel):
 
     @password.setter
     def password(self, plaintext_password):
-        self._password = bcrypt.generate_password_hash(plaintext_password).decode("utf-8")
+        self._password = passwords.hash_password(plaintext_password)
 
     def to_dict(self):
         return {
@@ -0,0 +1,163 @@
+"""Password hashing on a bounded process pool.
+
+bcrypt costs hundreds of milliseconds at production cost factors. Hashes
+and checks run in PASSWORD_HASH_WORKERS processes (0: on the calling thread,
+as in tests). At most PASSWORD_HASH_MAX_PENDING calls wait for the pool;
+beyond that a call waits PASSWORD_HASH_QUEUE_TIMEOUT seconds for a slot, then
+raises PasswordHasherBusy. With PASSWORD_HASH_TARGET_MS set, the cost factor
+(BCRYPT_LOG_ROUNDS) is calibrated at startup for that latency. A login only
+rehashes a password stored at a lower cost.
+"""
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from flask import current_app, has_app_context
+
+_EXTENSION = 'hbnb_passwords'
+DEFAULT_ROUNDS = 12
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Too many hashes already waiting for the pool"""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password_hash, password):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def rounds_of(password_hash):
+    """Cost factor of a bcrypt hash ($2b$12$...)"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def calibrate(target_ms, min_rounds=10, max_rounds=16, probe_rounds=8):
+    """Highest cost factor whose hash takes at most target_ms here.
+
+    Each extra round doubles the cost: a hash is timed at probe_rounds and
+    the result extrapolated.
+    """
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        _hash('calibration', probe_rounds)
+        timings.append(time.perf_counter() - start)
+    probe_ms = min(timings) * 1000
+    rounds = probe_rounds + math.floor(math.log2(target_ms / probe_ms))
+    return max(min_rounds, min(max_rounds, rounds))
+
+
+class PasswordHasher:
+    def __init__(self, rounds=DEFAULT_ROUNDS, workers=0, max_pending=None, queue_timeout=5.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending or max(1, workers) * 4)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        # créé au premier appel : après le fork des workers du serveur
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            return self._pool
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHasherBusy("Password hashing is overloaded, retry later")
+        try:
+            return self._executor().submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def check(self, password_hash, password):
+        return self._run(_check, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        # seulement vers le haut : des workers calibrés différemment ne se
+        # renvoient pas le hash à chaque login
+        rounds = rounds_of(password_hash)
+        return rounds is None or rounds < self.rounds
+
+    def hash_many(self, passwords):
+        """Hash a batch of passwords on every worker, in order"""
+        passwords = list(passwords)
+        if not self.workers or len(passwords) < 2:
+            return [self.hash(password) for password in passwords]
+        executor = self._executor()
+        futures = []
+        try:
+            for password in passwords:
+                # un slot par hash en cours, comme les appels isolés
+                if not self._slots.acquire(timeout=self.queue_timeout):
+                    raise PasswordHasherBusy("Password hashing is overloaded, retry later")
+                future = executor.submit(_hash, password, self.rounds)
+                future.add_done_callback(lambda _: self._slots.release())
+                futures.append(future)
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+def init_app(app):
+    target_ms = app.config.get('PASSWORD_HASH_TARGET_MS')
+    if target_ms:
+        app.config['BCRYPT_LOG_ROUNDS'] = calibrate(target_ms)
+        app.logger.info("bcrypt cost factor calibrated to %s", app.config['BCRYPT_LOG_ROUNDS'])
+    workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+    app.extensions[_EXTENSION] = PasswordHasher(
+        rounds=app.config.get('BCRYPT_LOG_ROUNDS', DEFAULT_ROUNDS),
+        workers=os.cpu_count() if workers is None else workers,
+        max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING'),
+        queue_timeout=app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0),
+    )
+
+
+_fallback = PasswordHasher()
+
+
+def hasher():
+    """Hasher of the current app, or an inline one outside of an app"""
+    if has_app_context():
+        return current_app.extensions.get(_EXTENSION, _fallback)
+    return _fallback
+
+
+def hash_password(password):
+    return hasher().hash(password)
+
+
+def check_password(password_hash, password):
+    return hasher().check(password_hash, password)
+
+
+def needs_rehash(password_hash):
+    return hasher().needs_rehash(password_hash)
+
+
+def hash_many(passwords):
+    return hasher().hash_many(passwords)
@@ -0,0 +1,206 @@
+"""Per-entity cache of the rows read by id, in front of the repositories"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.extensions import db
+from app.persistence.routing import RoutingSession
+
+_EXTENSION = 'hbnb_cache'
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with a time to live and hit/miss counters"""
+
+    def __init__(self, max_size=1000, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries), 'max_size': self.max_size, 'ttl': self.ttl,
+            'hits': self.hits, 'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions, 'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+
+def init_app(app):
+    """Create the caches listed in REPOSITORY_CACHE: {'Place': {'max_size': ..., 'ttl': ...}}"""
+    app.extensions[_EXTENSION] = {
+        name: LRUCache(**options) for name, options in (app.config.get('REPOSITORY_CACHE') or {}).items()
+    }
+
+
+def cache_for(name):
+    """Cache of the entity name in the current app, None if not cached"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(_EXTENSION, {}).get(name)
+
+
+def stats():
+    return {name: cache.stats() for name, cache in current_app.extensions.get(_EXTENSION, {}).items()}
+
+
+def clear():
+    for cache in current_app.extensions.get(_EXTENSION, {}).values():
+        cache.clear()
+
+
+class CachedRepository:
+    """Serve get(obj_id) from the cache of the model, delegate the rest.
+
+    The cache holds the column values of the rows, not the instances: a hit
+    builds an instance and merges it into the current session without any
+    SELECT, relationships then load lazily as usual. Writes through this
+    repository and every flush, commit or rollback of a session invalidate
+    the rows they touch. Each process has its own caches: writes made by
+    another process are seen once the ttl expires.
+
+    With read replicas, a miss is read on the primary: a lagging replica
+    would put back the row a write just invalidated. During the
+    read-your-writes window the cache is skipped, as the replicas are.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.model = repository.model
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+    def get(self, obj_id, load=None):
+        cache = cache_for(self.model.__name__)
+        # options de chargement, objet déjà dans la session ou écriture
+        # récente du client : pas de cache
+        if cache is None or load or self._in_session(obj_id) or db.session().reads_own_writes():
+            return self.repository.get(obj_id, load=load)
+        values = cache.get(obj_id)
+        if values is not None:
+            return self._restore(values)
+        obj = self.repository.get(obj_id, replica=False)
+        if obj is not None:
+            values = self._snapshot(obj)
+            if values is not None:
+                cache.set(obj_id, values)
+        return obj
+
+    def _in_session(self, obj_id):
+        return db.session.identity_map.get(inspect(self.model).identity_key_from_primary_key([obj_id])) is not None
+
+    def _snapshot(self, obj):
+        state = inspect(obj)
+        # modifications pas encore validées : ne pas les mettre en cache
+        if state.modified or state.session is None or state in state.session.new:
+            return None
+        keys = [attr.key for attr in state.mapper.column_attrs]
+        if state.unloaded.intersection(keys):
+            return None
+        return {key: state.dict[key] for key in keys}
+
+    def _restore(self, values):
+        obj = inspect(self.model).class_manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(obj, key, value)
+        make_transient_to_detached(obj)
+        return db.session.merge(obj, load=False)
+
+    def invalidate(self, obj_id):
+        cache = cache_for(self.model.__name__)
+        if cache is not None:
+            cache.invalidate(obj_id)
+
+    def update(self, obj_id, data):
+        self.invalidate(obj_id)
+        return self.repository.update(obj_id, data)
+
+    def delete(self, obj_id):
+        self.invalidate(obj_id)
+        return self.repository.delete(obj_id)
+
+    def upsert(self, obj, conflict, update=None):
+        stored = self.repository.upsert(obj, conflict, update)
+        self.invalidate(stored.id)
+        return stored
+
+
+def _invalidate(session):
+    for name, obj_id in session.info.get('cache_dirty', ()):
+        cache = cache_for(name)
+        if cache is not None:
+            cache.invalidate(obj_id)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    # invalidé tout de suite, puis à nouveau à la fin de la transaction : une
+    # lecture concurrente a pu remettre l'ancienne version entre les deux
+    dirty = session.info.setdefault('cache_dirty', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if cache_for(type(obj).__name__) is not None:
+            dirty.add((type(obj).__name__, inspect(obj).identity[0]))
+    _invalidate(session)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _after_transaction(session):
+    _invalidate(session)
+    session.info.pop('cache_dirty', None)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _on_execute(orm_execute_state):
+    # UPDATE/DELETE en masse (Query.update/delete) : lignes inconnues, on vide
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and orm_execute_state.bind_mapper is not None:
+        cache = cache_for(orm_execute_state.bind_mapper.class_.__name__)
+        if cache is not None:
+            cache.clear()
@@ -0,0 +1,23 @@
+"""Connect-time settings of the database engine"""
+from sqlalchemy import event
+
+from app.extensions import db
+
+
+def _set_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+    return on_connect
+
+
+def init_app(app):
+    """Run the SQLITE_PRAGMAS of the config on every new SQLite connection"""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        # primaire et réplicas
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite' and pragmas:
+                event.listen(engine, 'connect', _set_pragmas(pragmas))
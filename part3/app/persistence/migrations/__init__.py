@@ -0,0 +1,111 @@
+"""Versioned schema migrations.
+
+Each vNNNN_<name>.py module of this package defines upgrade(connection) and
+downgrade(connection). The versions applied to a database are recorded in
+the schema_migrations table; every migration runs in its own transaction.
+
+A new database is created from the models by create_all() and stamped as
+up to date, an existing one is brought up to date by upgrade().
+"""
+import importlib
+import pkgutil
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+_TABLE = 'schema_migrations'
+
+
+def _load():
+    migrations = []
+    for module in pkgutil.iter_modules(__path__):
+        if module.name.startswith('v') and module.name[1:5].isdigit():
+            migrations.append((module.name[1:5], importlib.import_module(f'{__name__}.{module.name}')))
+    return sorted(migrations, key=lambda migration: migration[0])
+
+
+def _ensure_table(connection):
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {_TABLE} (version VARCHAR(4) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_versions(engine):
+    with engine.begin() as connection:
+        _ensure_table(connection)
+        return {row[0] for row in connection.execute(text(f"SELECT version FROM {_TABLE}"))}
+
+
+def _record(connection, version):
+    connection.execute(text(f"INSERT INTO {_TABLE} (version, applied_at) VALUES (:version, :now)"),
+                       {'version': version, 'now': datetime.utcnow()})
+
+
+def upgrade(engine, target=None):
+    """Apply the pending migrations up to target (the latest by default)"""
+    applied = applied_versions(engine)
+    done = []
+    for version, module in MIGRATIONS:
+        if version in applied or (target is not None and version > target):
+            continue
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            _record(connection, version)
+        done.append(version)
+    return done
+
+
+def downgrade(engine, target):
+    """Revert the applied migrations newer than target ('0000' reverts all)"""
+    applied = applied_versions(engine)
+    done = []
+    for version, module in reversed(MIGRATIONS):
+        if version not in applied or version <= target:
+            continue
+        with engine.begin() as connection:
+            module.downgrade(connection)
+            connection.execute(text(f"DELETE FROM {_TABLE} WHERE version = :version"), {'version': version})
+        done.append(version)
+    return done
+
+
+def stamp(engine):
+    """Mark every migration as applied, for a schema created from the models"""
+    applied = applied_versions(engine)
+    with engine.begin() as connection:
+        for version, _ in MIGRATIONS:
+            if version not in applied:
+                _record(connection, version)
+
+
+def init_schema(db):
+    """Create a new database from the models, or migrate an existing one"""
+    if not inspect(db.engine).has_table('users'):
+        db.create_all()
+        stamp(db.engine)
+        return []
+    return upgrade(db.engine)
+
+
+# opérations communes aux migrations, en SQL portable SQLite / PostgreSQL
+
+def create_index(connection, name, table, columns, unique=False):
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    connection.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+def drop_index(connection, name):
+    connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def drop_constraint(connection, table, name):
+    """Drop a named constraint, with the index backing it (PostgreSQL only).
+
+    SQLite cannot drop a constraint without rebuilding the table; the index
+    it creates for a UNIQUE constraint is unnamed and stays.
+    """
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}"))
+
+
+MIGRATIONS = _load()
@@ -0,0 +1,43 @@
+"""Indexes for the current query patterns.
+
+- (created_at, id) on every table: keyset pagination
+- reviews (place_id, user_id) unique: one review per user and place, and
+  reviews of a place
+- reviews.user_id, places.owner_id: reviews of a user, places of an owner
+- places.price: price filters and sorting
+"""
+from sqlalchemy import text
+
+from app.persistence.migrations import create_index, drop_constraint, drop_index
+
+INDEXES = [
+    ('ix_users_created_at_id', 'users', ['created_at', 'id']),
+    ('ix_places_created_at_id', 'places', ['created_at', 'id']),
+    ('ix_reviews_created_at_id', 'reviews', ['created_at', 'id']),
+    ('ix_amenities_created_at_id', 'amenities', ['created_at', 'id']),
+    ('ix_reviews_user_id', 'reviews', ['user_id']),
+    ('ix_places_owner_id', 'places', ['owner_id']),
+    ('ix_places_price', 'places', ['price']),
+]
+
+
+def upgrade(connection):
+    duplicates = connection.execute(text(
+        "SELECT COUNT(*) FROM (SELECT place_id, user_id FROM reviews "
+        "GROUP BY place_id, user_id HAVING COUNT(*) > 1) AS duplicates"
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(f"{duplicates} (place_id, user_id) pairs have several reviews, "
+                           "remove the duplicates before migrating")
+    create_index(connection, 'uq_reviews_place_id_user_id', 'reviews', ['place_id', 'user_id'], unique=True)
+    for name, table, columns in INDEXES:
+        create_index(connection, name, table, columns)
+
+
+def downgrade(connection):
+    for name, _, _ in reversed(INDEXES):
+        drop_index(connection, name)
+    # une base créée par create_all() porte la contrainte unique du modèle,
+    # du même nom : PostgreSQL refuse DROP INDEX sur l'index d'une contrainte
+    drop_constraint(connection, 'reviews', 'uq_reviews_place_id_user_id')
+    drop_index(connection, 'uq_reviews_place_id_user_id')
@@ -0,0 +1,21 @@
+"""revoked_tokens: revoked JWTs, token families and users (app/tokens.py)"""
+from sqlalchemy import text
+
+from app.persistence.migrations import create_index, drop_index
+
+
+def upgrade(connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS revoked_tokens ("
+        "key VARCHAR(80) NOT NULL PRIMARY KEY, "
+        "revoked_at TIMESTAMP NOT NULL, "
+        "expires_at TIMESTAMP NOT NULL)"
+    ))
+    create_index(connection, 'ix_revoked_tokens_revoked_at', 'revoked_tokens', ['revoked_at'])
+    create_index(connection, 'ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+
+
+def downgrade(connection):
+    drop_index(connection, 'ix_revoked_tokens_expires_at')
+    drop_index(connection, 'ix_revoked_tokens_revoked_at')
+    connection.execute(text("DROP TABLE IF EXISTS revoked_tokens"))
@@ -0,0 +1,61 @@
+"""Read-your-writes tracking per client, and the local replica sync step"""
+import math
+import time
+
+import click
+from flask import current_app, g, request
+
+from app.extensions import db
+
+COOKIE = 'hbnb_last_write'
+
+
+def sync_sqlite_replicas():
+    """Copy the primary SQLite database onto every read bind.
+
+    Local stand-in for replication: uses the SQLite online backup API, the
+    replicas are consistent snapshots of the primary.
+    """
+    synced = []
+    source = db.engine.raw_connection()
+    try:
+        for key in current_app.config.get('SQLALCHEMY_READ_BINDS') or []:
+            engine = db.engines[key]
+            target = engine.raw_connection()
+            try:
+                source.driver_connection.backup(target.driver_connection)
+            finally:
+                target.close()
+            # les connexions ouvertes avant la copie peuvent garder un cache périmé
+            engine.dispose()
+            synced.append(key)
+    finally:
+        source.close()
+    return synced
+
+
+def init_app(app):
+    if not app.config.get('SQLALCHEMY_READ_BINDS'):
+        return
+    window = app.config.get('READ_YOUR_WRITES_SECONDS', 0)
+
+    @app.before_request
+    def read_own_writes():
+        # le client a écrit récemment : ses lectures vont au primaire
+        try:
+            last_write = float(request.cookies.get(COOKIE, '-inf'))
+        except ValueError:
+            last_write = float('-inf')
+        g.read_primary = time.time() - last_write < window
+
+    @app.after_request
+    def remember_write(response):
+        if g.get('db_wrote', False) and window:
+            response.set_cookie(COOKIE, repr(time.time()), max_age=math.ceil(window), httponly=True)
+        return response
+
+    @app.cli.command('sync-replicas')
+    def sync_replicas_command():
+        """Copy the primary SQLite database onto the read replicas"""
+        for key in sync_sqlite_replicas():
+            click.echo(f"{key} synced")
@@ -1,11 +1,37 @@
+import base64
+import json
 from abc import ABC, abstractmethod
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import func, inspect, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, lazyload, noload, raiseload, selectinload
 from app.extensions import db
+from app.persistence import unit_of_work
 from app.models.user import User
 from app.models.place import Place
 from app.models.review import Review
 from app.models.amenity import Amenity
 
 
+def encode_cursor(obj):
+    """Opaque cursor pointing after obj in (created_at, id) order"""
+    created_at = obj.created_at or datetime.min
+    raw = json.dumps([created_at.isoformat(), obj.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (created_at, id) key stored in a cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, obj_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(obj_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
 class Repository(ABC):
     @abstractmethod
     def add(self, obj):
@@ -15,10 +41,23 @@ class Repository(ABC):
     def get(self, obj_id):
         pass
 
+    @abstractmethod
+    def get_many(self, ids):
+        pass
+
     @abstractmethod
     def get_all(self):
         pass
 
+    @abstractmethod
+    def get_page(self, limit, cursor=None, filters=None):
+        """Return (objects, next_cursor) for the page following cursor.
+
+        Pages are ordered by (created_at, id); next_cursor is None on the
+        last page. filters maps attribute names to the values to match.
+        """
+        pass
+
     @abstractmethod
     def update(self, obj_id, data):
         pass
@@ -31,58 +70,382 @@ class Repository(ABC):
     def get_by_attribute(self, attr_name, attr_value):
         pass
 
+    @abstractmethod
+    def count(self, filters=None):
+        pass
+
+    @abstractmethod
+    def exists(self, filters):
+        pass
+
+    @abstractmethod
+    def version(self, filters=None):
+        """Return (count, last updated_at) of the objects matching filters.
+
+        Changes whenever one of them is added, updated or deleted: used as
+        the validator of a cached collection.
+        """
+        pass
+
+
+class RepositoryView:
+    """Objects of an InMemoryRepository at one version, as a cached copy.
+
+    Not lazy: the first get_all() after a write copies every object
+    reference into a tuple (O(n)), later calls reuse it until the next
+    write. Iterating it is safe while other threads write.
+    """
+
+    def __init__(self, storage, version):
+        # copie en une opération C : atomique face aux écritures d'autres threads
+        self._objs = tuple(storage.values())
+        self.version = version
+
+    def __len__(self):
+        return len(self._objs)
+
+    def __bool__(self):
+        return bool(self._objs)
+
+    def __iter__(self):
+        return iter(self._objs)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self._objs[key])
+        try:
+            return self._objs[key]
+        except IndexError:
+            raise IndexError("RepositoryView index out of range")
+
 
 class InMemoryRepository(Repository):
+    """Objects kept in a dict; lookups and filters scan every object"""
+
     def __init__(self):
         self._storage = {}
+        self._version = 0
+        self._view = None
 
     def add(self, obj):
         self._storage[obj.id] = obj
+        self._version += 1
 
     def get(self, obj_id):
         return self._storage.get(obj_id)
 
+    def get_many(self, ids):
+        """Return the objects found for ids, in order, skipping unknown ids"""
+        objs = map(self._storage.get, dict.fromkeys(ids))
+        return [obj for obj in objs if obj is not None]
+
     def get_all(self):
-        return list(self._storage.values())
+        """Return a view of every object, reused until the next write"""
+        view = self._view
+        if view is None or view.version != self._version:
+            view = self._view = RepositoryView(self._storage, self._version)
+        return view
+
+    def get_page(self, limit, cursor=None, filters=None):
+        objs = sorted(self._matching(filters), key=self._keyset)
+        if cursor:
+            after = decode_cursor(cursor)
+            objs = (obj for obj in objs if self._keyset(obj) > after)
+        objs = list(islice(objs, limit + 1))
+        if len(objs) > limit:
+            return objs[:limit], encode_cursor(objs[limit - 1])
+        return objs, None
+
+    @staticmethod
+    def _keyset(obj):
+        return (obj.created_at or datetime.min, obj.id)
+
+    def _matching(self, filters):
+        objs = self._storage.values()
+        if not filters:
+            return list(objs)
+        return [obj for obj in objs
+                if all(getattr(obj, attr_name, None) == value for attr_name, value in filters.items())]
 
     def update(self, obj_id, data):
         obj = self.get(obj_id)
         if obj:
             obj.update(data)
+            self._version += 1
 
     def delete(self, obj_id):
         if obj_id in self._storage:
             del self._storage[obj_id]
+            self._version += 1
 
     def get_by_attribute(self, attr_name, attr_value):
         return next((obj for obj in self._storage.values() if getattr(obj, attr_name) == attr_value), None)
 
+    def count(self, filters=None):
+        return len(self._matching(filters))
+
+    def exists(self, filters):
+        return bool(self._matching(filters))
+
+    def version(self, filters=None):
+        objs = self._matching(filters)
+        dates = [obj.updated_at for obj in objs if obj.updated_at is not None]
+        return len(objs), max(dates, default=None)
+
+
+def violates(error, table, name):
+    """True if the IntegrityError error was raised by the constraint name of table"""
+    # PostgreSQL (psycopg2) donne le nom de la contrainte
+    diag = getattr(error.orig, 'diag', None)
+    if getattr(diag, 'constraint_name', None):
+        return diag.constraint_name == name
+    # SQLite ne donne que les colonnes :
+    # "UNIQUE constraint failed: reviews.place_id, reviews.user_id"
+    constraint = next((c for c in table.constraints if c.name == name), None)
+    if constraint is None:
+        return False
+    columns = ', '.join(f'{table.name}.{column.name}' for column in constraint.columns)
+    return str(error.orig) == f'UNIQUE constraint failed: {columns}'
+
+
+def chunked(iterable, size):
+    """Split an iterable into lists of at most size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# dialectes ayant INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_DIALECTS = {'sqlite': sqlite, 'postgresql': postgresql}
+
+# stratégies de chargement des relations, choisies requête par requête
+_LOADERS = {
+    'select': lazyload,
+    'selectin': selectinload,
+    'joined': joinedload,
+    # noload est déprécié depuis SQLAlchemy 2.1, préférer raiseload
+    'noload': noload,
+    'raiseload': raiseload,
+}
+
+
+class QueryView:
+    """Lazy result of a SQLAlchemy query.
+
+    Iterating streams the rows from the cursor chunk_size at a time
+    (yield_per) instead of loading the whole table, slicing becomes
+    LIMIT/OFFSET and len() a COUNT. yield_per cannot be combined with a
+    'joined' load of a collection.
+    """
+
+    def __init__(self, query, chunk_size=1000):
+        self.query = query
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        return iter(self.query.yield_per(self.chunk_size))
+
+    def __len__(self):
+        return self.query.order_by(None).count()
+
+    def __bool__(self):
+        return self.query.first() is not None
+
+    def __getitem__(self, key):
+        return self.query[key]
+
+
 class SQLAlchemyRepository(Repository):
-    def __init__(self, model):
+    def __init__(self, model, chunk_size=1000, bulk_chunk_size=20000):
         self.model = model
+        self.chunk_size = chunk_size
+        self.bulk_chunk_size = bulk_chunk_size
+
+    def _commit(self):
+        # dans une unité de travail, le commit est fait une fois en fin de requête
+        try:
+            if unit_of_work.active():
+                db.session.flush()
+            else:
+                db.session.commit()
+        except IntegrityError:
+            # la session est inutilisable tant qu'elle n'est pas annulée
+            db.session.rollback()
+            raise
 
     def add(self, obj):
         db.session.add(obj)
-        db.session.commit()
+        self._commit()
 
-    def get(self, obj_id):
-        return self.model.query.get(obj_id)
+    def add_many(self, objs, chunk_size=None):
+        """Insert many rows with one executemany INSERT and one commit per chunk.
 
-    def get_all(self):
-        return self.model.query.all()
+        objs may mix model instances and dicts of attribute values. Column
+        defaults (id, timestamps...) are filled in beforehand, so instances
+        get their id, but they are not added to the session. Dicts skip the
+        model validators: the caller must validate them. Returns the number
+        of rows inserted.
+        """
+        columns = [(attr.key, attr.columns[0]) for attr in inspect(self.model).column_attrs]
+        rows = (self._row(obj, columns) for obj in objs)
+        return self.insert_rows(self.model.__table__.insert(), rows, chunk_size)
+
+    def upsert(self, obj, conflict, update=None):
+        """INSERT obj, or UPDATE the row already holding the same conflict columns.
+
+        conflict lists the columns of a unique constraint, update the
+        attributes to overwrite on conflict (every attribute but the id,
+        created_at and the conflict columns by default). Runs a single
+        INSERT ... ON CONFLICT DO UPDATE, or on other dialects a SELECT ...
+        FOR UPDATE then an UPDATE or INSERT in the same transaction, and
+        returns the stored object.
+        """
+        mapper = inspect(self.model)
+        columns = [(attr.key, attr.columns[0]) for attr in mapper.column_attrs]
+        row = self._row(obj, columns)
+        if update is None:
+            update = [key for key, _ in columns if key not in conflict and key not in ('id', 'created_at')]
+        names = {key: column.key for key, column in columns}
+        dialect = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+        if dialect is None:
+            self._upsert_by_select(row, names, conflict, update)
+        else:
+            statement = dialect.insert(self.model.__table__).values(row)
+            statement = statement.on_conflict_do_update(
+                index_elements=[names[key] for key in conflict],
+                set_={names[key]: statement.excluded[names[key]] for key in update},
+            )
+            db.session.execute(statement)
+        self._commit()
+        query = self.model.query.filter_by(**{key: row[names[key]] for key in conflict})
+        return query.execution_options(populate_existing=True).one()
+
+    def _upsert_by_select(self, row, names, conflict, update):
+        # sans ON CONFLICT : la ligne existante est verrouillée jusqu'au commit
+        query = self.model.query.filter_by(**{key: row[names[key]] for key in conflict})
+        stored = query.with_for_update().one_or_none()
+        if stored is None:
+            db.session.execute(self.model.__table__.insert().values(row))
+        else:
+            for key in update:
+                setattr(stored, key, row[names[key]])
+            db.session.flush()
+
+    def insert_rows(self, statement, rows, chunk_size=None):
+        """Execute an INSERT statement for rows, committing once per chunk"""
+        count = 0
+        for chunk in chunked(rows, chunk_size or self.bulk_chunk_size):
+            db.session.execute(statement, chunk)
+            self._commit()
+            count += len(chunk)
+        return count
+
+    @staticmethod
+    def _row(obj, columns):
+        # clés = noms des colonnes (User._password -> "password")
+        is_dict = isinstance(obj, dict)
+        row = {}
+        for key, column in columns:
+            value = obj.get(key) if is_dict else getattr(obj, key)
+            if value is None and column.default is not None:
+                default = column.default
+                value = default.arg(None) if default.is_callable else default.arg
+                if not is_dict:
+                    setattr(obj, key, value)
+            row[column.key] = value
+        return row
+
+    def _options(self, load):
+        """Build loader options from {'relationship' or '*': strategy}.
+
+        strategy is one of select, selectin, joined, noload or raiseload.
+        """
+        options = []
+        for name, strategy in (load or {}).items():
+            if strategy not in _LOADERS:
+                raise ValueError(f"Unknown loading strategy '{strategy}'")
+            options.append(_LOADERS[strategy]('*' if name == '*' else getattr(self.model, name)))
+        return options
+
+    def _query(self, load=None):
+        # lecture : peut être servie par un réplica (voir routing.RoutingSession)
+        return self.model.query.options(*self._options(load)).execution_options(replica=True)
+
+    def get(self, obj_id, load=None, replica=True):
+        """replica=False reads the primary"""
+        return db.session.get(self.model, obj_id, options=self._options(load), bind_arguments={'replica': replica})
+
+    def get_many(self, ids, chunk_size=500, load=None):
+        """Fetch several rows with one IN (...) query per chunk_size ids.
+
+        Returns the objects found, in the order of ids, skipping unknown ids.
+        """
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            for obj in self._query(load).filter(self.model.id.in_(chunk)):
+                found[obj.id] = obj
+        return [found[obj_id] for obj_id in ids if obj_id in found]
+
+    def get_all(self, load=None):
+        """Return a lazy QueryView of every row, streamed when iterated"""
+        return QueryView(self._query(load), self.chunk_size)
+
+    def get_page(self, limit, cursor=None, filters=None, load=None):
+        # keyset : WHERE (created_at, id) > curseur, servi par l'index
+        # (created_at, id), le coût ne dépend pas de la profondeur de la page
+        query = self._query(load).filter_by(**(filters or {}))
+        if cursor:
+            query = query.filter(tuple_(self.model.created_at, self.model.id) > decode_cursor(cursor))
+        objs = query.order_by(self.model.created_at, self.model.id).limit(limit + 1).all()
+        if len(objs) > limit:
+            return objs[:limit], encode_cursor(objs[limit - 1])
+        return objs, None
 
     def update(self, obj_id, data):
-        obj = self.get(obj_id)
+        # lu sur le primaire : on modifie la version à jour
+        obj = db.session.get(self.model, obj_id)
         if obj:
             for key, value in data.items():
                 setattr(obj, key, value)
-            db.session.commit()
+            self._commit()
 
     def delete(self, obj_id):
-        obj = self.get(obj_id)
+        obj = db.session.get(self.model, obj_id)
         if obj:
             db.session.delete(obj)
-            db.session.commit()
+            self._commit()
 
-    def get_by_attribute(self, attr_name, attr_value):
-        return self.model.query.filter(getattr(self.model, attr_name) == attr_value).first()
+    def get_by_attribute(self, attr_name, attr_value, load=None):
+        return self._query(load).filter(getattr(self.model, attr_name) == attr_value).first()
+
+    def count(self, filters=None):
+        return self._query().filter_by(**(filters or {})).order_by(None).count()
+
+    def exists(self, filters):
+        """SELECT EXISTS(...): stops at the first matching row"""
+        exists = self.model.query.filter_by(**filters).exists()
+        return db.session.query(exists).execution_options(replica=True).scalar()
+
+    def existing_keys(self, attr_names, keys, chunk_size=500):
+        """Return which keys (tuples of attr_names values) are already stored.
+
+        One (a, b) IN (...) query per chunk_size keys, on the primary: used
+        to check a batch before inserting it.
+        """
+        columns = [getattr(self.model, name) for name in attr_names]
+        found = set()
+        for chunk in chunked(set(keys), chunk_size):
+            query = db.session.query(*columns).filter(tuple_(*columns).in_(chunk))
+            found.update(tuple(row) for row in query)
+        return found
+
+    def version(self, filters=None):
+        query = db.session.query(func.count(self.model.id), func.max(self.model.updated_at))
+        query = query.select_from(self.model).filter_by(**(filters or {}))
+        count, last = query.execution_options(replica=True).one()
+        return count, last
@@ -0,0 +1,56 @@
+"""Read/write splitting between the primary database and read replicas"""
+import random
+import time
+
+from flask import current_app, g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+
+class RoutingSession(Session):
+    """Session sending the reads flagged replica=True to a read bind.
+
+    The read binds are the SQLALCHEMY_BINDS keys listed in
+    SQLALCHEMY_READ_BINDS. Writes, flushes, unflagged reads, and every read
+    made during the read-your-writes window (READ_YOUR_WRITES_SECONDS after
+    a write of this session or of the same client) go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = kwargs.pop('replica', False) or getattr(clause, '_execution_options', {}).get('replica', False)
+        if bind is None and replica and not self._flushing:
+            engine = self._read_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def reads_own_writes(self):
+        """True during the read-your-writes window of this session or client"""
+        window = current_app.config.get('READ_YOUR_WRITES_SECONDS', 0)
+        if time.monotonic() - self.info.get('last_write', float('-inf')) < window:
+            return True
+        return has_request_context() and g.get('read_primary', False)
+
+    def _read_engine(self):
+        keys = current_app.config.get('SQLALCHEMY_READ_BINDS')
+        if not keys or self.reads_own_writes():
+            return None
+        return self._db.engines[random.choice(keys)]
+
+
+def _record_write(session):
+    session.info['last_write'] = time.monotonic()
+    if has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    _record_write(session)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _on_execute(orm_execute_state):
+    # INSERT/UPDATE/DELETE exécutés directement (insertions en masse, upsert)
+    if not orm_execute_state.is_select:
+        _record_write(orm_execute_state.session)
@@ -0,0 +1,354 @@
+"""Hash-sharded storage of a model across several database binds"""
+import heapq
+import uuid
+import zlib
+from itertools import islice
+
+import click
+from flask import current_app, has_app_context
+from sqlalchemy import ForeignKeyConstraint, MetaData, func, inspect, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import MANYTOONE, Session
+
+from app.extensions import db
+from app.models.review import Review
+from app.persistence.repository import Repository, SQLAlchemyRepository, chunked, decode_cursor, encode_cursor
+
+_EXTENSION = 'hbnb_review_shards'
+
+
+def jump_hash(key, buckets):
+    """Shard of key among buckets (jump consistent hash, Lamping & Veach).
+
+    Going from N to N + 1 buckets only moves 1 / (N + 1) of the keys.
+    """
+    key = zlib.crc32(str(key).encode())
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
+def create_shard_schema(engine, models):
+    """Create the tables of models on a shard, without their foreign keys.
+
+    Referenced rows (owner, user, amenities...) live in other databases, so
+    integrity across databases is checked by the facade.
+    """
+    metadata = MetaData()
+    for model in models:
+        table = model.__table__.to_metadata(metadata)
+        for constraint in list(table.constraints):
+            if isinstance(constraint, ForeignKeyConstraint):
+                table.constraints.discard(constraint)
+        for column in table.columns:
+            column.foreign_keys.clear()
+        table.foreign_keys.clear()
+    metadata.create_all(engine)
+
+
+class ShardedRepository(Repository):
+    """Rows of a model spread over database binds by hash of shard_key.
+
+    Shard places by 'id' and reviews by 'place_id': a place and its reviews
+    then share a shard. Each call opens a short session on the shards it
+    needs and commits right away, outside of the request unit of work. The
+    objects returned are detached: relationships to rows stored elsewhere
+    (owner, user, amenities) cannot be loaded from them, so load options
+    are refused.
+    """
+
+    def __init__(self, model, binds, shard_key='id', bulk_chunk_size=20000):
+        self.model = model
+        self.binds = list(binds)
+        self.shard_key = shard_key
+        self.bulk_chunk_size = bulk_chunk_size
+        mapper = inspect(model)
+        self._columns = [(attr.key, attr.columns[0]) for attr in mapper.column_attrs]
+        # clés étrangères remplies par une relation (Review(place=...))
+        self._parents = [
+            (rel.key, local.key, remote)
+            for rel in mapper.relationships if rel.direction is MANYTOONE
+            for local, remote in rel.local_remote_pairs
+        ]
+
+    def shard_of(self, key):
+        return jump_hash(key, len(self.binds))
+
+    def _session(self, shard):
+        return Session(db.engines[self.binds[shard]], expire_on_commit=False)
+
+    def _shards_for(self, filters):
+        """Shards holding the rows matching filters: one if the shard key is fixed"""
+        if filters and self.shard_key in filters:
+            return [self.shard_of(filters[self.shard_key])]
+        return range(len(self.binds))
+
+    @staticmethod
+    def _check_load(load):
+        if load:
+            raise ValueError("Relationships cannot be loaded from a sharded repository")
+
+    def _row(self, obj):
+        """Column values of obj, foreign keys read from its parents if unset"""
+        # l'id choisit le shard : il doit exister avant l'INSERT
+        if obj.id is None:
+            obj.id = str(uuid.uuid4())
+        for name, key, remote in self._parents:
+            parent = getattr(obj, name)
+            if getattr(obj, key) is None and parent is not None:
+                setattr(obj, key, getattr(parent, inspect(parent).mapper.get_property_by_column(remote).key))
+        return SQLAlchemyRepository._row(obj, self._columns)
+
+    def add(self, obj):
+        """INSERT the columns of obj only.
+
+        Going through a session would cascade its related objects (the
+        place of a review, its user) into the shard.
+        """
+        row = self._row(obj)
+        with db.engines[self.binds[self.shard_of(row[self.shard_key])]].begin() as connection:
+            connection.execute(self.model.__table__.insert(), [row])
+
+    def upsert(self, obj, conflict, update=None):
+        """INSERT obj, or UPDATE the row of its shard holding the same conflict columns"""
+        if self.shard_key not in conflict:
+            raise ValueError(f"conflict must include {self.shard_key} on a sharded repository")
+        row = self._row(obj)
+        if update is None:
+            update = [key for key, _ in self._columns if key not in conflict and key not in ('id', 'created_at')]
+        names = {key: column.key for key, column in self._columns}
+        shard = self.shard_of(row[self.shard_key])
+        engine = db.engines[self.binds[shard]]
+        dialect = postgresql if engine.dialect.name == 'postgresql' else sqlite
+        statement = dialect.insert(self.model.__table__).values(row)
+        statement = statement.on_conflict_do_update(
+            index_elements=[names[key] for key in conflict],
+            set_={names[key]: statement.excluded[names[key]] for key in update},
+        )
+        with engine.begin() as connection:
+            connection.execute(statement)
+        with self._session(shard) as session:
+            return session.scalars(select(self.model).filter_by(
+                **{key: row[names[key]] for key in conflict})).one()
+
+    def add_many(self, objs, chunk_size=5000):
+        """Insert instances or dicts, one executemany INSERT per shard and chunk"""
+        count = 0
+        table = self.model.__table__
+        for chunk in chunked(objs, chunk_size):
+            rows = {}
+            for obj in chunk:
+                row = SQLAlchemyRepository._row(obj, self._columns) if isinstance(obj, dict) else self._row(obj)
+                rows.setdefault(self.shard_of(row[self.shard_key]), []).append(row)
+            for shard, shard_rows in rows.items():
+                with db.engines[self.binds[shard]].begin() as connection:
+                    connection.execute(table.insert(), shard_rows)
+                count += len(shard_rows)
+        return count
+
+    def get(self, obj_id, load=None):
+        self._check_load(load)
+        return self.get_by_attribute('id', obj_id)
+
+    def get_many(self, ids, load=None):
+        self._check_load(load)
+        ids = list(dict.fromkeys(ids))
+        groups = {}
+        for obj_id in ids:
+            for shard in self._shards_for({'id': obj_id}):
+                groups.setdefault(shard, []).append(obj_id)
+        found = {}
+        for shard, shard_ids in groups.items():
+            with self._session(shard) as session:
+                for obj in session.scalars(select(self.model).where(self.model.id.in_(shard_ids))):
+                    found[obj.id] = obj
+        return [found[obj_id] for obj_id in ids if obj_id in found]
+
+    def get_all(self, load=None):
+        self._check_load(load)
+        return self.query()
+
+    def get_page(self, limit, cursor=None, filters=None, load=None):
+        self._check_load(load)
+        statement = select(self.model).filter_by(**(filters or {}))
+        if cursor:
+            statement = statement.where(tuple_(self.model.created_at, self.model.id) > decode_cursor(cursor))
+        objs = self._merge(statement, filters, limit + 1)
+        if len(objs) > limit:
+            return objs[:limit], encode_cursor(objs[limit - 1])
+        return objs, None
+
+    def query(self, filters=None, order_by=None, limit=None):
+        """Fan out a filtered query to the shards and merge-sort the results.
+
+        order_by is a column name, prefixed with '-' for a descending order;
+        ties and the default order use (created_at, id).
+        """
+        return self._merge(select(self.model).filter_by(**(filters or {})), filters, limit, order_by)
+
+    def _merge(self, statement, filters, limit=None, order_by=None):
+        descending = bool(order_by) and order_by.startswith('-')
+        names = [order_by.lstrip('-')] if order_by else []
+        names += ['created_at', 'id']
+        columns = [getattr(self.model, name) for name in names]
+        # NULL en dernier (en premier à l'envers) sur tous les dialectes,
+        # comme la clé de fusion ci-dessous
+        statement = statement.order_by(*[
+            column.desc().nulls_first() if descending else column.asc().nulls_last() for column in columns])
+        if limit is not None:
+            statement = statement.limit(limit)
+        results = []
+        for shard in self._shards_for(filters):
+            with self._session(shard) as session:
+                results.append(list(session.scalars(statement)))
+
+        def key(obj):
+            # (est None, valeur) : None ne se compare pas aux autres valeurs
+            values = (getattr(obj, name) for name in names)
+            return tuple((value is None, 0 if value is None else value) for value in values)
+        return list(islice(heapq.merge(*results, key=key, reverse=descending), limit))
+
+    def update(self, obj_id, data):
+        if self.shard_key in data:
+            raise ValueError(f"{self.shard_key} cannot be changed on a sharded repository")
+        for shard in self._shards_for({'id': obj_id}):
+            with self._session(shard) as session:
+                obj = session.get(self.model, obj_id)
+                if obj:
+                    for key, value in data.items():
+                        setattr(obj, key, value)
+                    session.commit()
+                    return obj
+
+    def delete(self, obj_id):
+        # DELETE direct : pas de cascade vers les relations, stockées ailleurs
+        table = self.model.__table__
+        for shard in self._shards_for({'id': obj_id}):
+            with db.engines[self.binds[shard]].begin() as connection:
+                if connection.execute(table.delete().where(table.c.id == obj_id)).rowcount:
+                    return
+
+    def get_by_attribute(self, attr_name, attr_value):
+        filters = {attr_name: attr_value}
+        for shard in self._shards_for(filters):
+            with self._session(shard) as session:
+                obj = session.scalars(select(self.model).filter_by(**filters).limit(1)).first()
+                if obj is not None:
+                    return obj
+        return None
+
+    def existing_keys(self, attr_names, keys, chunk_size=500):
+        """Return which keys (tuples of attr_names values) are already stored"""
+        columns = [getattr(self.model, name) for name in attr_names]
+        groups = {}
+        for key in set(keys):
+            filters = dict(zip(attr_names, key))
+            for shard in self._shards_for(filters):
+                groups.setdefault(shard, []).append(key)
+        found = set()
+        for shard, shard_keys in groups.items():
+            with self._session(shard) as session:
+                for chunk in chunked(shard_keys, chunk_size):
+                    found.update(tuple(row) for row in session.execute(
+                        select(*columns).where(tuple_(*columns).in_(chunk))))
+        return found
+
+    def count(self, filters=None):
+        total = 0
+        for shard in self._shards_for(filters):
+            with self._session(shard) as session:
+                total += session.query(self.model).filter_by(**(filters or {})).order_by(None).count()
+        return total
+
+    def exists(self, filters):
+        statement = select(select(self.model).filter_by(**filters).exists())
+        for shard in self._shards_for(filters):
+            with self._session(shard) as session:
+                if session.scalar(statement):
+                    return True
+        return False
+
+    def version(self, filters=None):
+        statement = select(func.count(self.model.id), func.max(self.model.updated_at))
+        statement = statement.select_from(self.model).filter_by(**(filters or {}))
+        total, dates = 0, []
+        for shard in self._shards_for(filters):
+            with self._session(shard) as session:
+                count, last = session.execute(statement).one()
+            total += count
+            if last is not None:
+                dates.append(last)
+        return total, max(dates, default=None)
+
+
+def reshard(source, target, chunk_size=1000):
+    """Move every row of source to the bind target assigns it to.
+
+    source and target hold the same model and shard key, target usually
+    with more binds, some of them shared with source. Rows already on the
+    right bind stay in place. Each chunk is inserted into its new shard
+    (ignoring rows already there) before being deleted from the old one, so
+    an interrupted run can simply be restarted. Returns the rows moved.
+    """
+    table = source.model.__table__
+    key_name = inspect(source.model).attrs[source.shard_key].columns[0].name
+    moved = 0
+    for bind in source.binds:
+        engine = db.engines[bind]
+        last_id = None
+        while True:
+            statement = select(table).order_by(table.c.id).limit(chunk_size)
+            if last_id is not None:
+                statement = statement.where(table.c.id > last_id)
+            with engine.connect() as connection:
+                rows = [dict(row._mapping) for row in connection.execute(statement)]
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            targets = {}
+            for row in rows:
+                target_bind = target.binds[target.shard_of(row[key_name])]
+                if target_bind != bind:
+                    targets.setdefault(target_bind, []).append(row)
+            for target_bind, target_rows in targets.items():
+                target_engine = db.engines[target_bind]
+                dialect = postgresql if target_engine.dialect.name == 'postgresql' else sqlite
+                with target_engine.begin() as connection:
+                    connection.execute(dialect.insert(table).on_conflict_do_nothing(), target_rows)
+                with engine.begin() as connection:
+                    ids = [row['id'] for row in target_rows]
+                    connection.execute(table.delete().where(table.c.id.in_(ids)))
+                moved += len(target_rows)
+    return moved
+
+
+def init_app(app):
+    shards = app.config.get('REVIEW_SHARDS') or []
+    if shards:
+        app.extensions[_EXTENSION] = ShardedRepository(Review, shards, shard_key='place_id')
+
+    @app.cli.command('reshard')
+    @click.option('--from', 'previous', default='',
+                  help='Comma separated binds the reviews are sharded on now')
+    @click.option('--chunk-size', default=1000, show_default=True)
+    def reshard_command(previous, chunk_size):
+        """Create the review tables on REVIEW_SHARDS and move the reviews onto them"""
+        if not shards:
+            raise click.UsageError("REVIEW_SHARDS is not set")
+        for bind in shards:
+            create_shard_schema(db.engines[bind], [Review])
+        sources = [bind for bind in previous.split(',') if bind]
+        if sources:
+            moved = reshard(ShardedRepository(Review, sources, shard_key='place_id'),
+                            app.extensions[_EXTENSION], chunk_size)
+            click.echo(f"{moved} reviews moved")
+
+
+def reviews():
+    """The sharded review repository of the current app, None unless REVIEW_SHARDS is set"""
+    if has_app_context():
+        return current_app.extensions.get(_EXTENSION)
+    return None
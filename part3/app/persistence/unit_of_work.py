@@ -0,0 +1,87 @@
+"""Request-scoped unit of work for the SQLAlchemy repositories.
+
+While a unit of work is active, repositories only flush their changes. The
+whole request is committed once at the end, or rolled back if the handler
+failed or answered with an error status.
+"""
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+
+from app.extensions import db
+
+
+def active():
+    return has_app_context() and g.get('unit_of_work', False)
+
+
+def begin():
+    g.unit_of_work = True
+
+
+def finish(error=None):
+    """Commit the pending changes, or roll them back if error is set"""
+    if not g.pop('unit_of_work', False):
+        return
+    callbacks = g.pop('unit_of_work_after', [])
+    try:
+        if error is not None:
+            db.session.rollback()
+            return
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    finally:
+        for callback in callbacks:
+            callback()
+
+
+def after_end(callback):
+    """Call callback once the current unit of work is committed or rolled back.
+
+    Without a unit of work, callback is called right away. Used for writes
+    made on their own connection: with SQLite, the transaction of the
+    request holds the write lock until it ends.
+    """
+    if active():
+        g.setdefault('unit_of_work_after', []).append(callback)
+    else:
+        callback()
+
+
+@contextmanager
+def unit_of_work():
+    """Run a block in a single transaction, outside of a request"""
+    if active():
+        yield
+        return
+    begin()
+    try:
+        yield
+    except BaseException as e:
+        finish(e)
+        raise
+    finish()
+
+
+def init_app(app):
+    if not app.config.get('UNIT_OF_WORK', True):
+        return
+
+    @app.before_request
+    def begin_request():
+        begin()
+
+    @app.after_request
+    def commit_request(response):
+        # une réponse d'erreur annule aussi ce que le handler a écrit
+        finish(None if response.status_code < 400 else response.status_code)
+        return response
+
+    @app.teardown_request
+    def rollback_request(error=None):
+        # exception non gérée : after_request n'a pas été appelé
+        if g.get('unit_of_work', False):
+            finish(error or 'teardown')
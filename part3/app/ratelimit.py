@@ -0,0 +1,173 @@
+"""Token-bucket rate limiting of the write endpoints, before any database access.
+
+RATELIMITS maps a namespace ('auth', 'users'...) to its limits, by key:
+'ip' (client address), 'account' (email sent to the login endpoint) and
+'subject' (JWT subject). A limit reads '5/minute': a bucket of 5 tokens
+refilled at 5 per minute, so bursts of 5 are allowed. Only the methods of
+RATELIMIT_METHODS are limited. A request over a limit gets a 429 with
+Retry-After, and the rest of the app never sees it.
+
+Buckets live in memory, per process. RATELIMIT_STORAGE set to a file path
+shares them between the workers of one host through SQLite.
+"""
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import decode_token
+
+_EXTENSION = 'hbnb_ratelimit'
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(limit):
+    """'5/minute' -> (capacity, tokens per second)"""
+    try:
+        count, period = limit.split('/')
+        capacity = int(count)
+        return capacity, capacity / _PERIODS[period.strip()]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit '{limit}', expected '<count>/<second|minute|hour|day>'")
+
+
+def _take(tokens, updated, capacity, rate, now):
+    """Refill then take one token: (allowed, tokens left, seconds before the next one)"""
+    tokens = capacity if tokens is None else min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0
+    return False, tokens, (1 - tokens) / rate
+
+
+class MemoryStore:
+    """Buckets of one process, the max_keys most recently hit (LRU)"""
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            allowed, tokens, retry_after = _take(tokens, updated, capacity, rate, now)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                # le seau le moins récent : sans doute déjà plein, donc absent
+                self._buckets.popitem(last=False)
+            return allowed, retry_after
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteStore:
+    """Buckets shared by the processes of one host, in a SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key, capacity, rate, now):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (None, now)
+            allowed, tokens, retry_after = _take(tokens, updated, capacity, rate, now)
+            connection.execute('INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)', (key, tokens, now))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+    def reset(self):
+        self._connection().execute('DELETE FROM buckets')
+
+
+def _identity(kind):
+    if kind == 'ip':
+        return request.remote_addr
+    if kind == 'account':
+        payload = request.get_json(silent=True)
+        email = payload.get('email') if isinstance(payload, dict) else None
+        return email.strip().lower() if isinstance(email, str) else None
+    if kind == 'subject':
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            return None
+        try:
+            return str(decode_token(header[7:])['sub'])
+        except Exception:
+            # jeton invalide : refusé ensuite par jwt_required
+            return None
+    raise ValueError(f"Unknown rate limit key '{kind}'")
+
+
+class RateLimiter:
+    def __init__(self, limits, store, methods):
+        self.limits = {
+            namespace: [(kind, *parse_limit(limit)) for kind, limit in rules.items()]
+            for namespace, rules in limits.items()
+        }
+        self.store = store
+        self.methods = set(methods)
+
+    def check(self):
+        """Return a 429 response if the request is over one of its limits"""
+        if request.method not in self.methods:
+            return None
+        # /api/v1/<namespace>/...
+        parts = request.path.split('/', 4)
+        rules = self.limits.get(parts[3]) if len(parts) > 3 else None
+        if not rules:
+            return None
+        now = time.time()
+        for kind, capacity, rate in rules:
+            value = _identity(kind)
+            if value is None:
+                continue
+            allowed, retry_after = self.store.hit(f'{parts[3]}:{kind}:{value}', capacity, rate, now)
+            if not allowed:
+                # refusée : les limites suivantes ne consomment rien
+                break
+        else:
+            return None
+        response = jsonify({'error': 'Too many requests, retry later'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response
+
+
+def init_app(app):
+    limits = app.config.get('RATELIMITS') or {}
+    if not app.config.get('RATELIMIT_ENABLED', True) or not limits:
+        return
+    storage = app.config.get('RATELIMIT_STORAGE')
+    store = SQLiteStore(storage) if storage else MemoryStore()
+    limiter = RateLimiter(limits, store, app.config.get('RATELIMIT_METHODS', ('POST', 'PUT', 'PATCH', 'DELETE')))
+    app.extensions[_EXTENSION] = limiter
+    # avant les autres hooks : une requête refusée n'ouvre pas de transaction
+    app.before_request_funcs.setdefault(None, []).insert(0, limiter.check)
+
+
+def reset():
+    limiter = current_app.extensions.get(_EXTENSION)
+    if limiter is not None:
+        limiter.store.reset()
@@ -1,29 +1,48 @@
-from app.persistence.repository import SQLAlchemyRepository, InMemoryRepository, Repository
+from app.persistence.repository import SQLAlchemyRepository, InMemoryRepository, Repository, QueryView, chunked, violates
+from app.persistence.cache import CachedRepository
+from app.persistence import sharding
+from app.persistence.unit_of_work import unit_of_work
 from app.models.user import User
 from app.models.amenity import Amenity
 from app.models.place import Place
 from app.models.review import Review
+from app.models.place_amenity import place_amenity
 from app.extensions import db
+from app import passwords, tokens
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
 
 
 class HBnBFacade:
     def __init__(self):
-        self.user_repository = SQLAlchemyRepository(User)  # Switched to SQLAlchemyRepository
-        self.place_repository = SQLAlchemyRepository(Place)
-        self.review_repository = SQLAlchemyRepository(Review)
-        self.amenity_repository = SQLAlchemyRepository(Amenity)
+        # get(id) servi par le cache de l'entité si REPOSITORY_CACHE la liste
+        self.user_repository = CachedRepository(SQLAlchemyRepository(User))
+        self.place_repository = CachedRepository(SQLAlchemyRepository(Place))
+        self._review_repository = CachedRepository(SQLAlchemyRepository(Review))
+        self.amenity_repository = CachedRepository(SQLAlchemyRepository(Amenity))
+
+    @property
+    def review_repository(self):
+        # REVIEW_SHARDS : reviews réparties par place_id hors de la base principale
+        return sharding.reviews() or self._review_repository
 
     def create_user(self, user_data):
+        # le setter User.password hache sur le pool de passwords
         user = User(**user_data)
-        user.hash_password(user_data['password'])
         self.user_repository.add(user)
         return user
 
     def get_user(self, user_id):
         return self.user_repository.get(user_id)
 
-    def get_users(self):
-        return self.user_repository.get_all()
+    def get_users(self, load=None):
+        return self.user_repository.get_all(load=load)
+
+    def get_users_page(self, limit, cursor=None, load=None):
+        return self.user_repository.get_page(limit, cursor, load=load)
+
+    def get_users_version(self):
+        return self.user_repository.version()
 
     # Similarly, implement methods for other entities
 
@@ -35,11 +54,24 @@ class HBnBFacade:
         if not user:
             raise ValueError("User not found")   
         
-        # Si password présent, hasher
-        if 'password' in user_data and user_data['password']:
-            user.hash_password(user_data['password'])
+        # Si password présent, le setter le hache
+        if 'password' in user_data and not user_data['password']:
+            user_data = {key: value for key, value in user_data.items() if key != 'password'}
+        role_changed = 'is_admin' in user_data and bool(user_data['is_admin']) != user.is_admin
+        self.user_repository.update(user_id, user_data)
+        if role_changed:
+            # le claim is_admin des jetons déjà émis n'est plus valable
+            tokens.revoke_user(user_id)
+        return user
 
-        self.user_repository.save(user)
+    def authenticate(self, email, password):
+        """Return the user if password matches, rehashing it if its cost factor is too low"""
+        user = self.get_user_by_email(email)
+        if not user or not user.verify_password(password):
+            return None
+        if user.needs_rehash():
+            self.user_repository.update(user.id, {'password': password})
+        return user
 
     # AMENITY
     def create_amenity(self, amenity_data):
@@ -47,11 +79,14 @@ class HBnBFacade:
         self.amenity_repository.add(amenity)
         return amenity
 
-    def get_amenity(self, amenity_id):
-        return self.amenity_repository.get(amenity_id)
+    def get_amenity(self, amenity_id, load=None):
+        return self.amenity_repository.get(amenity_id, load=load)
 
-    def get_all_amenities(self):
-        return self.amenity_repository.get_all()
+    def get_amenities(self, amenity_ids, load=None):
+        return self.amenity_repository.get_many(amenity_ids, load=load)
+
+    def get_all_amenities(self, load=None):
+        return self.amenity_repository.get_all(load=load)
 
     def update_amenity(self, amenity_id, amenity_data):
         self.amenity_repository.update(amenity_id, amenity_data)
@@ -63,58 +98,106 @@ class HBnBFacade:
             raise KeyError('Invalid input data')
         del place_data['owner_id']
         place_data['owner'] = user
-        amenities = place_data.pop('amenities', None)
-        if amenities:
-            for a in amenities:
-                amenity = self.get_amenity(a['id'])
-                if not amenity:
-                    raise KeyError('Invalid input data')
+        # une seule requête IN (...) pour toutes les amenities
+        amenity_ids = [a['id'] if isinstance(a, dict) else a for a in place_data.pop('amenities', None) or []]
+        amenities = self.get_amenities(amenity_ids)
+        if len(amenities) != len(set(amenity_ids)):
+            raise KeyError('Invalid input data')
         place = Place(**place_data)
+        place.amenities = amenities
         self.place_repository.add(place)
-        if amenities:
-            for amenity in amenities:
-                place.add_amenity(amenity)
         return place
 
-    def get_place(self, place_id):
-        return self.place_repository.get(place_id)
+    def get_place(self, place_id, load=None):
+        return self.place_repository.get(place_id, load=load)
+
+    def get_all_places(self, load=None):
+        return self.place_repository.get_all(load=load)
+
+    def get_places_page(self, limit, cursor=None, load=None):
+        return self.place_repository.get_page(limit, cursor, load=load)
 
-    def get_all_places(self):
-        return self.place_repository.get_all()
+    def get_places_version(self):
+        return self.place_repository.version()
 
     def update_place(self, place_id, place_data):
         self.place_repository.update(place_id, place_data)
 
+    def add_amenities_to_place(self, place_id, amenity_ids):
+        place = self.place_repository.get(place_id, load={'amenities': 'selectin'})
+        if not place:
+            raise KeyError('Place not found')
+        amenities = self.get_amenities(amenity_ids)
+        if len(amenities) != len(set(amenity_ids)):
+            raise KeyError('Invalid input data')
+        linked = set(a.id for a in place.amenities)
+        # la place est servie avec ses amenities : sa version doit changer
+        self.place_repository.update(place_id, {
+            'amenities': place.amenities + [a for a in amenities if a.id not in linked],
+            'updated_at': datetime.utcnow(),
+        })
+        return place
+
+    def add_amenity_to_place(self, place_id, amenity_id):
+        return self.add_amenities_to_place(place_id, [amenity_id])
+
     # REVIEWS
     def create_review(self, review_data):
-        user = self.user_repository.get(review_data['user_id'])
-        if not user:
+        # par clés étrangères : la review peut être stockée sur un shard,
+        # loin de la session de la place et de l'utilisateur
+        if not self.user_repository.get(review_data['user_id']):
             raise KeyError('Invalid input data')
-        del review_data['user_id']
-        review_data['user'] = user
-
-        place = self.place_repository.get(review_data['place_id'])
-        if not place:
+        if not self.place_repository.get(review_data['place_id']):
             raise KeyError('Invalid input data')
-        del review_data['place_id']
-        review_data['place'] = place
 
         review = Review(**review_data)
-        self.review_repository.add(review)
+        try:
+            self.review_repository.add(review)
+        except IntegrityError as e:
+            # deux requêtes concurrentes : la contrainte unique tranche ; les
+            # autres erreurs (clé étrangère, NOT NULL...) remontent telles quelles
+            if not violates(e, Review.__table__, 'uq_reviews_place_id_user_id'):
+                raise
+            raise ValueError('You have already reviewed this place')
         return review
 
+    def upsert_review(self, review_data):
+        """Create the review of a user for a place, or replace its text and rating"""
+        for key, repository in (('user_id', self.user_repository), ('place_id', self.place_repository)):
+            if not repository.exists({'id': review_data.get(key)}):
+                raise KeyError('Invalid input data')
+        review = Review(**review_data)
+        return self.review_repository.upsert(review, conflict=('place_id', 'user_id'), update=('text', 'rating', 'updated_at'))
+
         
-    def get_review(self, review_id):
-        return self.review_repository.get(review_id)
+    def get_review(self, review_id, load=None):
+        return self.review_repository.get(review_id, load=load)
+
+    def get_all_reviews(self, load=None):
+        return self.review_repository.get_all(load=load)
 
-    def get_all_reviews(self):
-        return self.review_repository.get_all()
+    def get_reviews_page(self, limit, cursor=None, place_id=None, load=None):
+        filters = {'place_id': place_id} if place_id else None
+        return self.review_repository.get_page(limit, cursor, filters, load=load)
+
+    def get_reviews_version(self, place_id=None):
+        return self.review_repository.version({'place_id': place_id} if place_id else None)
 
     def get_reviews_by_place(self, place_id):
+        """Return the reviews of a place as a lazy QueryView"""
         place = self.place_repository.get(place_id)
         if not place:
             raise KeyError('Place not found')
-        return place.reviews
+        if sharding.reviews():
+            # place.reviews interroge la base principale
+            return self.review_repository.query({'place_id': place_id})
+        return QueryView(place.reviews)
+
+    def count_reviews_by_place(self, place_id):
+        return self.review_repository.count({'place_id': place_id})
+
+    def has_reviewed(self, user_id, place_id):
+        return self.review_repository.exists({'place_id': place_id, 'user_id': user_id})
 
     def update_review(self, review_id, review_data):
         review = self.review_repository.get(review_id)
@@ -124,11 +207,79 @@ class HBnBFacade:
 
 
     def delete_review(self, review_id):
-        review = self.review_repository.get(review_id)
-        
-        user = self.user_repository.get(review.user.id)
-        place = self.place_repository.get(review.place.id)
-
-        user.delete_review(review)
-        place.delete_review(review)
+        # l'ORM retire la review des collections place.reviews / user.reviews,
+        # inutile de recharger l'utilisateur et la place
         self.review_repository.delete(review_id)
+
+    # BULK
+    # une requête INSERT (executemany) et un commit par paquet de lignes,
+    # au lieu d'une transaction par objet
+    def _check_ids(self, repository, ids):
+        ids = set(ids)
+        if len(repository.get_many(ids)) != len(ids):
+            raise KeyError('Invalid input data')
+
+    def bulk_create_users(self, users_data, chunk_size=None):
+        """Create many users, return how many were inserted.
+
+        The passwords of a chunk are hashed together, on every worker of the pool.
+        """
+        count = 0
+        for chunk in chunked(users_data, chunk_size or self.user_repository.bulk_chunk_size):
+            chunk = [dict(data) for data in chunk]
+            hashes = passwords.hash_many(data.pop('password') for data in chunk)
+            users = [User(**data, password_hash=password_hash) for data, password_hash in zip(chunk, hashes)]
+            count += self.user_repository.add_many(users, len(users))
+        return count
+
+    def bulk_create_amenities(self, amenities_data, chunk_size=None):
+        """Create many amenities, return how many were inserted"""
+        return self.amenity_repository.add_many((Amenity(**data) for data in amenities_data), chunk_size)
+
+    def bulk_create_places(self, places_data, chunk_size=None):
+        """Create many places and their amenity links, return how many places were inserted"""
+        count = 0
+        for chunk in chunked(places_data, chunk_size or self.place_repository.bulk_chunk_size):
+            places, links = [], []
+            for data in chunk:
+                data = dict(data)
+                amenity_ids = [a['id'] if isinstance(a, dict) else a for a in data.pop('amenities', None) or []]
+                place = Place(**data)
+                places.append(place)
+                links.append((place, amenity_ids))
+            self._check_ids(self.user_repository, (place.owner_id for place in places))
+            self._check_ids(self.amenity_repository, (a for _, ids in links for a in ids))
+            # places et liens dans la même transaction : tout le paquet ou rien
+            with unit_of_work():
+                count += self.place_repository.add_many(places, len(places))
+                self.bulk_link_amenities((place.id, a) for place, ids in links for a in ids)
+        return count
+
+    def bulk_create_reviews(self, reviews_data, chunk_size=None):
+        """Create many reviews, return how many were inserted"""
+        count = 0
+        for chunk in chunked(reviews_data, chunk_size or self.review_repository.bulk_chunk_size):
+            reviews = [Review(**data) for data in chunk]
+            self._check_ids(self.user_repository, (review.user_id for review in reviews))
+            self._check_ids(self.place_repository, (review.place_id for review in reviews))
+            self._check_unique_reviews(reviews, count)
+            count += self.review_repository.add_many(reviews, len(reviews))
+        return count
+
+    def _check_unique_reviews(self, reviews, first_row):
+        """Raise ValueError naming the rows that repeat a (place_id, user_id) pair"""
+        pairs = [(review.place_id, review.user_id) for review in reviews]
+        stored = self.review_repository.existing_keys(('place_id', 'user_id'), pairs)
+        seen, duplicates = set(), []
+        for row, pair in enumerate(pairs, first_row):
+            if pair in stored or pair in seen:
+                duplicates.append(row)
+            seen.add(pair)
+        if duplicates:
+            rows = ', '.join(str(row) for row in duplicates)
+            raise ValueError(f"Duplicate reviews (same place_id and user_id) at rows {rows}")
+
+    def bulk_link_amenities(self, links, chunk_size=None):
+        """Insert (place_id, amenity_id) pairs into place_amenity, return how many"""
+        rows = ({'place_id': place_id, 'amenity_id': amenity_id} for place_id, amenity_id in links)
+        return self.place_repository.insert_rows(place_amenity.insert(), rows, chunk_size)
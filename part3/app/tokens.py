@@ -0,0 +1,226 @@
+"""Short-lived access tokens, rotated refresh tokens and their revocation.
+
+A login issues an access token (JWT_ACCESS_TOKEN_EXPIRES, short) and a
+refresh token (JWT_REFRESH_TOKEN_EXPIRES). Both are signed for the user id,
+carry the is_admin claim and share a family id. /auth/refresh revokes the
+refresh token it receives and issues a new pair of the same family, read
+again from the users table. Presenting a refresh token already rotated
+revokes the whole family: a stolen token dies with the legitimate one.
+
+Revocations are rows of revoked_tokens, by token, family or user. Each
+process keeps their keys in a bloom filter: a token matching none of its
+keys, the usual case, is accepted without any query. A match is confirmed
+in the table (false positives, JWT_REVOCATION_ERROR_RATE). The filter
+loads the revocations of the other processes every JWT_REVOCATION_SYNC
+seconds, so a revocation made elsewhere takes at most that long to apply.
+"""
+import hashlib
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, has_app_context
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.extensions import db, jwt
+from app.models.revoked_token import RevokedToken
+from app.persistence import unit_of_work
+
+_EXTENSION = 'hbnb_revocations'
+# entrées confirmées par la table gardées en mémoire
+_CONFIRMED_MAX = 10000
+
+
+class BloomFilter:
+    """Set of strings with false positives at error_rate, in bits"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, key):
+        # double hachage : k positions tirées de deux moitiés d'un seul digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        positions = self._positions(key)
+        with self._lock:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    """Revocations of the current app, filtered in memory"""
+
+    def __init__(self, capacity=100_000, error_rate=0.001, sync_seconds=5):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self.bloom = BloomFilter(capacity, error_rate)
+        self._confirmed = {}
+        self._synced_at = None
+        self._next_sync = 0
+        self._lock = threading.Lock()
+
+    def _upsert(self, key, expires_at, now):
+        table = RevokedToken.__table__
+        dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+        statement = dialect.insert(table).values(key=key, revoked_at=now, expires_at=expires_at)
+        statement = statement.on_conflict_do_update(
+            index_elements=['key'], set_={'revoked_at': now, 'expires_at': expires_at})
+        # hors de la transaction de la requête, après elle : une réponse
+        # d'erreur (réutilisation d'un refresh token) ne doit pas annuler
+        # la révocation
+        with db.engine.begin() as connection:
+            connection.execute(statement)
+
+    def revoke(self, key, expires_at):
+        """Record a revocation once the request transaction has ended"""
+        unit_of_work.after_end(lambda: self._write(key, expires_at))
+
+    def _write(self, key, expires_at):
+        now = datetime.utcnow()
+        self._upsert(key, expires_at, now)
+        self.bloom.add(key)
+        self._confirmed[key] = now
+
+    def revoked_at(self, key):
+        """When key was revoked, None if it was not"""
+        self._sync()
+        if key not in self.bloom:
+            return None
+        if key in self._confirmed:
+            return self._confirmed[key]
+        with db.engine.connect() as connection:
+            revoked_at = connection.scalar(select(RevokedToken.revoked_at).where(RevokedToken.key == key))
+        if revoked_at is not None:
+            if len(self._confirmed) >= _CONFIRMED_MAX:
+                self._confirmed.clear()
+            self._confirmed[key] = revoked_at
+        return revoked_at
+
+    def _sync(self):
+        if time.monotonic() < self._next_sync:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            if self.bloom.count > self.capacity:
+                self._rebuild()
+            statement = select(RevokedToken.key, RevokedToken.revoked_at)
+            if self._synced_at is not None:
+                # marge : une transaction d'un autre process a pu valider une
+                # date un peu antérieure après notre dernière lecture
+                statement = statement.where(RevokedToken.revoked_at >= self._synced_at - timedelta(seconds=1))
+            synced_at = datetime.utcnow()
+            with db.engine.connect() as connection:
+                for key, revoked_at in connection.execute(statement):
+                    self.bloom.add(key)
+                    self._confirmed.pop(key, None)
+            self._synced_at = synced_at
+            self._next_sync = time.monotonic() + self.sync_seconds
+
+    def _rebuild(self):
+        """Drop the expired revocations, then start a filter from the table"""
+        with db.engine.begin() as connection:
+            connection.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.utcnow()))
+        self.bloom = BloomFilter(self.capacity, self.error_rate)
+        self._confirmed.clear()
+        self._synced_at = None
+
+    def reset(self):
+        with self._lock:
+            self.bloom = BloomFilter(self.capacity, self.error_rate)
+            self._confirmed.clear()
+            self._synced_at = None
+            self._next_sync = 0
+
+
+def init_app(app):
+    app.extensions[_EXTENSION] = RevocationList(
+        capacity=app.config.get('JWT_REVOCATION_CAPACITY', 100_000),
+        error_rate=app.config.get('JWT_REVOCATION_ERROR_RATE', 0.001),
+        sync_seconds=app.config.get('JWT_REVOCATION_SYNC', 5),
+    )
+
+
+def revocations():
+    return current_app.extensions[_EXTENSION]
+
+
+def reset():
+    if has_app_context() and _EXTENSION in current_app.extensions:
+        revocations().reset()
+
+
+def _expires(token_type):
+    """Latest expiry of a token of that type issued now"""
+    return datetime.utcnow() + current_app.config[
+        'JWT_REFRESH_TOKEN_EXPIRES' if token_type == 'refresh' else 'JWT_ACCESS_TOKEN_EXPIRES']
+
+
+def issue(user, family=None):
+    """Access and refresh tokens of user; a new family unless rotating one"""
+    # issued : date d'émission à la microseconde, iat n'a que la seconde
+    claims = {'is_admin': user.is_admin, 'family': family or str(uuid.uuid4()), 'issued': time.time()}
+    return {
+        'access_token': create_access_token(identity=str(user.id), additional_claims=claims),
+        'refresh_token': create_refresh_token(identity=str(user.id), additional_claims=claims),
+    }
+
+
+def revoke_token(payload):
+    """Revoke one decoded token until it expires"""
+    expires_at = datetime.fromtimestamp(payload['exp'], timezone.utc).replace(tzinfo=None)
+    revocations().revoke(f"jti:{payload['jti']}", expires_at)
+
+
+def revoke_family(family):
+    """Revoke every token of a login, access and refresh"""
+    revocations().revoke(f'family:{family}', _expires('refresh'))
+
+
+def revoke_user(user_id):
+    """Revoke every token issued so far to user_id"""
+    revocations().revoke(f'user:{user_id}', _expires('refresh'))
+
+
+def is_revoked(payload):
+    """True if the token, its family or its user was revoked"""
+    revoked = revocations()
+    if revoked.revoked_at(f"jti:{payload['jti']}") is not None:
+        # refresh token déjà utilisé : rejeu, on coupe toute la famille
+        if payload.get('type') == 'refresh' and payload.get('family'):
+            revoke_family(payload['family'])
+        return True
+    if payload.get('family') and revoked.revoked_at(f"family:{payload['family']}") is not None:
+        return True
+    revoked_at = revoked.revoked_at(f"user:{payload['sub']}")
+    if revoked_at is None:
+        return False
+    # iat est tronqué à la seconde : un jeton émis juste après la révocation,
+    # dans la même seconde, aurait iat < revoked_at. Les jetons sans issued
+    # (émis avant ce claim) gardent iat, quitte à être refusés à tort
+    issued = payload.get('issued', payload['iat'])
+    return issued < revoked_at.replace(tzinfo=timezone.utc).timestamp()
+
+
+@jwt.token_in_blocklist_loader
+def _token_in_blocklist(jwt_header, jwt_payload):
+    return is_revoked(jwt_payload)
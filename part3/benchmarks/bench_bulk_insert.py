@@ -0,0 +1,71 @@
+"""Loading reviews into SQLite: one add() per review vs the bulk insert API.
+
+Usage: python benchmarks/bench_bulk_insert.py [reviews] [per_object_reviews]
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from app import create_app
+from app.extensions import db
+from app.models.review import Review
+from app.services import facade
+
+
+def reviews(size, place_ids, user_ids):
+    # une review par couple (place, utilisateur)
+    for i in range(size):
+        place_id = place_ids[i // len(user_ids)]
+        yield {'text': f'Review {i}', 'rating': 1 + i % 5, 'place_id': place_id, 'user_id': user_ids[i % len(user_ids)]}
+
+
+def timed(label, size, load):
+    Review.query.delete()
+    db.session.commit()
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+    assert Review.query.count() == size
+    print(f"{label}: {size} reviews in {elapsed:.2f}s ({size / elapsed:,.0f}/s)")
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    slow_size = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(config.DevelopmentConfig):
+            DEBUG = False
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            # sans passer par bcrypt : seules les reviews sont mesurées
+            side = int(size ** 0.5) + 1
+            user_ids = [f'user{i}' for i in range(side)]
+            place_ids = [f'place{i}' for i in range(side)]
+            facade.user_repository.add_many(
+                {'id': user_id, 'first_name': 'Bench', 'last_name': 'User',
+                 'email': f'{user_id}@example.com', '_password': 'hash'}
+                for user_id in user_ids)
+            facade.place_repository.add_many(
+                {'id': place_id, 'title': 'Loft', 'price': 10.0, 'latitude': 1.0,
+                 'longitude': 2.0, 'owner_id': user_ids[0]}
+                for place_id in place_ids)
+
+            def one_by_one():
+                for data in reviews(slow_size, place_ids, user_ids):
+                    facade.review_repository.add(Review(**data))
+
+            timed("add() per review", slow_size, one_by_one)
+            timed("facade.bulk_create_reviews", size // 10,
+                  lambda: facade.bulk_create_reviews(reviews(size // 10, place_ids, user_ids)))
+            timed("repository.add_many (dict rows)", size,
+                  lambda: facade.review_repository.add_many(reviews(size, place_ids, user_ids)))
+
+
+if __name__ == '__main__':
+    main()
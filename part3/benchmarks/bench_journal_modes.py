@@ -0,0 +1,66 @@
+"""Write throughput of the SQLite journal modes: rollback journal vs WAL.
+
+Each write is a small transaction, as an API request in its unit of work.
+Usage: python benchmarks/bench_journal_modes.py [transactions] [threads]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from app import create_app
+from app.extensions import db
+from app.persistence.unit_of_work import unit_of_work
+from app.services import facade
+
+MODES = [
+    ('rollback journal, synchronous=FULL', {'journal_mode': 'DELETE', 'synchronous': 'FULL'}),
+    ('WAL, synchronous=FULL', {'journal_mode': 'WAL', 'synchronous': 'FULL'}),
+    ('WAL, synchronous=NORMAL (prod-sqlite)', {'journal_mode': 'WAL', 'synchronous': 'NORMAL'}),
+]
+
+
+def write(app, start, count):
+    with app.app_context():
+        for i in range(start, start + count):
+            with unit_of_work():
+                facade.create_amenity({'name': f'amenity{i}'})
+        db.session.remove()
+
+
+def run(directory, name, pragmas, transactions, threads):
+    class BenchConfig(config.ProductionSQLiteConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, name)}.db"
+        SQLITE_PRAGMAS = dict(config.ProductionSQLiteConfig.SQLITE_PRAGMAS, **pragmas)
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+    per_thread = transactions // threads
+    workers = [threading.Thread(target=write, args=(app, i * per_thread, per_thread)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    with app.app_context():
+        db.engine.dispose()
+    return per_thread * threads / elapsed
+
+
+def main():
+    transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    with tempfile.TemporaryDirectory() as directory:
+        for i, (label, pragmas) in enumerate(MODES):
+            single = run(directory, f'single{i}', pragmas, transactions, 1)
+            concurrent = run(directory, f'concurrent{i}', pragmas, transactions, threads)
+            print(f"{label:40} {single:8,.0f} tx/s   {threads} threads: {concurrent:8,.0f} tx/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Query timings on a pre-migration schema, before and after the index migrations.
+
+Usage: python benchmarks/bench_migrations.py [places] [reviews]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import MetaData, UniqueConstraint
+
+import config
+from app import create_app
+from app.extensions import db
+from app.models.place import Place
+from app.models.review import Review
+from app.persistence import migrations
+from app.persistence.repository import encode_cursor
+from app.services import facade
+
+USERS = 2_000
+
+
+def create_legacy_schema(engine):
+    """Tables as create_all() built them before the migrations existed"""
+    legacy = MetaData()
+    for table in db.metadata.sorted_tables:
+        # ajoutée depuis par la migration 0002
+        if table.name == 'revoked_tokens':
+            continue
+        copy = table.to_metadata(legacy)
+        copy.indexes.clear()
+        for constraint in list(copy.constraints):
+            if isinstance(constraint, UniqueConstraint) and constraint.name:
+                copy.constraints.discard(constraint)
+    legacy.create_all(engine)
+
+
+def load(places, reviews):
+    rng = random.Random(0)
+    user_ids = [f'user{i}' for i in range(USERS)]
+    facade.user_repository.add_many(
+        {'id': user_id, 'first_name': 'Bench', 'last_name': 'User',
+         'email': f'{user_id}@example.com', '_password': 'hash'}
+        for user_id in user_ids)
+    place_ids = [f'place{i}' for i in range(places)]
+    facade.place_repository.add_many(
+        {'id': place_id, 'title': 'Loft', 'price': rng.uniform(10, 500), 'latitude': 1.0,
+         'longitude': 2.0, 'owner_id': rng.choice(user_ids)}
+        for place_id in place_ids)
+    facade.review_repository.add_many(
+        {'text': 'Nice', 'rating': 5, 'place_id': place_ids[i // USERS], 'user_id': user_ids[i % USERS]}
+        for i in range(reviews))
+    return user_ids, place_ids
+
+
+def queries(user_ids, place_ids):
+    deep = Place.query.order_by(Place.created_at, Place.id).offset(len(place_ids) - 100).first()
+    cursor = encode_cursor(deep)
+    return {
+        'has_reviewed (place_id, user_id)': lambda: facade.has_reviewed(user_ids[7], place_ids[3]),
+        'count reviews of a place': lambda: facade.count_reviews_by_place(place_ids[3]),
+        'count reviews of a user': lambda: Review.query.filter_by(user_id=user_ids[7]).count(),
+        'places of an owner': lambda: Place.query.filter_by(owner_id=user_ids[7]).all(),
+        'cheapest 20 places in a price range': lambda: Place.query.filter(
+            Place.price.between(100, 110)).order_by(Place.price).limit(20).all(),
+        'deep places page (cursor)': lambda: facade.get_places_page(20, cursor),
+    }
+
+
+def measure(runs):
+    timings = {}
+    for name, query in runs.items():
+        repeat = 20
+        start = time.perf_counter()
+        for _ in range(repeat):
+            query()
+            db.session.expunge_all()
+        timings[name] = (time.perf_counter() - start) / repeat * 1000
+    return timings
+
+
+def main():
+    places = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    reviews = int(sys.argv[2]) if len(sys.argv) > 2 else 300_000
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(config.DevelopmentConfig):
+            DEBUG = False
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            create_legacy_schema(db.engine)
+            user_ids, place_ids = load(places, reviews)
+            runs = queries(user_ids, place_ids)
+            before = measure(runs)
+            start = time.perf_counter()
+            migrations.upgrade(db.engine)
+            print(f"migration on {places} places / {reviews} reviews: {time.perf_counter() - start:.2f}s")
+            after = measure(runs)
+            for name in runs:
+                print(f"{name:38} {before[name]:9.3f} ms -> {after[name]:7.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""CPU time of the list endpoints, with and without the fragment cache.
+
+Usage: python benchmarks/bench_serialization.py [places] [requests]
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from app import create_app
+from app.extensions import db
+from app.services import facade
+
+URLS = ['/api/v1/places/', '/api/v1/places/?limit=100', '/api/v1/reviews/']
+
+
+def make_app(path, cache_bytes):
+    class BenchConfig(config.DevelopmentConfig):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SERIALIZATION_CACHE_BYTES = cache_bytes
+
+    return create_app(BenchConfig)
+
+
+def fill(app, size):
+    with app.app_context():
+        db.create_all()
+        facade.user_repository.add_many(
+            {'id': f'user{i}', 'first_name': 'Bench', 'last_name': 'User',
+             'email': f'user{i}@example.com', '_password': 'hash'}
+            for i in range(size))
+        facade.place_repository.add_many(
+            {'id': f'place{i}', 'title': f'Place {i}', 'description': 'A quiet place',
+             'price': 10.0 + i, 'latitude': 1.0, 'longitude': 2.0, 'owner_id': 'user0'}
+            for i in range(size))
+        facade.review_repository.add_many(
+            {'text': f'Review {i}', 'rating': 1 + i % 5, 'place_id': f'place{i}', 'user_id': f'user{i}'}
+            for i in range(size))
+
+
+def measure(app, url, requests):
+    client = app.test_client()
+    client.get(url)
+    start = time.process_time()
+    for _ in range(requests):
+        assert client.get(url).status_code == 200
+    return (time.process_time() - start) / requests * 1000
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        fill(make_app(path, 0), size)
+        apps = {'no cache': make_app(path, 0), 'fragment cache': make_app(path, 64 * 1024 * 1024)}
+        for url in URLS:
+            timings = '   '.join(f"{label}: {measure(app, url, requests):6.2f} ms" for label, app in apps.items())
+            print(f"{url:28} {timings}")
+
+
+if __name__ == '__main__':
+    main()
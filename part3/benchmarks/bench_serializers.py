@@ -0,0 +1,71 @@
+"""Serializing a list of places: flask-restx marshal() vs the compiled serializer.
+
+The places (with their owner and amenities) are loaded once; only the
+conversion to JSON bytes is timed.
+Usage: python benchmarks/bench_serializers.py [places] [rounds]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask_restx import marshal
+
+import config
+from app import create_app
+from app.api.v1.fragments import encode
+from app.api.v1.places import PLACE_LOAD, place_output_model, serialize_place
+from app.extensions import db
+from app.services import facade
+
+
+def best(rounds, serialize):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        body = serialize()
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(body)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(config.DevelopmentConfig):
+            DEBUG = False
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            facade.user_repository.add_many(
+                {'id': f'user{i}', 'first_name': 'Bench', 'last_name': 'User',
+                 'email': f'user{i}@example.com', '_password': 'hash'}
+                for i in range(100))
+            facade.bulk_create_amenities({'name': f'amenity{i}'} for i in range(10))
+            amenity_ids = [a.id for a in facade.get_all_amenities()]
+            facade.bulk_create_places(
+                {'title': f'Place {i}', 'description': 'A quiet place', 'price': 10.0 + i,
+                 'latitude': 1.0, 'longitude': 2.0, 'owner_id': f'user{i % 100}',
+                 'amenities': amenity_ids[:i % 4]}
+                for i in range(size))
+            places = list(facade.get_all_places(load=PLACE_LOAD))
+
+            cases = [
+                ('marshal_with (to_dict + marshal + dumps)',
+                 lambda: json.dumps(marshal([place.to_dict() for place in places], place_output_model)).encode()),
+                ('marshal on the rows + dumps',
+                 lambda: json.dumps(marshal(places, place_output_model), default=str).encode()),
+                ('compiled serializer + dumps',
+                 lambda: b'[' + b','.join(encode(serialize_place(place)) for place in places) + b']'),
+            ]
+            for label, serialize in cases:
+                elapsed, length = best(rounds, serialize)
+                print(f"{label:42} {elapsed * 1000:8.1f} ms  {length / 1024:8.0f} kB")
+
+
+if __name__ == '__main__':
+    main()
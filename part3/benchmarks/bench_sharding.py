@@ -0,0 +1,78 @@
+"""Write throughput of hash-sharded places over 1, 2 and 4 SQLite files.
+
+Writer processes commit one place per transaction, synchronous=FULL: on a
+single file they queue on its write lock, with more shards they write in
+parallel.
+Usage: python benchmarks/bench_sharding.py [transactions] [processes]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from app import create_app
+from app.extensions import db
+from app.models.place import Place
+from app.models.review import Review
+from app.persistence.sharding import ShardedRepository, create_shard_schema
+
+
+def make_app(directory, shards):
+    class BenchConfig(config.ProductionSQLiteConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'primary.db')}"
+        SQLALCHEMY_BINDS = {f'shard{i}': f"sqlite:///{os.path.join(directory, f'shard{i}.db')}"
+                            for i in range(shards)}
+        SQLALCHEMY_READ_BINDS = []
+        SQLITE_PRAGMAS = dict(config.ProductionSQLiteConfig.SQLITE_PRAGMAS,
+                              synchronous='FULL', busy_timeout=60000)
+
+    return create_app(BenchConfig)
+
+
+def write(directory, shards, worker, count):
+    app = make_app(directory, shards)
+    with app.app_context():
+        repo = ShardedRepository(Place, list(app.config['SQLALCHEMY_BINDS']))
+        for i in range(count):
+            repo.add(Place(title=f'Place {worker}-{i}', price=10.0, latitude=1.0,
+                           longitude=2.0, owner_id='owner'))
+
+
+def run(directory, shards, transactions, processes):
+    app = make_app(directory, shards)
+    with app.app_context():
+        for bind in app.config['SQLALCHEMY_BINDS']:
+            create_shard_schema(db.engines[bind], [Place, Review])
+        for engine in db.engines.values():
+            engine.dispose()
+    per_process = transactions // processes
+    workers = [multiprocessing.Process(target=write, args=(directory, shards, i, per_process))
+               for i in range(processes)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    with app.app_context():
+        total = ShardedRepository(Place, list(app.config['SQLALCHEMY_BINDS'])).count()
+    assert total == per_process * processes
+    return total / elapsed
+
+
+def main():
+    transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    base = None
+    for shards in (1, 2, 4):
+        with tempfile.TemporaryDirectory() as directory:
+            rate = run(directory, shards, transactions, processes)
+        base = base or rate
+        print(f"{shards} shard(s), {processes} writers: {rate:8,.0f} tx/s   x{rate / base:.2f}")
+
+
+if __name__ == '__main__':
+    main()
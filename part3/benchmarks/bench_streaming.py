@@ -0,0 +1,73 @@
+"""Peak memory and time to first byte of /api/v1/reviews/, buffered vs streamed.
+
+Usage: python benchmarks/bench_streaming.py [reviews]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from app import create_app
+from app.extensions import db
+from app.services import facade
+
+MODES = [
+    ('buffered JSON', '/api/v1/reviews/', {}),
+    ('streamed JSON', '/api/v1/reviews/?stream=1', {}),
+    ('streamed NDJSON', '/api/v1/reviews/', {'Accept': 'application/x-ndjson'}),
+]
+
+
+def measure(client, url, headers):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, headers=headers, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks))
+    first_byte = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_byte, elapsed, peak, size
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(config.DevelopmentConfig):
+            DEBUG = False
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+            # le cache de fragments garderait les lignes en mémoire
+            SERIALIZATION_CACHE_BYTES = 0
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            side = int(size ** 0.5) + 1
+            facade.user_repository.add_many(
+                {'id': f'user{i}', 'first_name': 'Bench', 'last_name': 'User',
+                 'email': f'user{i}@example.com', '_password': 'hash'}
+                for i in range(side))
+            facade.place_repository.add_many(
+                {'id': f'place{i}', 'title': 'Loft', 'price': 10.0, 'latitude': 1.0,
+                 'longitude': 2.0, 'owner_id': 'user0'}
+                for i in range(side))
+            facade.review_repository.add_many(
+                {'text': f'Review {i}', 'rating': 1 + i % 5, 'place_id': f'place{i // side}',
+                 'user_id': f'user{i % side}'}
+                for i in range(size))
+        client = app.test_client()
+        for label, url, headers in MODES:
+            first_byte, elapsed, peak, length = measure(client, url, headers)
+            print(f"{label:16} first byte {first_byte * 1000:8.1f} ms   total {elapsed:6.2f}s   "
+                  f"peak {peak / 2 ** 20:7.1f} MiB   body {length / 2 ** 20:6.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
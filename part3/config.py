@@ -1,27 +1,164 @@
 import os
+from datetime import timedelta
+
+from sqlalchemy.pool import StaticPool
 
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
     DEBUG = False
+    # une transaction par requête au lieu d'un commit par appel de repository
+    UNIT_OF_WORK = True
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # profil moteur : options de create_engine et PRAGMA SQLite exécutés à
+    # chaque nouvelle connexion (voir app/persistence/engine.py)
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLITE_PRAGMAS = {'foreign_keys': 'ON'}
+    # réplicas en lecture : clés de SQLALCHEMY_BINDS recevant les lectures
+    # des repositories ; après une écriture, un client lit le primaire
+    # pendant READ_YOUR_WRITES_SECONDS
+    SQLALCHEMY_BINDS = {}
+    SQLALCHEMY_READ_BINDS = []
+    READ_YOUR_WRITES_SECONDS = 5
+    # reviews réparties par place_id sur ces clés de SQLALCHEMY_BINDS (voir
+    # app/persistence/sharding.py) ; vide : dans la base principale
+    REVIEW_SHARDS = []
+    # hachage bcrypt sur un pool de processus (voir app/passwords.py) :
+    # WORKERS=None -> un par cœur, 0 -> sur le thread de la requête ; avec
+    # TARGET_MS, le coût est calibré au démarrage pour cette latence
+    BCRYPT_LOG_ROUNDS = 12
+    PASSWORD_HASH_WORKERS = None
+    PASSWORD_HASH_MAX_PENDING = None
+    PASSWORD_HASH_QUEUE_TIMEOUT = 5
+    PASSWORD_HASH_TARGET_MS = None
+    # Cache-Control des GET par namespace ; les réponses portent aussi
+    # ETag et Last-Modified (voir app/api/v1/conditional.py)
+    CACHE_CONTROL = {
+        'places': 'public, max-age=30',
+        'reviews': 'public, max-age=30',
+        'amenities': 'public, max-age=300',
+        'users': 'private, no-cache',
+    }
+    # fragments JSON des entités pour les listes (app/api/v1/fragments.py)
+    SERIALIZATION_CACHE_BYTES = 64 * 1024 * 1024
+    # cache des lectures par id, par entité (voir app/persistence/cache.py) ;
+    # ttl en secondes : borne le retard sur les écritures des autres process
+    REPOSITORY_CACHE = {
+        'User': {'max_size': 10000, 'ttl': 60},
+        'Place': {'max_size': 10000, 'ttl': 60},
+        'Amenity': {'max_size': 1000, 'ttl': 300},
+    }
+    # jetons d'accès courts, refresh tokens tournants ; révocations filtrées
+    # en mémoire, relues dans la table toutes les SYNC secondes (voir
+    # app/tokens.py)
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=15)
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    JWT_REVOCATION_CAPACITY = 100_000
+    JWT_REVOCATION_ERROR_RATE = 0.001
+    JWT_REVOCATION_SYNC = 5
+    # limites des méthodes d'écriture par namespace et par clé : 'ip',
+    # 'account' (email du login), 'subject' (sujet du JWT) ; STORAGE, un
+    # fichier SQLite partagé par les workers (voir app/ratelimit.py)
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE = os.getenv('RATELIMIT_STORAGE')
+    RATELIMITS = {
+        'auth': {'ip': '20/minute', 'account': '5/minute'},
+        'users': {'ip': '30/minute', 'subject': '30/minute'},
+        'places': {'ip': '120/minute', 'subject': '60/minute'},
+        'reviews': {'ip': '120/minute', 'subject': '60/minute'},
+        'amenities': {'ip': '120/minute', 'subject': '60/minute'},
+    }
+
+
+def _replica_binds():
+    """Read binds from REPLICA_DATABASE_URLS (comma separated)"""
+    urls = [url for url in os.getenv('REPLICA_DATABASE_URLS', '').split(',') if url]
+    return {f'replica{i}': url for i, url in enumerate(urls)}
 
 
 class DevelopmentConfig(Config):
+    ENGINE_PROFILE = 'dev'
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///development.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = 'sqlite:///dev.db'
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        # sessions utilisées depuis les threads du serveur de dev
+        'connect_args': {'check_same_thread': False, 'timeout': 5},
+    }
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'foreign_keys': 'ON',
+        'busy_timeout': 5000,
+    }
 
 
-class TestingConfig:
+class TestingConfig(Config):
+    ENGINE_PROFILE = 'test'
     TESTING = True
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    # une seule connexion partagée : sinon chaque connexion voit sa propre
+    # base :memory: vide
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': StaticPool,
+        'connect_args': {'check_same_thread': False},
+    }
     SECRET_KEY = "test-secret"
     JWT_SECRET_KEY = "test-super"
+    # coût minimal, sur le thread du test
+    BCRYPT_LOG_ROUNDS = 4
+    PASSWORD_HASH_WORKERS = 0
+    SERIALIZATION_CACHE_BYTES = 1024 * 1024
+
+
+class ProductionSQLiteConfig(Config):
+    ENGINE_PROFILE = 'prod-sqlite'
+    PASSWORD_HASH_TARGET_MS = 250
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///hbnb.db')
+    SQLALCHEMY_BINDS = _replica_binds()
+    SQLALCHEMY_READ_BINDS = list(SQLALCHEMY_BINDS)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'connect_args': {'check_same_thread': False, 'timeout': 5},
+    }
+    SQLITE_PRAGMAS = {
+        # WAL : les lectures ne bloquent plus l'écriture, et un commit ne
+        # fsync que le journal ; NORMAL reste sûr en WAL (pas de corruption,
+        # seules les dernières transactions peuvent être perdues)
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'foreign_keys': 'ON',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,
+        'temp_store': 'MEMORY',
+    }
+
+
+class ProductionPostgresConfig(Config):
+    ENGINE_PROFILE = 'prod-postgres'
+    PASSWORD_HASH_TARGET_MS = 250
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'postgresql://hbnb@localhost/hbnb')
+    SQLALCHEMY_BINDS = _replica_binds()
+    SQLALCHEMY_READ_BINDS = list(SQLALCHEMY_BINDS)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        # une requête ne garde pas une connexion (ni ses verrous) plus de 5s
+        'connect_args': {'options': '-c statement_timeout=5000 -c lock_timeout=2000'},
+    }
+    SQLITE_PRAGMAS = {}
 
 
 config = {
     'development': DevelopmentConfig,
     'default': DevelopmentConfig,
-    'testing': TestingConfig
+    'testing': TestingConfig,
+    'dev': DevelopmentConfig,
+    'test': TestingConfig,
+    'prod-sqlite': ProductionSQLiteConfig,
+    'prod-postgres': ProductionPostgresConfig,
 }
\ No newline at end of file
@@ -1,8 +1,12 @@
 from app import create_app
 from app.extensions import db
+from app.persistence.migrations import init_schema
 
 app = create_app()
 
 with app.app_context():
-    db.create_all()
-    print("✅ Tables créées avec succès.")
+    applied = init_schema(db)
+    if applied:
+        print(f"✅ Migrations appliquées : {', '.join(applied)}")
+    else:
+        print("✅ Base de données à jour.")
@@ -1,6 +1,9 @@
+import os
+
 from app import create_app
 
-app = create_app()
+# HBNB_PROFILE : dev, test, prod-sqlite ou prod-postgres (voir config.py)
+app = create_app(os.getenv('HBNB_PROFILE', 'dev'))
 
 if __name__ == '__main__':
     print(app.url_map)
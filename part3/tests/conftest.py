@@ -5,14 +5,15 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from app import create_app
 from app.extensions import db
+from app import ratelimit, tokens
+from app.persistence import cache
+from app.models.user import User
 from app.services import facade
 
 
 @pytest.fixture(scope='session')
 def app():
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app = create_app('test')
     with app.app_context():
         db.create_all()
         yield app
@@ -25,6 +26,15 @@ def client(app):
     return app.test_client()
 
 
+@pytest.fixture()
+def owner(app):
+    with app.app_context():
+        user = User(first_name="Owner", last_name="User", email="owner@example.com", password="ownerpass")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
 @pytest.fixture()
 def admin_user(app):
     with app.app_context():
@@ -68,3 +78,6 @@ def clean_database(app):
         db.session.remove()
         db.drop_all()
         db.create_all()
+        cache.clear()
+        ratelimit.reset()
+        tokens.reset()
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models.amenity import Amenity
+from app.models.place import Place
+from app.persistence import cache
+from app.persistence.cache import LRUCache
+from app.services import facade
+
+
+@pytest.fixture()
+def selects(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if statement.startswith("SELECT"):
+            statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        yield statements
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_lru_cache_evicts_and_expires(monkeypatch):
+    lru = LRUCache(max_size=2, ttl=10)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert lru.get("c") is None
+    stats = lru.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (2, 2, 1, 1)
+
+
+def test_get_is_served_from_cache(app, selects):
+    with app.app_context():
+        wifi_id = facade.create_amenity({"name": "Wifi"}).id
+        db.session.remove()
+        assert facade.get_amenity(wifi_id).name == "Wifi"
+        db.session.remove()
+
+        del selects[:]
+        amenity = facade.get_amenity(wifi_id)
+        assert amenity.name == "Wifi" and amenity in db.session
+        assert selects == []
+        assert cache.stats()["Amenity"]["hits"] == 1
+        # les options de chargement contournent le cache
+        db.session.remove()
+        facade.get_amenity(wifi_id, load={"places": "selectin"})
+        assert selects
+
+
+def test_writes_invalidate_the_cache(app, owner):
+    with app.app_context():
+        wifi_id = facade.create_amenity({"name": "Wifi"}).id
+        place = facade.create_place({"title": "Loft", "price": 10.0, "latitude": 1.0,
+                                     "longitude": 2.0, "owner_id": owner})
+        place_id = place.id
+        db.session.remove()
+
+        facade.get_amenity(wifi_id)
+        facade.update_amenity(wifi_id, {"name": "Fiber"})
+        db.session.remove()
+        assert facade.get_amenity(wifi_id).name == "Fiber"
+
+        # modification directe d'un objet : invalidée au flush
+        facade.get_place(place_id).title = "Big loft"
+        db.session.commit()
+        db.session.remove()
+        assert facade.get_place(place_id).title == "Big loft"
+
+        # UPDATE en masse : le cache de l'entité est vidé
+        facade.get_place(place_id)
+        Place.query.update({"price": 20.0})
+        db.session.commit()
+        db.session.remove()
+        assert facade.get_place(place_id).price == 20.0
+
+        Amenity.query.filter_by(id=wifi_id).delete()
+        db.session.commit()
+        assert facade.get_amenity(wifi_id) is None
+
+
+def test_rollback_does_not_leave_uncommitted_rows(app, owner):
+    with app.app_context():
+        wifi_id = facade.create_amenity({"name": "Wifi"}).id
+        db.session.remove()
+        amenity = facade.get_amenity(wifi_id)
+        amenity.name = "Draft"
+        db.session.flush()
+        assert cache.stats()["Amenity"]["size"] == 0
+        db.session.rollback()
+        db.session.remove()
+        assert facade.get_amenity(wifi_id).name == "Wifi"
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+
+from werkzeug.http import http_date
+
+from app.extensions import db
+from app.models.place import Place
+from app.services import facade
+
+
+def make_place(app, owner):
+    with app.app_context():
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner_id=owner)
+        db.session.add(place)
+        db.session.commit()
+        return place.id
+
+
+def test_place_not_modified(app, client, owner):
+    place_id = make_place(app, owner)
+    response = client.get(f"/api/v1/places/{place_id}")
+    assert response.status_code == 200
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+    assert etag.startswith('W/"')
+    assert response.headers["Cache-Control"] == "public, max-age=30"
+
+    response = client.get(f"/api/v1/places/{place_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+    response = client.get(f"/api/v1/places/{place_id}", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    with app.app_context():
+        facade.update_place(place_id, {"title": "Big loft"})
+    response = client.get(f"/api/v1/places/{place_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["title"] == "Big loft"
+    assert response.headers["ETag"] != etag
+
+    assert client.get("/api/v1/places/unknown", headers={"If-None-Match": "*"}).status_code == 404
+
+
+def test_list_version_follows_writes_and_pages(app, client, owner):
+    place_id = make_place(app, owner)
+    url = f"/api/v1/places/{place_id}/reviews/"
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    # autre page, autre version
+    assert client.get(url + "?limit=1", headers={"If-None-Match": etag}).status_code == 200
+
+    with app.app_context():
+        facade.create_review({"text": "Nice", "rating": 5, "place_id": place_id, "user_id": owner})
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 1
+
+    etag = client.get("/api/v1/places/").headers["ETag"]
+    assert client.get("/api/v1/places/", headers={"If-None-Match": etag}).status_code == 304
+    make_place(app, owner)
+    assert client.get("/api/v1/places/", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_ndjson_list_has_its_own_etag(app, client, owner):
+    make_place(app, owner)
+    ndjson = {"Accept": "application/x-ndjson"}
+    response = client.get("/api/v1/places/")
+    assert response.headers["Vary"] == "Accept"
+    etag = response.headers["ETag"]
+    # même version, autre représentation : pas de 304
+    response = client.get("/api/v1/places/", headers=dict(ndjson, **{"If-None-Match": etag}))
+    assert response.status_code == 200 and response.mimetype == "application/x-ndjson"
+    assert response.headers["ETag"] != etag and response.headers["Vary"] == "Accept"
+    response = client.get("/api/v1/places/", headers=dict(ndjson, **{"If-None-Match": response.headers["ETag"]}))
+    assert response.status_code == 304 and response.headers["Vary"] == "Accept"
+
+
+def test_list_is_not_validated_by_date(app, client, owner):
+    with app.app_context():
+        reviews = [facade.create_review({"text": "Nice", "rating": 5, "place_id": make_place(app, owner),
+                                         "user_id": owner}).id for _ in range(2)]
+    response = client.get("/api/v1/reviews/")
+    assert "Last-Modified" not in response.headers
+    since = http_date(datetime.now(timezone.utc) + timedelta(seconds=1))
+    with app.app_context():
+        facade.delete_review(reviews[0])
+    # un delete ne change pas le dernier updated_at de la liste
+    response = client.get("/api/v1/reviews/", headers={"If-Modified-Since": since})
+    assert response.status_code == 200 and len(response.get_json()) == 1
@@ -0,0 +1,77 @@
+import json
+
+from app.api.v1 import fragments
+from app.api.v1.fragments import FragmentCache
+from app.extensions import db
+from app.models.place import Place
+from app.models.user import User
+from app.services import facade
+
+
+def test_fragment_cache_is_bounded_by_bytes():
+    cache = FragmentCache(max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"5678")
+    assert cache.get("a") == b"1234"
+    cache.set("c", b"90ab")
+    assert cache.get("b") is None
+    assert cache.size == 8 and len(cache) == 2
+    cache.set("d", b"too long for it")
+    assert cache.get("d") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_list_reuses_fragments_until_update(app, client, owner):
+    with app.app_context():
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner_id=owner)
+        db.session.add(place)
+        db.session.commit()
+        place_id = place.id
+        fragments.cache().clear()
+        hits = fragments.cache().hits
+
+    first = client.get("/api/v1/places/")
+    assert first.status_code == 200
+    assert first.get_json() == [{
+        "id": place_id, "title": "Loft", "description": None, "price": 10.0, "latitude": 1.0,
+        "longitude": 2.0, "amenities": [], "owner_id": owner,
+        "owner": {"id": owner, "first_name": "Owner", "last_name": "User", "email": "owner@example.com"},
+    }]
+    assert client.get("/api/v1/places/").data == first.data
+    with app.app_context():
+        assert fragments.cache().hits == hits + 1
+
+        facade.update_place(place_id, {"title": "Big loft"})
+    assert client.get("/api/v1/places/").get_json()[0]["title"] == "Big loft"
+
+
+def test_streamed_lists(app, client, owner, monkeypatch):
+    monkeypatch.setattr(fragments, "STREAM_BUFFER", 100)
+    with app.app_context():
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner_id=owner)
+        db.session.add(place)
+        db.session.commit()
+        facade.user_repository.add_many(
+            {"id": f"user{i}", "first_name": "Guest", "last_name": "User",
+             "email": f"guest{i}@example.com", "_password": "hash"}
+            for i in range(5))
+        facade.bulk_create_reviews(
+            {"text": f"Review {i}", "rating": 5, "place_id": place.id, "user_id": f"user{i}"}
+            for i in range(5))
+
+    full = client.get("/api/v1/reviews/")
+    # un corps streamé n'a pas de Content-Length
+    assert "Content-Length" in full.headers
+    response = client.get("/api/v1/reviews/?stream=1")
+    assert "Content-Length" not in response.headers
+    assert response.get_json() == full.get_json() and len(full.get_json()) == 5
+
+    response = client.get("/api/v1/reviews/", headers={"Accept": "application/x-ndjson"})
+    assert "Content-Length" not in response.headers and response.mimetype == fragments.NDJSON
+    assert [json.loads(line) for line in response.data.splitlines()] == full.get_json()
+
+    with app.test_request_context("/?stream=1"):
+        response = fragments.list_response(User.query.order_by(User.email), User.to_dict)
+        chunks = list(response.response)
+    assert len(chunks) > 1
+    assert [user["email"] for user in json.loads(b"".join(chunks))][:2] == ["guest0@example.com", "guest1@example.com"]
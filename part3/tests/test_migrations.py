@@ -0,0 +1,91 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import MetaData, UniqueConstraint, create_engine, inspect, text
+
+from app.extensions import db
+from app.persistence import migrations
+from app.persistence.migrations import v0001_query_indexes
+
+LATER_TABLES = {'revoked_tokens'}
+
+
+def create_legacy_schema(engine):
+    """Tables as create_all() built them before the migrations existed"""
+    legacy = MetaData()
+    for table in db.metadata.sorted_tables:
+        # tables ajoutées depuis par une migration
+        if table.name in LATER_TABLES:
+            continue
+        copy = table.to_metadata(legacy)
+        copy.indexes.clear()
+        for constraint in list(copy.constraints):
+            if isinstance(constraint, UniqueConstraint) and constraint.name:
+                copy.constraints.discard(constraint)
+    legacy.create_all(engine)
+
+
+@pytest.fixture()
+def engine(app, tmp_path):
+    # app : les modèles doivent être importés pour remplir db.metadata
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    create_legacy_schema(engine)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, first_name, last_name, email, password, is_admin) "
+            "VALUES ('u1', 'John', 'Doe', 'john@example.com', 'hash', 0)"))
+        connection.execute(text(
+            "INSERT INTO places (id, title, price, latitude, longitude, owner_id) "
+            "VALUES ('p1', 'Loft', 10.0, 1.0, 2.0, 'u1')"))
+        connection.execute(text(
+            "INSERT INTO reviews (id, text, rating, place_id, user_id) VALUES ('r1', 'Nice', 5, 'p1', 'u1')"))
+    yield engine
+    engine.dispose()
+
+
+def index_names(engine, table):
+    return {index['name'] for index in inspect(engine).get_indexes(table)}
+
+
+def test_upgrade_adds_indexes_and_keeps_data(engine):
+    assert migrations.upgrade(engine) == ['0001', '0002']
+    assert {'ix_places_price', 'ix_places_owner_id', 'ix_places_created_at_id'} <= index_names(engine, 'places')
+    assert {'uq_reviews_place_id_user_id', 'ix_reviews_user_id'} <= index_names(engine, 'reviews')
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM reviews")).scalar() == 1
+    assert migrations.upgrade(engine) == []
+
+    assert migrations.downgrade(engine, '0000') == ['0002', '0001']
+    assert 'ix_places_price' not in index_names(engine, 'places')
+    assert not inspect(engine).has_table('revoked_tokens')
+    assert migrations.applied_versions(engine) == set()
+
+
+def test_upgrade_refuses_duplicate_reviews(engine):
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO reviews (id, text, rating, place_id, user_id) VALUES ('r2', 'Again', 4, 'p1', 'u1')"))
+    with pytest.raises(RuntimeError):
+        migrations.upgrade(engine)
+    assert migrations.applied_versions(engine) == set()
+    assert 'ix_places_price' not in index_names(engine, 'places')
+
+
+def test_revoked_tokens_table_matches_the_model(engine):
+    migrations.upgrade(engine)
+    columns = {column['name'] for column in inspect(engine).get_columns('revoked_tokens')}
+    assert columns == {'key', 'revoked_at', 'expires_at'}
+    assert index_names(engine, 'revoked_tokens') == {'ix_revoked_tokens_revoked_at', 'ix_revoked_tokens_expires_at'}
+    with engine.begin() as connection:
+        connection.execute(db.metadata.tables['revoked_tokens'].insert(), {
+            'key': 'jti:1', 'revoked_at': datetime(2026, 1, 1), 'expires_at': datetime(2026, 1, 2)})
+
+
+def test_downgrade_drops_the_review_constraint_on_postgresql():
+    statements = []
+    connection = SimpleNamespace(dialect=SimpleNamespace(name='postgresql'),
+                                 execute=lambda statement: statements.append(str(statement)))
+    v0001_query_indexes.downgrade(connection)
+    drop_constraint = "ALTER TABLE reviews DROP CONSTRAINT IF EXISTS uq_reviews_place_id_user_id"
+    assert statements.index(drop_constraint) < statements.index("DROP INDEX IF EXISTS uq_reviews_place_id_user_id")
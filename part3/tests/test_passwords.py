@@ -0,0 +1,87 @@
+import pytest
+
+from app import passwords
+from app.extensions import db
+from app.models.user import User
+from app.passwords import PasswordHasher, PasswordHasherBusy, rounds_of
+from app.services import facade
+
+
+def test_pool_hashes_and_checks():
+    hasher = PasswordHasher(rounds=4, workers=2)
+    try:
+        password_hash = hasher.hash("secret")
+        assert rounds_of(password_hash) == 4
+        assert hasher.check(password_hash, "secret")
+        assert not hasher.check(password_hash, "wrong")
+        hashes = hasher.hash_many(f"pass{i}" for i in range(6))
+        assert [hasher.check(h, f"pass{i}") for i, h in enumerate(hashes)] == [True] * 6
+    finally:
+        hasher.close()
+
+
+def test_pool_applies_backpressure():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=1, queue_timeout=0.01)
+    try:
+        hasher._slots.acquire()
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash("secret")
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash_many(["one", "two"])
+        hasher._slots.release()
+        assert hasher.check(hasher.hash("secret"), "secret")
+        assert len(hasher.hash_many(["one", "two", "three"])) == 3
+    finally:
+        hasher.close()
+
+
+def test_rehash_only_raises_the_cost():
+    hasher = PasswordHasher(rounds=5)
+    assert hasher.needs_rehash(PasswordHasher(rounds=4).hash("secret"))
+    assert not hasher.needs_rehash(PasswordHasher(rounds=6).hash("secret"))
+    assert not hasher.needs_rehash(hasher.hash("secret"))
+
+
+def test_calibrate_stays_within_bounds():
+    assert passwords.calibrate(1, min_rounds=4) == 4
+    assert passwords.calibrate(10 ** 9, max_rounds=14) == 14
+
+
+def test_login_rehashes_other_cost_factor(app, monkeypatch):
+    with app.app_context():
+        monkeypatch.setattr(passwords.hasher(), "rounds", 5)
+        user = User(first_name="Old", last_name="Hash", email="old@example.com",
+                    password_hash=PasswordHasher(rounds=4).hash("oldpass"))
+        db.session.add(user)
+        db.session.commit()
+
+        assert facade.authenticate("old@example.com", "wrong") is None
+        assert rounds_of(user._password) == 4
+        assert facade.authenticate("old@example.com", "oldpass").id == user.id
+        assert rounds_of(user._password) == 5
+        assert user.verify_password("oldpass")
+
+
+def test_bulk_create_users_hashes_in_batch(app, monkeypatch):
+    with app.app_context():
+        monkeypatch.setattr(passwords.hasher(), "rounds", 4)
+        count = facade.bulk_create_users(
+            {"first_name": "Guest", "last_name": "User", "email": f"guest{i}@example.com", "password": f"pass{i}"}
+            for i in range(5))
+        assert count == 5
+        user = facade.get_user_by_email("guest3@example.com")
+        assert user.verify_password("pass3") and not user.verify_password("pass4")
+
+
+def test_user_cannot_promote_themself(client, normal_user):
+    token = client.post('/api/v1/auth/login', json={
+        "email": normal_user["email"], "password": normal_user["password"]}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    url = f"/api/v1/users/{normal_user['id']}"
+
+    response = client.put(url, json={"first_name": "Renamed", "is_admin": True}, headers=headers)
+    assert response.status_code == 400
+    response = client.put(url, json={"first_name": "Renamed"}, headers=headers)
+    assert response.status_code == 200
+    user = facade.get_user(normal_user['id'])
+    assert user.first_name == "Renamed" and not user.is_admin
@@ -0,0 +1,77 @@
+import pytest
+
+from app.ratelimit import MemoryStore, RateLimiter, SQLiteStore, parse_limit
+
+
+def test_parse_limit():
+    assert parse_limit('5/minute') == (5, 5 / 60)
+    with pytest.raises(ValueError):
+        parse_limit('5 per minute')
+
+
+def test_bucket_allows_burst_then_refills():
+    store = MemoryStore()
+    capacity, rate = parse_limit('3/minute')
+    assert [store.hit('k', capacity, rate, 0)[0] for _ in range(4)] == [True, True, True, False]
+    allowed, retry_after = store.hit('k', capacity, rate, 0)
+    assert not allowed and retry_after == pytest.approx(20)
+    assert store.hit('k', capacity, rate, 20)[0]
+    assert not store.hit('k', capacity, rate, 20)[0]
+
+
+def test_memory_store_stays_bounded():
+    store = MemoryStore(max_keys=10)
+    for i in range(50):
+        store.hit(f'k{i}', 5, 1, i)
+    assert len(store._buckets) <= 10
+
+
+def test_memory_store_evicts_least_recently_hit():
+    store = MemoryStore(max_keys=3)
+    for key in ('a', 'b', 'c'):
+        store.hit(key, 1, 0.001, 0)
+    store.hit('a', 1, 0.001, 1)
+    store.hit('d', 1, 0.001, 2)
+    assert list(store._buckets) == ['c', 'a', 'd']
+    # 'a' est resté vide, 'b' évincé repart plein
+    assert not store.hit('a', 1, 0.001, 3)[0]
+    assert store.hit('b', 1, 0.001, 3)[0]
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    first, second = SQLiteStore(path), SQLiteStore(path)
+    assert first.hit('k', 2, 0.1, 0)[0]
+    assert second.hit('k', 2, 0.1, 0)[0]
+    assert not first.hit('k', 2, 0.1, 0)[0]
+
+
+def test_login_is_throttled_per_account(client, normal_user):
+    attempt = {'email': normal_user['email'], 'password': 'wrong'}
+    for i in range(5):
+        # d'une adresse différente à chaque fois : seule la limite du compte joue
+        response = client.post('/api/v1/auth/login', json=attempt, environ_base={'REMOTE_ADDR': f'10.0.0.{i}'})
+        assert response.status_code == 401
+    response = client.post('/api/v1/auth/login', json=attempt, environ_base={'REMOTE_ADDR': '10.0.0.9'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    # un autre compte n'est pas bloqué
+    other = client.post('/api/v1/auth/login', json={'email': 'other@example.com', 'password': 'x'})
+    assert other.status_code == 401
+
+
+def test_reads_are_not_limited(client):
+    for _ in range(40):
+        assert client.get('/api/v1/places/').status_code == 200
+
+
+def test_rejected_request_spares_the_other_limits(app):
+    store = MemoryStore()
+    limiter = RateLimiter({'auth': {'account': '1/minute', 'ip': '3/minute'}}, store, ['POST'])
+    for _ in range(3):
+        with app.test_request_context('/api/v1/auth/login', method='POST', json={'email': 'a@example.com'},
+                                      environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+            response = limiter.check()
+    assert response.status_code == 429 and response.headers['Retry-After'] == '60'
+    # seule la première requête a consommé le seau de l'adresse
+    assert store._buckets['auth:ip:10.0.0.1'][0] == 2
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+from sqlalchemy import text
+
+import config
+from app import create_app
+from app.extensions import db
+from app.models.amenity import Amenity
+from app.persistence.replication import COOKIE, sync_sqlite_replicas
+from app.services import facade
+
+
+@pytest.fixture()
+def replicated_app(tmp_path):
+    class ReplicaConfig(config.TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        SQLALCHEMY_BINDS = {'replica': f"sqlite:///{tmp_path / 'replica.db'}"}
+        SQLALCHEMY_READ_BINDS = ['replica']
+        READ_YOUR_WRITES_SECONDS = 5
+
+    app = create_app(ReplicaConfig)
+    with app.app_context():
+        db.create_all()
+        sync_sqlite_replicas()
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    # init_app a déclaré la bind 'replica' sur l'objet db partagé
+    db.metadatas.pop('replica', None)
+
+
+def test_reads_go_to_replica_after_the_window(replicated_app):
+    app = replicated_app
+    with app.app_context():
+        wifi = facade.create_amenity({"name": "Wifi"})
+        # fenêtre read-your-writes : lu sur le primaire
+        assert facade.get_amenity(wifi.id) is not None
+        wifi_id = wifi.id
+
+    with app.app_context():
+        # nouvelle session, pas encore répliqué (le cache lit le primaire)
+        assert facade.amenity_repository.repository.get(wifi_id) is None
+        assert len(facade.get_all_amenities()) == 0
+        assert Amenity.query.count() == 1
+
+    with app.app_context():
+        assert sync_sqlite_replicas() == ['replica']
+        assert facade.get_amenity(wifi_id).name == "Wifi"
+        assert facade.amenity_repository.count() == 1
+
+
+def test_client_reads_its_writes(replicated_app):
+    app = replicated_app
+    with app.test_request_context():
+        app.preprocess_request()
+        facade.create_amenity({"name": "Wifi"})
+        response = app.process_response(app.response_class(status=201))
+        cookie = response.headers["Set-Cookie"]
+        assert cookie.startswith(COOKIE)
+        last_write = cookie.split(";")[0].split("=")[1]
+
+    with app.test_request_context(headers={"Cookie": f"{COOKIE}={last_write}"}):
+        app.preprocess_request()
+        assert facade.amenity_repository.count() == 1
+    with app.test_request_context():
+        app.preprocess_request()
+        assert facade.amenity_repository.count() == 0
+
+
+def test_cache_is_filled_from_the_primary(replicated_app):
+    app = replicated_app
+    with app.app_context():
+        wifi_id = facade.create_amenity({"name": "Wifi"}).id
+        sync_sqlite_replicas()
+    with app.app_context():
+        facade.update_amenity(wifi_id, {"name": "Fast wifi"})
+
+    # réplica en retard : le cache invalidé est rempli depuis le primaire
+    with app.app_context():
+        assert facade.get_amenity(wifi_id).name == "Fast wifi"
+    with app.app_context():
+        assert facade.get_amenity(wifi_id).name == "Fast wifi"
+        # écriture hors du repository, le cache n'en sait rien
+        with db.engine.begin() as connection:
+            connection.execute(text("UPDATE amenities SET name = 'Slow wifi'"))
+
+    with app.test_request_context(headers={"Cookie": f"{COOKIE}={time.time()}"}):
+        app.preprocess_request()
+        # fenêtre read-your-writes du client : pas de cache
+        assert facade.get_amenity(wifi_id).name == "Slow wifi"
+    with app.app_context():
+        assert facade.get_amenity(wifi_id).name == "Fast wifi"
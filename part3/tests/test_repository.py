@@ -0,0 +1,399 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
+
+from app.extensions import db
+from app.persistence import repository
+from app.models.amenity import Amenity
+from app.models.place import Place
+from app.models.review import Review
+from app.models.user import User
+from app.persistence.repository import InMemoryRepository, SQLAlchemyRepository
+from app.persistence.unit_of_work import unit_of_work
+from app.services import facade
+
+
+@pytest.fixture()
+def count_queries(app):
+    """Collect the SQL statements run while the fixture is active"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        yield statements
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def make_users(n):
+    # lignes brutes : évite un hachage bcrypt par utilisateur
+    SQLAlchemyRepository(User).add_many(
+        {"id": f"user{i}", "first_name": "Guest", "last_name": "User",
+         "email": f"guest{i}@example.com", "_password": "hash"}
+        for i in range(n))
+    return [f"user{i}" for i in range(n)]
+
+
+def make_amenities(n):
+    amenities = [Amenity(name=f"amenity{i}") for i in range(n)]
+    db.session.add_all(amenities)
+    db.session.commit()
+    return [a.id for a in amenities]
+
+
+def test_get_many_cost_does_not_grow_with_ids(app, count_queries):
+    with app.app_context():
+        ids = make_amenities(30)
+        repo = SQLAlchemyRepository(Amenity)
+        db.session.expire_all()
+        del count_queries[:]
+        assert [a.id for a in repo.get_many(ids[:1])] == ids[:1]
+        one = len(count_queries)
+
+        db.session.expire_all()
+        del count_queries[:]
+        found = repo.get_many(list(reversed(ids)) + ["unknown-id", ids[0]])
+        assert [a.id for a in found] == list(reversed(ids))
+        assert len(count_queries) == one
+
+
+def test_create_place_cost_does_not_grow_with_amenities(app, owner, count_queries):
+    with app.app_context():
+        ids = make_amenities(30)
+        counts = []
+        for amenity_ids in (ids[:1], ids):
+            db.session.expire_all()
+            del count_queries[:]
+            place = facade.create_place({
+                "title": "Loft", "price": 100.0, "latitude": 1.0, "longitude": 2.0,
+                "owner_id": owner, "amenities": amenity_ids,
+            })
+            counts.append(len(count_queries))
+        assert counts[0] == counts[1]
+        assert sorted(a.id for a in place.amenities) == sorted(ids)
+
+
+def test_create_place_rejects_unknown_amenity(app, owner):
+    with app.app_context():
+        ids = make_amenities(2)
+        with pytest.raises(KeyError):
+            facade.create_place({
+                "title": "Loft", "price": 100.0, "latitude": 1.0, "longitude": 2.0,
+                "owner_id": owner, "amenities": ids + ["unknown-id"],
+            })
+        assert Place.query.count() == 0
+
+
+def test_add_many_commits_once_per_chunk(app, count_queries):
+    with app.app_context():
+        amenities = [Amenity(name=f"amenity{i}") for i in range(10)]
+        rows = [{"name": f"extra{i}"} for i in range(2)]
+        del count_queries[:]
+        assert SQLAlchemyRepository(Amenity).add_many(amenities + rows, chunk_size=5) == 12
+        inserts = [s for s in count_queries if s.startswith("INSERT")]
+        assert len(inserts) == 3
+        assert all(a.id and a.created_at for a in amenities)
+        assert Amenity.query.count() == 12
+        assert db.session.get(Amenity, amenities[0].id).name == "amenity0"
+
+
+def test_bulk_create_places_and_reviews(app, owner):
+    with app.app_context():
+        ids = make_amenities(3)
+        facade.bulk_create_places([
+            {"title": f"Place{i}", "price": 10.0, "latitude": 1.0, "longitude": 2.0,
+             "owner_id": owner, "amenities": ids[:i]}
+            for i in range(4)
+        ], chunk_size=3)
+        places = Place.query.order_by(Place.title).all()
+        assert [len(p.amenities) for p in places] == [0, 1, 2, 3]
+
+        users = make_users(25)
+        count = facade.bulk_create_reviews(
+            ({"text": "Nice", "rating": 1 + i % 5, "place_id": places[0].id, "user_id": user_id}
+             for i, user_id in enumerate(users)),
+            chunk_size=10)
+        assert count == 25
+        assert Review.query.count() == 25
+
+
+def test_bulk_create_reviews_rejects_unknown_place(app, owner):
+    with app.app_context():
+        with pytest.raises(KeyError):
+            facade.bulk_create_reviews([
+                {"text": "Nice", "rating": 5, "place_id": "unknown-id", "user_id": owner},
+            ])
+        with pytest.raises(ValueError):
+            facade.bulk_create_reviews([{"text": "", "rating": 5, "place_id": "x", "user_id": owner}])
+        assert Review.query.count() == 0
+
+
+def test_bulk_create_places_is_atomic_per_chunk(app, owner, monkeypatch):
+    with app.app_context():
+        ids = make_amenities(2)
+
+        def fail(links, chunk_size=None):
+            list(links)
+            raise RuntimeError("link insert failed")
+
+        monkeypatch.setattr(facade, 'bulk_link_amenities', fail)
+        with pytest.raises(RuntimeError):
+            facade.bulk_create_places([{"title": "Loft", "price": 10.0, "latitude": 1.0, "longitude": 2.0,
+                                        "owner_id": owner, "amenities": ids}])
+        # la place n'est pas restée sans ses amenities
+        assert Place.query.count() == 0
+
+
+def test_bulk_create_reviews_reports_duplicates(app, owner):
+    with app.app_context():
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner_id=owner)
+        db.session.add(place)
+        db.session.commit()
+        users = make_users(3)
+        facade.create_review({"text": "Nice", "rating": 5, "place_id": place.id, "user_id": users[0]})
+        rows = [{"text": "Nice", "rating": 5, "place_id": place.id, "user_id": user_id}
+                for user_id in (users[1], users[0], users[2], users[1])]
+        with pytest.raises(ValueError, match="rows 1, 3$"):
+            facade.bulk_create_reviews(rows)
+        assert Review.query.count() == 1
+
+
+def test_unit_of_work_commits_once(app):
+    commits = []
+
+    def after_commit(session):
+        commits.append(session)
+
+    with app.app_context():
+        event.listen(db.session, 'after_commit', after_commit)
+        try:
+            with unit_of_work():
+                facade.create_amenity({"name": "Wifi"})
+                facade.create_amenity({"name": "Pool"})
+                assert commits == []
+        finally:
+            event.remove(db.session, 'after_commit', after_commit)
+        assert len(commits) == 1
+        assert Amenity.query.count() == 2
+
+
+def test_unit_of_work_rolls_back_on_error(app):
+    with app.app_context():
+        with pytest.raises(KeyError):
+            with unit_of_work():
+                facade.create_amenity({"name": "Wifi"})
+                raise KeyError("Invalid input data")
+        assert Amenity.query.count() == 0
+
+
+def test_request_error_status_rolls_back(app):
+    with app.test_request_context():
+        app.preprocess_request()
+        facade.create_amenity({"name": "Wifi"})
+        app.process_response(app.response_class(status=400))
+        assert Amenity.query.count() == 0
+
+    with app.test_request_context():
+        app.preprocess_request()
+        facade.create_amenity({"name": "Pool"})
+        app.process_response(app.response_class(status=201))
+    with app.app_context():
+        assert [a.name for a in Amenity.query] == ["Pool"]
+
+
+def make_timed_amenities(n):
+    # deux amenities par horodatage : l'id départage les ex aequo
+    start = datetime(2024, 1, 1)
+    return [Amenity(name=f"amenity{i:02d}", created_at=start + timedelta(seconds=i // 2)) for i in range(n)]
+
+
+def walk_pages(repo, limit, **kwargs):
+    pages, cursor = [], None
+    while True:
+        objs, cursor = repo.get_page(limit, cursor, **kwargs)
+        pages.append([obj.name for obj in objs])
+        if cursor is None:
+            return pages
+
+
+def test_in_memory_get_page_follows_cursor():
+    amenities = make_timed_amenities(7)
+    repo = InMemoryRepository()
+    for amenity in reversed(amenities):
+        amenity.id = f"id{amenity.name}"
+        repo.add(amenity)
+    expected = [a.name for a in amenities]
+    assert walk_pages(repo, 3) == [expected[0:3], expected[3:6], expected[6:]]
+    assert walk_pages(repo, 7) == [expected]
+
+
+def test_sqlalchemy_get_page_follows_cursor(app):
+    with app.app_context():
+        amenities = make_timed_amenities(7)
+        db.session.add_all(amenities)
+        db.session.commit()
+        expected = [a.name for a in sorted(amenities, key=lambda a: (a.created_at, a.id))]
+        repo = SQLAlchemyRepository(Amenity)
+        assert walk_pages(repo, 3) == [expected[0:3], expected[3:6], expected[6:]]
+        assert walk_pages(repo, 3, filters={"name": "amenity04"}) == [["amenity04"]]
+        with pytest.raises(ValueError):
+            repo.get_page(3, "not-a-cursor")
+
+
+def test_list_endpoint_pagination(app, client, owner):
+    with app.app_context():
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner_id=owner)
+        db.session.add(place)
+        db.session.commit()
+        facade.bulk_create_reviews(
+            {"text": f"Review {i}", "rating": 5, "place_id": place.id, "user_id": user_id}
+            for i, user_id in enumerate(make_users(5)))
+        place_id = place.id
+
+    assert len(client.get("/api/v1/reviews/").get_json()) == 5
+
+    texts, url = [], f"/api/v1/places/{place_id}/reviews/?limit=2"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        texts += [r["text"] for r in response.get_json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        url = cursor and f"/api/v1/places/{place_id}/reviews/?limit=2&cursor={cursor}"
+        if cursor:
+            assert 'rel="next"' in response.headers["Link"]
+    assert sorted(texts) == [f"Review {i}" for i in range(5)]
+
+    assert client.get("/api/v1/reviews/?limit=0").status_code == 400
+    assert client.get("/api/v1/places/?cursor=bad").status_code == 400
+
+
+def make_places_with_amenities(owner, places, amenities):
+    ids = make_amenities(amenities)
+    facade.bulk_create_places(
+        {"title": f"Place{i}", "price": 10.0, "latitude": 1.0, "longitude": 2.0,
+         "owner_id": owner, "amenities": ids}
+        for i in range(places))
+    db.session.expire_all()
+
+
+def test_amenity_list_does_not_load_places(app, owner, count_queries):
+    with app.app_context():
+        make_places_with_amenities(owner, 5, 3)
+        del count_queries[:]
+        assert len([a.to_dict() for a in facade.get_all_amenities()]) == 3
+        assert len(count_queries) == 1
+
+
+def test_loader_options(app, owner, count_queries):
+    with app.app_context():
+        make_places_with_amenities(owner, 5, 3)
+        repo = SQLAlchemyRepository(Place)
+        del count_queries[:]
+        places = [p for p in repo.get_all(load={"amenities": "selectin", "owner": "joined"})]
+        assert all(len(p.amenities) == 3 and p.owner.id == owner for p in places)
+        assert len(count_queries) == 2
+
+        place_id = places[0].id
+        db.session.expunge_all()
+        place = repo.get(place_id, load={"*": "raiseload"})
+        with pytest.raises(InvalidRequestError):
+            place.amenities
+        with pytest.raises(ValueError):
+            repo.get_all(load={"amenities": "eager"})
+
+
+def test_review_collections_stay_in_sql(app, owner, count_queries):
+    with app.app_context():
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner_id=owner)
+        db.session.add(place)
+        db.session.commit()
+        facade.bulk_create_reviews(
+            {"text": f"Review {i}", "rating": 5, "place_id": place.id, "user_id": user_id}
+            for i, user_id in enumerate(make_users(50)))
+        place_id = place.id
+        db.session.expunge_all()
+
+        del count_queries[:]
+        assert facade.has_reviewed("user7", place_id)
+        assert not facade.has_reviewed(owner, place_id)
+        assert facade.count_reviews_by_place(place_id) == 50
+        assert len(count_queries) == 3
+        assert not any(isinstance(obj, Review) for obj in db.session)
+
+        place = facade.get_place(place_id)
+        assert place.reviews.count() == 50
+        assert len(place.reviews.limit(5).all()) == 5
+        assert place.owner.places.count() == 1
+        assert len([r for r in facade.get_reviews_by_place(place_id)]) == 50
+
+
+def test_one_review_per_user_and_place(app, owner):
+    with app.app_context():
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner_id=owner)
+        db.session.add(place)
+        db.session.commit()
+        data = {"text": "Nice", "rating": 4, "place_id": place.id, "user_id": owner}
+        facade.create_review(dict(data))
+        with pytest.raises(ValueError):
+            facade.create_review(dict(data))
+        assert facade.count_reviews_by_place(place.id) == 1
+
+        review = facade.upsert_review(dict(data, text="Even better", rating=5))
+        assert (review.text, review.rating) == ("Even better", 5)
+        assert facade.count_reviews_by_place(place.id) == 1
+
+        Review.query.delete()
+        db.session.commit()
+        review = facade.upsert_review(dict(data))
+        assert review.id and review.text == "Nice"
+        with pytest.raises(KeyError):
+            facade.upsert_review(dict(data, place_id="unknown-id"))
+
+
+def test_upsert_without_on_conflict(app, owner, monkeypatch):
+    # dialecte sans ON CONFLICT : SELECT ... FOR UPDATE puis UPDATE ou INSERT
+    monkeypatch.setattr(repository, '_UPSERT_DIALECTS', {})
+    with app.app_context():
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner_id=owner)
+        db.session.add(place)
+        db.session.commit()
+        data = {"text": "Nice", "rating": 4, "place_id": place.id, "user_id": owner}
+        first = facade.upsert_review(dict(data))
+        review = facade.upsert_review(dict(data, text="Even better", rating=5))
+        assert review.id == first.id and (review.text, review.rating) == ("Even better", 5)
+        assert facade.count_reviews_by_place(place.id) == 1
+
+
+def test_create_review_reports_other_integrity_errors(app, owner, monkeypatch):
+    with app.app_context():
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner_id=owner)
+        db.session.add(place)
+        db.session.commit()
+
+        def fail(review):
+            raise IntegrityError("INSERT", {}, Exception("NOT NULL constraint failed: reviews.text"))
+
+        monkeypatch.setattr(facade.review_repository, 'add', fail)
+        # pas le message "already reviewed" : la contrainte en cause est autre
+        with pytest.raises(IntegrityError):
+            facade.create_review({"text": "Nice", "rating": 4, "place_id": place.id, "user_id": owner})
+
+
+def test_in_memory_view_survives_writes_during_iteration():
+    repo = InMemoryRepository()
+    for amenity in make_timed_amenities(3):
+        amenity.id = f"id{amenity.name}"
+        repo.add(amenity)
+    view = repo.get_all()
+    seen = []
+    for amenity in view:
+        seen.append(amenity.name)
+        repo.add(Amenity(id=f"new{amenity.id}", name=f"new {amenity.name}"))
+    assert seen == ["amenity00", "amenity01", "amenity02"]
+    assert len(view) == 3 and view[-1].name == "amenity02"
+    assert len(repo.get_all()) == 6 and repo.version()[0] == 6
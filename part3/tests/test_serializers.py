@@ -0,0 +1,47 @@
+import pytest
+from flask_restx import Model, fields, marshal
+from sqlalchemy import select
+
+from app.api.v1.places import place_output_model, serialize_place
+from app.api.v1.serializers import compile_model
+from app.extensions import db
+from app.models.amenity import Amenity
+from app.models.place import Place
+
+
+def test_compiled_model_matches_marshal():
+    tag = Model('Tag', {'name': fields.String, 'weight': fields.Integer(default=1)})
+    model = Model('Item', {
+        'id': fields.String,
+        'price': fields.Float,
+        'active': fields.Boolean,
+        'label': fields.String(attribute='title'),
+        'tags': fields.List(fields.Nested(tag)),
+        'extra': fields.Raw,
+    })
+    item = {'id': 7, 'price': '9.5', 'active': 1, 'title': 'Loft', 'tags': [{'name': 'a', 'weight': None}], 'extra': {'x': 1}}
+
+    class Obj:
+        def __init__(self, data):
+            self.__dict__.update(data)
+
+    obj = Obj(dict(item, tags=[Obj(tag) for tag in item['tags']]))
+    assert compile_model(model)(obj) == marshal(item, model)
+    with pytest.raises(TypeError):
+        compile_model(Model('Date', {'at': fields.DateTime}))
+
+
+def test_place_serializer_reads_rows_and_relationships(app, owner):
+    with app.app_context():
+        wifi = Amenity(name="Wifi")
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner_id=owner, amenities=[wifi])
+        db.session.add(place)
+        db.session.commit()
+        data = serialize_place(place)
+        assert data["owner"]["email"] == "owner@example.com"
+        assert data["amenities"] == [wifi.id]
+        assert list(data) == list(place_output_model.resolved)
+
+        row = db.session.execute(select(Place.id, Place.title, Place.price)).one()
+        assert compile_model(place_output_model, amenities=lambda p: None)(row) == dict(
+            {name: None for name in place_output_model.resolved}, id=place.id, title="Loft", price=10.0)
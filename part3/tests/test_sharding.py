@@ -0,0 +1,187 @@
+from collections import Counter
+
+import pytest
+
+import config
+from app import create_app
+from app.extensions import db
+from app.models.place import Place
+from app.models.review import Review
+from app.models.user import User
+from app.persistence import sharding
+from app.persistence.sharding import ShardedRepository, create_shard_schema, jump_hash, reshard
+from app.services import facade
+
+SHARDS = ['shard0', 'shard1', 'shard2']
+
+
+@pytest.fixture()
+def sharded_app(tmp_path):
+    class ShardConfig(config.TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        SQLALCHEMY_BINDS = {name: f"sqlite:///{tmp_path / name}.db" for name in SHARDS}
+        REVIEW_SHARDS = SHARDS
+
+    app = create_app(ShardConfig)
+    with app.app_context():
+        db.create_all()
+        for name in SHARDS:
+            create_shard_schema(db.engines[name], [Place, Review])
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    for name in SHARDS:
+        db.metadatas.pop(name, None)
+
+
+def make_places(repo, n):
+    return repo.add_many(
+        {"id": f"place{i:03d}", "title": f"Place{i:03d}", "price": float(i % 10),
+         "latitude": 1.0, "longitude": 2.0, "owner_id": "owner"}
+        for i in range(n))
+
+
+def test_jump_hash_moves_few_keys():
+    keys = [f"place{i}" for i in range(1000)]
+    before = [jump_hash(key, 2) for key in keys]
+    after = [jump_hash(key, 3) for key in keys]
+    moved = [a for b, a in zip(before, after) if a != b]
+    assert set(moved) == {2}
+    assert 250 < len(moved) < 420
+    assert all(count > 250 for count in Counter(after).values())
+
+
+def test_reviews_follow_their_place(sharded_app):
+    with sharded_app.app_context():
+        places = ShardedRepository(Place, SHARDS[:2])
+        reviews = ShardedRepository(Review, SHARDS[:2], shard_key='place_id')
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner_id="owner")
+        places.add(place)
+        reviews.add_many(
+            {"text": "Nice", "rating": 5, "place_id": place.id, "user_id": f"user{i}"}
+            for i in range(5))
+
+        shard = places.shard_of(place.id)
+        assert reviews.shard_of(place.id) == shard
+        assert places.get(place.id).title == "Loft"
+        assert reviews.count({"place_id": place.id}) == 5
+        assert reviews.exists({"place_id": place.id, "user_id": "user3"})
+        assert not reviews.exists({"user_id": "nobody"})
+        other = ShardedRepository(Review, [SHARDS[1 - shard]], shard_key='place_id')
+        assert other.count() == 0
+
+        places.update(place.id, {"title": "Big loft"})
+        assert places.get_by_attribute("title", "Big loft").id == place.id
+        with pytest.raises(ValueError):
+            reviews.update("any-id", {"place_id": "other"})
+        places.delete(place.id)
+        assert places.get(place.id) is None
+
+
+def test_fan_out_reads_are_merge_sorted(sharded_app):
+    with sharded_app.app_context():
+        repo = ShardedRepository(Place, SHARDS)
+        assert make_places(repo, 30) == 30
+        expected = [f"place{i:03d}" for i in range(30)]
+
+        assert repo.count() == 30
+        assert [p.id for p in repo.get_all()] == sorted(expected, key=lambda i: (repo.get(i).created_at, i))
+        assert [p.id for p in repo.get_many(["place007", "unknown", "place003"])] == ["place007", "place003"]
+
+        cheapest = repo.query(order_by="price", limit=4)
+        assert [p.price for p in cheapest] == [0.0, 0.0, 0.0, 1.0]
+        dearest = repo.query(filters={"price": 9.0}, order_by="-price")
+        assert sorted(p.id for p in dearest) == ["place009", "place019", "place029"]
+
+        ids, cursor = [], None
+        while True:
+            page, cursor = repo.get_page(7, cursor)
+            ids += [p.id for p in page]
+            if cursor is None:
+                break
+        assert ids == [p.id for p in repo.get_all()]
+
+
+def test_reshard_moves_only_reassigned_rows(sharded_app):
+    with sharded_app.app_context():
+        two = ShardedRepository(Place, SHARDS[:2])
+        three = ShardedRepository(Place, SHARDS)
+        make_places(two, 90)
+        expected = sum(two.shard_of(f"place{i:03d}") != three.shard_of(f"place{i:03d}") for i in range(90))
+
+        assert reshard(two, three, chunk_size=10) == expected
+        assert three.count() == 90
+        assert ShardedRepository(Place, SHARDS[2:]).count() == expected
+        assert all(three.get(f"place{i:03d}") is not None for i in range(90))
+        # relancer ne déplace plus rien
+        assert reshard(two, three) == 0
+
+
+def test_add_inserts_columns_only(sharded_app):
+    with sharded_app.app_context():
+        user = User(first_name="John", last_name="Doe", email="john@example.com", password="secret")
+        place = Place(title="Loft", price=10.0, latitude=1.0, longitude=2.0, owner=user)
+        db.session.add(place)
+        db.session.commit()
+        place_id, user_id = place.id, user.id
+        db.session.expunge_all()
+        reviews = ShardedRepository(Review, SHARDS, shard_key='place_id')
+
+        review = Review(text="Nice", rating=5, place=place, user=user)
+        reviews.add(review)
+        # clés étrangères lues des parents, sans les copier dans le shard
+        assert review.place_id == place_id and review.user_id == user_id
+        assert reviews.get(review.id).place_id == place_id
+        assert ShardedRepository(Place, SHARDS).count() == 0
+        assert db.session.query(Review).count() == 0
+
+
+def test_merge_sorts_null_values_last(sharded_app):
+    with sharded_app.app_context():
+        repo = ShardedRepository(Place, SHARDS)
+        make_places(repo, 12)
+        for bind in SHARDS:
+            with db.engines[bind].begin() as connection:
+                connection.execute(Place.__table__.update().where(Place.__table__.c.price == 0.0)
+                                   .values(created_at=None, description=None))
+        ordered = repo.get_all()
+        assert [p.id for p in ordered[-2:]] == ["place000", "place010"]
+        assert repo.query(order_by="-description")[0].description is None
+
+
+def test_facade_stores_reviews_on_shards(sharded_app):
+    with sharded_app.app_context():
+        owner = facade.create_user({"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com", "password": "secret"})
+        user = facade.create_user({"first_name": "Bob", "last_name": "Lee", "email": "bob@example.com", "password": "secret"})
+        place = facade.create_place({"title": "Loft", "price": 10.0, "latitude": 1.0, "longitude": 2.0, "owner_id": owner.id})
+        db.session.commit()
+
+        assert facade.review_repository is sharding.reviews()
+        review = facade.create_review({"text": "Nice", "rating": 5, "user_id": user.id, "place_id": place.id})
+        db.session.commit()
+        assert db.session.query(Review).count() == 0
+        assert [r.id for r in facade.get_reviews_by_place(place.id)] == [review.id]
+        assert facade.has_reviewed(user.id, place.id)
+        with pytest.raises(ValueError):
+            facade.create_review({"text": "Again", "rating": 4, "user_id": user.id, "place_id": place.id})
+        with pytest.raises(ValueError):
+            facade.bulk_create_reviews([{"text": "Bulk", "rating": 3, "user_id": user.id, "place_id": place.id}])
+        updated = facade.upsert_review({"text": "Better", "rating": 4, "user_id": user.id, "place_id": place.id})
+        assert updated.id == review.id and facade.get_review(review.id).text == "Better"
+        facade.delete_review(review.id)
+        assert facade.count_reviews_by_place(place.id) == 0
+
+
+def test_reshard_command(sharded_app):
+    with sharded_app.app_context():
+        two = ShardedRepository(Review, SHARDS[:2], shard_key='place_id')
+        two.add_many({"text": "Nice", "rating": 5, "place_id": f"place{i:03d}", "user_id": "user"}
+                     for i in range(60))
+
+        result = sharded_app.test_cli_runner().invoke(args=['reshard', '--from', ','.join(SHARDS[:2])])
+        assert result.exit_code == 0, result.output
+        moved = ShardedRepository(Review, SHARDS[2:], shard_key='place_id').count()
+        assert moved > 0 and result.output == f"{moved} reviews moved\n"
+        assert sharding.reviews().count() == 60
@@ -0,0 +1,130 @@
+import time
+from datetime import datetime, timezone
+
+import config
+from app import create_app, tokens
+from app.extensions import db
+from app.services import facade
+from app.tokens import BloomFilter
+
+
+def login(client, user):
+    response = client.post('/api/v1/auth/login', json={'email': user['email'], 'password': user['password']})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [f'jti:{i}' for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f'other:{i}' in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_access_token_carries_id_and_admin_claim(client, admin_user):
+    pair = login(client, admin_user)
+    response = client.get('/api/v1/protected/', headers=bearer(pair['access_token']))
+    assert response.status_code == 200
+    assert admin_user['id'] in response.get_json()['message']
+    assert client.get('/api/v1/users/', headers=bearer(pair['access_token'])).status_code == 200
+
+
+def test_refresh_rotates_and_detects_reuse(client, normal_user):
+    pair = login(client, normal_user)
+    # un jeton d'accès ne sert pas à rafraîchir
+    assert client.post('/api/v1/auth/refresh', headers=bearer(pair['access_token'])).status_code == 422
+
+    response = client.post('/api/v1/auth/refresh', headers=bearer(pair['refresh_token']))
+    assert response.status_code == 200
+    rotated = response.get_json()
+    assert client.get('/api/v1/protected/', headers=bearer(rotated['access_token'])).status_code == 200
+
+    # rejeu de l'ancien refresh token : toute la famille est révoquée
+    assert client.post('/api/v1/auth/refresh', headers=bearer(pair['refresh_token'])).status_code == 401
+    assert client.post('/api/v1/auth/refresh', headers=bearer(rotated['refresh_token'])).status_code == 401
+    assert client.get('/api/v1/protected/', headers=bearer(rotated['access_token'])).status_code == 401
+
+
+def test_logout_revokes_the_login_only(client, normal_user):
+    first, second = login(client, normal_user), login(client, normal_user)
+    assert client.post('/api/v1/auth/logout', headers=bearer(first['access_token'])).status_code == 200
+    assert client.get('/api/v1/protected/', headers=bearer(first['access_token'])).status_code == 401
+    assert client.post('/api/v1/auth/refresh', headers=bearer(first['refresh_token'])).status_code == 401
+    assert client.get('/api/v1/protected/', headers=bearer(second['access_token'])).status_code == 200
+
+
+def test_role_change_revokes_issued_tokens(app, client, admin_user):
+    pair = login(client, admin_user)
+    facade.update_user(admin_user['id'], {'is_admin': False})
+    assert client.get('/api/v1/users/', headers=bearer(pair['access_token'])).status_code == 401
+    assert client.post('/api/v1/auth/refresh', headers=bearer(pair['refresh_token'])).status_code == 401
+    # les jetons émis ensuite sont valables, sans le claim admin, même dans
+    # la seconde de la révocation
+    pair = login(client, admin_user)
+    assert client.get('/api/v1/users/', headers=bearer(pair['access_token'])).status_code == 403
+
+
+def test_token_issued_in_the_revocation_second_is_valid(app, client, normal_user, monkeypatch):
+    # révocation en fin de seconde, jetons émis juste avant et juste après :
+    # iat est le même pour les deux, seul issued les départage
+    revoked_at = datetime.utcnow().replace(microsecond=999000)
+    at = revoked_at.replace(tzinfo=timezone.utc).timestamp()
+    monkeypatch.setattr(tokens, 'datetime', type('FixedDatetime', (datetime,), {
+        'utcnow': classmethod(lambda cls: revoked_at)}))
+    with app.app_context():
+        user = facade.get_user(normal_user['id'])
+        tokens.revoke_user(user.id)
+        issued = {}
+        for name, at in (('earlier', at - 0.2), ('later', at + 0.0005)):
+            monkeypatch.setattr(time, 'time', lambda: at)
+            issued[name] = tokens.issue(user)['access_token']
+            monkeypatch.undo()
+    assert client.get('/api/v1/protected/', headers=bearer(issued['later'])).status_code == 200
+    assert client.get('/api/v1/protected/', headers=bearer(issued['earlier'])).status_code == 401
+
+
+def test_unrevoked_tokens_skip_the_table(app, client, normal_user, monkeypatch):
+    pair = login(client, normal_user)
+    client.get('/api/v1/protected/', headers=bearer(pair['access_token']))
+    revocations = tokens.revocations()
+    monkeypatch.setattr(revocations, '_next_sync', float('inf'))
+    # une requête sur la table ferait échouer la vérification
+    monkeypatch.setattr(type(app.extensions['sqlalchemy']), 'engine', property(lambda self: None))
+    assert client.get('/api/v1/protected/', headers=bearer(pair['access_token'])).status_code == 200
+
+
+def test_revocation_waits_for_the_request_transaction(tmp_path):
+    # base fichier : la transaction de la requête tient le verrou d'écriture
+    class FileConfig(config.TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'tokens.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'check_same_thread': False, 'timeout': 0.5}}
+
+    app = create_app(FileConfig)
+
+    @app.route('/test/promote/<user_id>', methods=['PUT'])
+    def promote(user_id):
+        facade.update_user(user_id, {'is_admin': True})
+        return {'id': user_id}, 200
+
+    with app.app_context():
+        db.create_all()
+        user = facade.create_user({'first_name': 'File', 'last_name': 'User',
+                                   'email': 'file@example.com', 'password': 'filepass'})
+        user_id = user.id
+        client = app.test_client()
+        pair = login(client, {'email': 'file@example.com', 'password': 'filepass'})
+
+        started = time.perf_counter()
+        assert client.put(f'/test/promote/{user_id}').status_code == 200
+        assert time.perf_counter() - started < 0.5
+        db.session.remove()
+        assert facade.get_user(user_id).is_admin
+        assert client.get('/api/v1/protected/', headers=bearer(pair['access_token'])).status_code == 401
+        db.session.remove()